@@ -0,0 +1,135 @@
+"""Concurrent connections: threaded WSGI server (app.run) versus the ASGI adapter under uvicorn.
+
+For each level, that many clients connect at once, hold their connection
+open for ``--hold`` seconds before sending a request, and wait for the
+response. The report shows how many succeeded and the latency tail:
+
+    python benchmarks/bench_asgi.py --levels 100,1000,3000 --hold 1.0
+
+Requires uvicorn for the ASGI side (``pip install uvicorn``).
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def serve(args):
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{os.path.join(args.data, "products.db")}'
+    spec = importlib.util.spec_from_file_location('bench_app', os.path.join(ROOT, 'homepage_endpoints', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    with module.app.app_context():
+        module.init_db(args.products)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    if args.mode == 'wsgi':
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        # What `app.run()` does: one thread per connection
+        server = make_server('127.0.0.1', args.port, module.app, threaded=True, request_handler=QuietHandler)
+        print('READY', flush=True)
+        server.serve_forever()
+    else:
+        import uvicorn
+        from kletos.asgi import ASGIAdapter
+
+        config = uvicorn.Config(ASGIAdapter.from_env(module.app), host='127.0.0.1', port=args.port,
+                                log_level='error', backlog=4096, lifespan='on')
+        server = uvicorn.Server(config)
+        print('READY', flush=True)
+        server.run()
+
+
+def start_server(mode, data, products, port):
+    os.makedirs(data, exist_ok=True)
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--mode', mode,
+                                '--data', data, '--products', str(products), '--port', str(port)],
+                               stdout=subprocess.PIPE, text=True)
+    if process.stdout.readline().strip() != 'READY':
+        process.kill()
+        raise RuntimeError(f'{mode} server failed to start')
+    time.sleep(1.0)   # uvicorn binds after printing READY
+    return process
+
+
+async def one_client(port, path, hold, timeout):
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        await asyncio.sleep(hold)
+        sent = time.perf_counter()
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+        if not response.startswith((b'HTTP/1.1 200', b'HTTP/1.0 200')):
+            return None
+        return time.perf_counter() - sent
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        writer.close()
+
+
+async def burst(port, path, clients, hold, timeout):
+    results = await asyncio.gather(*(one_client(port, path, hold, timeout) for _ in range(clients)))
+    return [result for result in results if result is not None]
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command')
+    serve_parser = commands.add_parser('serve')
+    serve_parser.add_argument('--mode', choices=('wsgi', 'asgi'), required=True)
+    serve_parser.add_argument('--data', required=True)
+    serve_parser.add_argument('--products', type=int, default=10000)
+    serve_parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--levels', default='100,500,1000,2000')
+    parser.add_argument('--hold', type=float, default=1.0, help='seconds each connection idles before its request')
+    parser.add_argument('--timeout', type=float, default=15.0)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--path', default='/product/1')
+    parser.add_argument('--port', type=int, default=8731)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        return serve(args)
+
+    levels = [int(level) for level in args.levels.split(',')]
+    print(f'{"server":<6} {"clients":>8} {"ok":>7} {"p50 (ms)":>9} {"p99 (ms)":>9} {"max (ms)":>9}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('wsgi', 'asgi'):
+            process = start_server(mode, os.path.join(tmp, mode), args.products, args.port)
+            try:
+                for clients in levels:
+                    results = asyncio.run(burst(args.port, args.path, clients, args.hold, args.timeout))
+                    latencies = sorted(latency * 1000 for latency in results)
+                    p50 = statistics.median(latencies) if latencies else float('nan')
+                    print(f'{mode:<6} {clients:>8} {len(results):>7} {p50:>9.1f} '
+                          f'{percentile(latencies, 99):>9.1f} {percentile(latencies, 100):>9.1f}', flush=True)
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
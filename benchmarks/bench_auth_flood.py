@@ -0,0 +1,107 @@
+"""Catalog latency during a /login flood, with the auth rate limiter off and on.
+
+For each setting a product_details server is started on a real HTTP server
+(as in loadtest.py) and catalog traffic is driven alone, then again while
+flood threads send wrong-password logins for random accounts as fast as
+they are answered:
+
+    python benchmarks/bench_auth_flood.py --products 10000 --users 1000 --duration 10
+
+With the limiter on, the flood should mostly get 429 without hashing and the
+catalog percentiles should stay close to the quiet baseline. The gap is
+widest with ``PASSWORD_HASH_WORKERS=0``, where hashes run on the request
+threads and hold the GIL.
+"""
+import argparse
+import http.client
+import os
+import random
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import Client, Server, drive, summarize  # noqa: E402
+
+
+def catalog_ops(products):
+    return (
+        (60, 'product', lambda rng: ('GET', f'/product/{rng.randint(1, products)}', None)),
+        (40, 'products_page', lambda rng: ('GET', f'/products?limit=50&after={rng.randrange(products)}', None)),
+    )
+
+
+def flood(port, users, threads, stop):
+    """Send bad logins from ``threads`` threads until ``stop`` is set; returns a count per status."""
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(index)
+        client = Client(port)
+        local = {}
+        while not stop.is_set():
+            body = {'email_or_phone': f'user{rng.randrange(users)}@example.com', 'password': 'wrong'}
+            try:
+                status, _ = client.request('POST', '/login', body)
+            except (OSError, http.client.HTTPException):
+                status = 0
+            local[status] = local.get(status, 0) + 1
+        with lock:
+            for status, n in local.items():
+                statuses[status] = statuses.get(status, 0) + n
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    return workers, statuses
+
+
+def measure(port, args):
+    operations = catalog_ops(args.products)
+    drive(port, operations, args.concurrency, args.warmup, args.seed + 1)
+    samples, errors, elapsed = drive(port, operations, args.concurrency, args.duration, args.seed)
+    quiet = summarize([v for values in samples.values() for v in values], sum(errors.values()), elapsed)
+
+    stop = threading.Event()
+    workers, statuses = flood(port, args.users, args.flood_threads, stop)
+    try:
+        samples, errors, elapsed = drive(port, operations, args.concurrency, args.duration, args.seed)
+    finally:
+        stop.set()
+        for thread in workers:
+            thread.join()
+    flooded = summarize([v for values in samples.values() for v in values], sum(errors.values()), elapsed)
+    return quiet, flooded, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=4, help='catalog client threads')
+    parser.add_argument('--flood-threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per phase')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f'{"limiter":<8} {"phase":<8} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}  logins')
+    for enabled in ('0', '1'):
+        os.environ['RATE_LIMIT_ENABLED'] = enabled
+        with tempfile.TemporaryDirectory() as tmp:
+            server = Server('product_details', tmp, args.products, args.users)
+            try:
+                quiet, flooded, statuses = measure(server.port, args)
+            finally:
+                server.close()
+        label = 'on' if enabled == '1' else 'off'
+        logins = ', '.join(f'{status}: {n}' for status, n in sorted(statuses.items()))
+        for phase, stats, note in (('quiet', quiet, ''), ('flood', flooded, logins)):
+            print(f'{label:<8} {phase:<8} {stats["rps"]:>8.1f} {stats["p50_ms"]:>8.1f} {stats["p99_ms"]:>8.1f} '
+                  f'{stats["errors"]:>7}  {note}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
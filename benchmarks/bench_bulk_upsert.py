@@ -0,0 +1,81 @@
+"""POST /products/bulk throughput: inserts, price/stock updates and unchanged re-sends.
+
+Each pass sends ``--rows`` NDJSON records through the endpoint in-process and
+reports rows per second:
+
+    python benchmarks/bench_bulk_upsert.py --rows 100000
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WRITER = 'merchant@example.com'
+
+
+def load_app(db_path):
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{db_path}'
+    os.environ['CATALOG_WRITERS'] = WRITER
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+    spec = importlib.util.spec_from_file_location('bench_app', os.path.join(ROOT, 'homepage_endpoints', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def ndjson(records):
+    return ''.join(json.dumps(record) + '\n' for record in records).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=None, help='override kletos.bulk.DEFAULT_CHUNK_SIZE')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        module = load_app(os.path.join(tmp, 'products.db'))
+        if args.chunk_size:
+            from kletos import bulk
+            bulk.DEFAULT_CHUNK_SIZE = args.chunk_size
+        with module.app.app_context():
+            module.init_db(1)
+        client = module.app.test_client()
+        client.post('/register', json={'email': WRITER, 'phone_number': '0700000000', 'password': 'bench'})
+        token = client.post('/login', json={'email': WRITER, 'password': 'bench'}).json['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        rng = random.Random(0)
+        first = 2
+        passes = (
+            ('insert', [{'name': f'Bulk Product {i}', 'category': f'Category {i % 20}', 'image': f'image_{i}',
+                         'price': round(rng.uniform(10, 1000), 2), 'stock': rng.randrange(100)}
+                        for i in range(args.rows)]),
+            ('update price+stock', [{'id': first + i, 'price': round(rng.uniform(10, 1000), 2),
+                                     'stock': rng.randrange(100, 200)} for i in range(args.rows)]),
+        )
+        passes += (('unchanged re-send', passes[1][1]),)
+
+        print(f'{"pass":<20} {"rows":>8} {"changed":>8} {"seconds":>8} {"rows/s":>9}')
+        for label, records in passes:
+            body = ndjson(records)
+            start = time.perf_counter()
+            response = client.post('/products/bulk', data=body, content_type='application/x-ndjson', headers=headers)
+            elapsed = time.perf_counter() - start
+            result = response.json
+            if response.status_code != 200 or result['failed']:
+                raise RuntimeError(f'{label}: HTTP {response.status_code} {result["errors"][:3]}')
+            changed = result['inserted'] + result['updated']
+            print(f'{label:<20} {len(records):>8} {changed:>8} {elapsed:>8.2f} {len(records) / elapsed:>9.0f}',
+                  flush=True)
+
+
+if __name__ == '__main__':
+    main()
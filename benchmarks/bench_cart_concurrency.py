@@ -0,0 +1,84 @@
+"""Fire concurrent /cart/add requests across many users and verify every cart.
+
+Each user's final quantities must equal the sum of what was added for them and
+each stored total must match price * quantity, proving no increment was lost:
+
+    python benchmarks/bench_cart_concurrency.py --users 200 --adds 5000 --threads 32
+"""
+import argparse
+import importlib.util
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(db_path):
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{db_path}'
+    spec = importlib.util.spec_from_file_location('bench_app', os.path.join(ROOT, 'product_details', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--adds', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        module = load_app(os.path.join(tmp, 'products.db'))
+        app, db = module.app, module.db
+        with app.app_context():
+            module.init_db(args.products)
+            from flask_jwt_extended import create_access_token
+            tokens = {user: create_access_token(identity=user) for user in range(1, args.users + 1)}
+            prices = dict(db.session.query(module.Product.id, module.Product.price).all())
+
+        rng = random.Random(0)
+        plan = [(rng.randint(1, args.users), rng.randint(1, args.products), rng.randint(1, 3))
+                for _ in range(args.adds)]
+
+        def add(step):
+            user, product_id, quantity = step
+            response = app.test_client().post(
+                '/cart/add', json={'product_id': product_id, 'quantity': quantity},
+                headers={'Authorization': f'Bearer {tokens[user]}'})
+            return response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            statuses = list(pool.map(add, plan))
+        elapsed = time.perf_counter() - start
+
+        expected = defaultdict(lambda: defaultdict(int))
+        for user, product_id, quantity in plan:
+            expected[user][product_id] += quantity
+
+        errors = sum(status != 200 for status in statuses)
+        mismatches = 0
+        for user, lines in expected.items():
+            body = app.test_client().get('/cart', headers={'Authorization': f'Bearer {tokens[user]}'}).get_json()
+            actual = {item['product_id']: item['quantity'] for item in body['cart']['items']}
+            total = sum(prices[product_id] * quantity for product_id, quantity in lines.items())
+            if actual != dict(lines) or not math.isclose(body['cart']['total_price'], total, rel_tol=1e-9):
+                mismatches += 1
+
+    print(f'{args.adds} adds, {args.users} users, {args.threads} threads')
+    print(f'throughput: {args.adds / elapsed:.0f} adds/s ({elapsed:.2f}s)')
+    print(f'non-200 responses: {errors}')
+    print(f'carts with lost or wrong updates: {mismatches} / {len(expected)}')
+    sys.exit(1 if errors or mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Cold start: fresh interpreter to first response, for each entry point.
+
+Every sample is a new process that imports an app and serves one request
+through the test client, against a catalog seeded beforehand. Pass
+``--before`` to time an earlier revision as well, for example the last
+commit that still had separate homepage and product-details apps:
+
+    python benchmarks/bench_cold_start.py --before HEAD~1 --products 10000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ('homepage_endpoints/app.py', 'product_details/app.py')
+
+LOAD_APP = '''
+import time
+start = time.perf_counter()
+import importlib.util, sys
+spec = importlib.util.spec_from_file_location("bench_app", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+{body}
+'''
+
+SEED = LOAD_APP.format(body='''
+with module.app.app_context():
+    module.init_db(int(sys.argv[2]))
+''')
+
+FIRST_RESPONSE = LOAD_APP.format(body='''
+status = module.app.test_client().get(sys.argv[2]).status_code
+assert status == 200, status
+print(imported - start, time.perf_counter() - imported)
+''')
+
+
+def checkout(revision, destination):
+    archive = os.path.join(destination, 'tree.tar')
+    with open(archive, 'wb') as fh:
+        subprocess.run(['git', 'archive', revision], cwd=ROOT, stdout=fh, check=True)
+    tree = os.path.join(destination, 'tree')
+    with tarfile.open(archive) as tar:
+        tar.extractall(tree)
+    return tree
+
+
+def run(script, app_path, db_path, *args):
+    env = dict(os.environ, PRODUCTS_DATABASE_URI=f'sqlite:///{db_path}')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', script, app_path, *args],
+                            env=env, check=True, capture_output=True, text=True)
+    return result.stdout.strip(), time.perf_counter() - start
+
+
+def measure(tree, label, args):
+    for entry in ENTRY_POINTS:
+        app_path = os.path.join(tree, entry)
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'products.db')
+            run(SEED, app_path, db_path, str(args.products))
+            imports, firsts, walls = [], [], []
+            for _ in range(args.repeat):
+                out, wall = run(FIRST_RESPONSE, app_path, db_path, args.path)
+                import_s, first_s = (float(value) for value in out.split())
+                imports.append(import_s * 1000)
+                firsts.append(first_s * 1000)
+                walls.append(wall * 1000)
+        print(f'{label:<10} {entry:<28} {statistics.median(imports):>11.1f} {statistics.median(firsts):>14.1f} '
+              f'{statistics.median(walls):>15.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--before', help='git revision to compare against the working tree')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--path', default='/products?limit=50')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"tree":<10} {"entry point":<28} {"import (ms)":>11} {"first req (ms)":>14} {"process (ms)":>15}')
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.before:
+            measure(checkout(args.before, tmp), args.before, args)
+        measure(ROOT, 'current', args)
+
+
+if __name__ == '__main__':
+    main()
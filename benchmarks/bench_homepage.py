@@ -0,0 +1,146 @@
+"""Landing page data: six per-section requests versus one /homepage bundle.
+
+Each iteration fetches everything the landing page needs, three ways:
+sequentially over one keep-alive connection, in parallel over six fresh
+connections (what a browser does on first load), and as a single /homepage
+request. ``--rtt`` adds that many milliseconds per round trip on the client
+to model a mobile network; a fresh connection costs one extra round trip
+for TCP, plus ``--tls-rtts`` for the handshake:
+
+    python benchmarks/bench_homepage.py --iterations 300 --rtt 80
+"""
+import argparse
+import http.client
+import importlib.util
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SECTION_PATHS = ('/hero-content', '/categories', '/featured-products', '/highlighted-product',
+                 '/footer-content', '/products')
+
+
+def serve(args):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{os.path.join(args.data, "products.db")}'
+    spec = importlib.util.spec_from_file_location('bench_app', os.path.join(ROOT, 'homepage_endpoints', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    with module.app.app_context():
+        module.init_db(args.products)
+
+    class RequestHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, module.app, threaded=True, request_handler=RequestHandler)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f'READY {server.server_port}', flush=True)
+    server.serve_forever()
+
+
+def fetch(conn, path, rtt):
+    time.sleep(rtt)
+    conn.request('GET', path)
+    response = conn.getresponse()
+    body = response.read()
+    if response.status != 200:
+        raise RuntimeError(f'{path}: HTTP {response.status}')
+    return len(body)
+
+
+def connect(port, rtt, tls_rtts):
+    time.sleep(rtt * (1 + tls_rtts))
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.connect()
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command')
+    serve_parser = commands.add_parser('serve')
+    serve_parser.add_argument('--data', required=True)
+    serve_parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--rtt', type=float, default=0.0, help='simulated network round trip, in ms')
+    parser.add_argument('--tls-rtts', type=int, default=1, help='extra round trips to set up a fresh connection')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        return serve(args)
+
+    rtt = args.rtt / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--data', tmp,
+                                    '--products', str(args.products)], stdout=subprocess.PIPE, text=True)
+        try:
+            ready = process.stdout.readline().split()
+            if not ready or ready[0] != 'READY':
+                raise RuntimeError('server failed to start')
+            port = int(ready[1])
+            keep_alive = connect(port, rtt, args.tls_rtts)
+            pool = ThreadPoolExecutor(max_workers=len(SECTION_PATHS))
+
+            def sequential():
+                return sum(fetch(keep_alive, path, rtt) for path in SECTION_PATHS)
+
+            def fresh_parallel():
+                def one(path):
+                    conn = connect(port, rtt, args.tls_rtts)
+                    try:
+                        return fetch(conn, path, rtt)
+                    finally:
+                        conn.close()
+                return sum(pool.map(one, SECTION_PATHS))
+
+            def bundle():
+                return fetch(keep_alive, '/homepage', rtt)
+
+            def fresh_bundle():
+                conn = connect(port, rtt, args.tls_rtts)
+                try:
+                    return fetch(conn, '/homepage', rtt)
+                finally:
+                    conn.close()
+
+            print(f'{"strategy":<28} {"requests":>8} {"bytes":>7} {"p50 (ms)":>9} {"p95 (ms)":>9}')
+            for label, requests, run in (('fan-out, keep-alive', len(SECTION_PATHS), sequential),
+                                         ('fan-out, 6 new connections', len(SECTION_PATHS), fresh_parallel),
+                                         ('/homepage, keep-alive', 1, bundle),
+                                         ('/homepage, new connection', 1, fresh_bundle)):
+                size = run()   # warm the caches
+                timings = []
+                for _ in range(args.iterations):
+                    start = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                print(f'{label:<28} {requests:>8} {size:>7} {statistics.median(timings):>9.2f} '
+                      f'{timings[int(len(timings) * 0.95) - 1]:>9.2f}', flush=True)
+            keep_alive.close()
+            pool.shutdown()
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
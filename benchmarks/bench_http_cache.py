@@ -0,0 +1,74 @@
+"""Database hit rate for repeat catalog traffic with and without conditional GETs.
+
+Each path is requested once to obtain its ETag, then replayed many times the
+way a browser or CDN revalidates. The SQL statement count shows how often the
+database is touched:
+
+    python benchmarks/bench_http_cache.py --requests 2000
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kletos.instrumentation import count_queries  # noqa: E402
+
+PATHS = (
+    '/products?limit=50',
+    '/product/1',
+    '/products-by-category?category=Rings&sort=price',
+    '/categories/facets',
+    '/hero-content',
+    '/footer-content',
+)
+
+
+def load_app(db_path):
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{db_path}'
+    spec = importlib.util.spec_from_file_location('bench_app', os.path.join(ROOT, 'homepage_endpoints', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def replay(client, engine, requests, conditional):
+    etags = {path: client.get(path).headers.get('ETag') for path in PATHS}
+    statuses = {}
+    with count_queries(engine) as queries:
+        start = time.perf_counter()
+        for i in range(requests):
+            path = PATHS[i % len(PATHS)]
+            headers = {'If-None-Match': etags[path]} if conditional and etags[path] else {}
+            status = client.get(path, headers=headers).status_code
+            statuses[status] = statuses.get(status, 0) + 1
+        elapsed = time.perf_counter() - start
+    return queries.count, elapsed, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        module = load_app(os.path.join(tmp, 'products.db'))
+        with module.app.app_context():
+            module.init_db(args.products)
+            engine = module.db.engine
+        client = module.app.test_client()
+
+        print(f'{args.requests} requests over {len(PATHS)} paths, {args.products} products')
+        print(f'{"mode":<14} {"SQL/request":>12} {"req/s":>8}  statuses')
+        for mode, conditional in (('unconditional', False), ('If-None-Match', True)):
+            statements, elapsed, statuses = replay(client, engine, args.requests, conditional)
+            print(f'{mode:<14} {statements / args.requests:>12.3f} {args.requests / elapsed:>8.0f}  {statuses}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Image derivative rendering throughput, per process and per core.
+
+Synthetic photos are stored in a temporary BlobStore and rendered to every
+width and format in kletos.images on a process pool of each size given,
+as the storefront's ImagePipeline does. Also reports how many bytes a client
+loads for the 640w WebP instead of the original:
+
+    python benchmarks/bench_images.py --images 40 --size 2400x1600 --workers 1,2,4
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kletos.blobstore import BlobStore  # noqa: E402
+from kletos.credentials import pool_context  # noqa: E402
+from kletos.images import IMAGE_WIDTHS, render_derivatives  # noqa: E402
+
+
+def synthetic_photo(width, height, seed):
+    """A JPEG with gradients and noise, so encoders do photo-like work rather than compress flat colour."""
+    from PIL import Image, ImageFilter
+
+    rng = random.Random(seed)
+    noise = Image.effect_noise((width, height), rng.uniform(30, 80)).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((width, height)).rotate(rng.randrange(360))
+    colour = Image.new('RGB', (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    image = Image.composite(colour, noise, gradient).filter(ImageFilter.GaussianBlur(2))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=40)
+    parser.add_argument('--size', default='2400x1600', help='source WIDTHxHEIGHT')
+    parser.add_argument('--workers', default=f'1,{os.cpu_count() or 1}')
+    args = parser.parse_args()
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        raise SystemExit('bench_images.py needs Pillow')
+    width, height = (int(part) for part in args.size.split('x'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = BlobStore(os.path.join(tmp, 'sources'))
+        originals = [synthetic_photo(width, height, seed) for seed in range(args.images)]
+        digests = [sources.put_bytes(data)[0] for data in originals]
+        print(f'{args.images} sources of {width}x{height}, {sum(map(len, originals)) / len(originals) / 1024:.0f} KiB '
+              f'on average; widths {", ".join(map(str, IMAGE_WIDTHS))} as WebP and JPEG')
+
+        print(f'{"workers":>7} {"seconds":>8} {"images/s":>9} {"per core":>9}')
+        result = None
+        for workers in sorted({int(part) for part in args.workers.split(',')}):
+            # A fresh output store per run, so every run renders and writes everything
+            root = os.path.join(tmp, f'out{workers}')
+            store = BlobStore(root)
+            for digest, data in zip(digests, originals):
+                store.put_bytes(data)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(('kletos.images',))) as pool:
+                # Start the workers before timing
+                list(pool.map(abs, range(workers)))
+                start = time.perf_counter()
+                results = list(pool.map(render_derivatives, [root] * len(digests), digests))
+                elapsed = time.perf_counter() - start
+            result = result or (store, results)
+            cores = min(workers, os.cpu_count() or 1)
+            print(f'{workers:>7} {elapsed:>8.2f} {len(digests) / elapsed:>9.1f} {len(digests) / elapsed / cores:>9.1f}',
+                  flush=True)
+
+        store, results = result
+        for label, mimetype in (('640w WebP', 'image/webp'), ('640w JPEG', 'image/jpeg')):
+            sizes = [os.path.getsize(store.path(digest)) for rendered in results
+                     for kind, variant_width, digest in rendered['variants']
+                     if kind == mimetype and variant_width == min(640, width)]
+            average = sum(sizes) / len(sizes)
+            print(f'{label}: {average / 1024:.0f} KiB on average, '
+                  f'{average / (sum(map(len, originals)) / len(originals)):.1%} of the original')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Login latency and throughput with inline hashing versus the hashing pool.
+
+    python benchmarks/bench_login.py --logins 400 --threads 16
+    PASSWORD_HASH_ALGORITHM=scrypt python benchmarks/bench_login.py
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(db_path):
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{db_path}'
+    # Every login comes from one address; measure hashing, not the rate limiter
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    spec = importlib.util.spec_from_file_location('bench_app', os.path.join(ROOT, 'product_details', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(module, users, logins, threads):
+    def login(i):
+        body = {'email_or_phone': f'user{i % users}@example.com', 'password': 'Passw0rd!'}
+        start = time.perf_counter()
+        status = module.app.test_client().post('/login', json=body).status_code
+        assert status == 200, status
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(login, range(logins)))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--logins', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        module = load_app(os.path.join(tmp, 'products.db'))
+        with module.app.app_context():
+            module.init_db()
+        client = module.app.test_client()
+        for i in range(args.users):
+            client.post('/register', json={'email': f'user{i}@example.com', 'phone_number': f'07{i:08d}',
+                                           'password': 'Passw0rd!'})
+
+        print(f'policy {module.hasher.policy.method}, {args.logins} logins over {args.threads} threads')
+        print(f'{"mode":<12} {"p50 (ms)":>9} {"p99 (ms)":>9} {"logins/s":>9} {"per core":>9}')
+        for mode, workers in (('inline', 0), ('pool', args.workers)):
+            module.hasher.shutdown()
+            module.hasher.workers = workers
+            run(module, args.users, min(args.logins, 2 * args.threads), args.threads)  # warm up
+            latencies, elapsed = run(module, args.users, args.logins, args.threads)
+            cores = max(1, workers)
+            rate = args.logins / elapsed
+            print(f'{mode:<12} {statistics.median(latencies):>9.1f} {percentile(latencies, 99):>9.1f} '
+                  f'{rate:>9.1f} {rate / cores:>9.1f}')
+        module.hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Instrumentation overhead: cost per histogram observation and per instrumented request.
+
+    python benchmarks/bench_metrics_overhead.py --requests 2000
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kletos import metrics  # noqa: E402
+
+
+def load_app(db_path):
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{db_path}'
+    spec = importlib.util.spec_from_file_location('bench_app', os.path.join(ROOT, 'homepage_endpoints', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def per_call_us(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--observations', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    histogram = metrics.Histogram('bench_seconds', 'Benchmark.', ('route',))
+    print(f'observe():        {per_call_us(lambda: histogram.observe(0.003, "/bench"), args.observations):.2f} us')
+
+    def timed_block():
+        with histogram.time('/bench'):
+            pass
+    print(f'with time():      {per_call_us(timed_block, args.observations):.2f} us')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        module = load_app(os.path.join(tmp, 'products.db'))
+        with module.app.app_context():
+            module.init_db(1000)
+        client = module.app.test_client()
+        client.get('/product/1')
+
+        def request():
+            client.get('/product/1')
+        instrumented = per_call_us(request, args.requests)
+        # Detach the request hooks to measure the same request uninstrumented
+        hooks = (module.app.before_request_funcs, module.app.after_request_funcs,
+                 module.app.teardown_request_funcs)
+        saved = [list(funcs.get(None, [])) for funcs in hooks]
+        for funcs in hooks:
+            funcs[None] = [fn for fn in funcs.get(None, []) if fn.__module__ != metrics.__name__]
+        bare = per_call_us(request, args.requests)
+        for funcs, original in zip(hooks, saved):
+            funcs[None] = original
+        print(f'GET /product/1:   {bare:.1f} us bare, {instrumented:.1f} us instrumented '
+              f'({instrumented - bare:+.1f} us)')
+        start = time.perf_counter()
+        body = client.get('/metrics').get_data()
+        print(f'GET /metrics:     {(time.perf_counter() - start) * 1000:.1f} ms, {len(body)} bytes')
+
+
+if __name__ == '__main__':
+    main()
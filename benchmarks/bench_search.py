@@ -0,0 +1,89 @@
+"""Compare FTS5 search against a LIKE '%q%' scan on a generated catalog.
+
+    python benchmarks/bench_search.py --products 1000000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kletos.catalog import CATALOG_MIGRATIONS  # noqa: E402
+from kletos.fixtures import generate_products, load_products  # noqa: E402
+from kletos.search import CATEGORY_WEIGHT, NAME_WEIGHT, SEARCH_SQL, build_match  # noqa: E402
+
+QUERIES = ('gold', 'neck', 'twisted pearl', 'vintage ear', 'necklace 4242', 'sapphire')
+
+
+
+def like_sql(terms, limit=True):
+    where = ' AND '.join(["(name || ' ' || category) LIKE ?"] * len(terms))
+    sql = f'SELECT id, name, category, image, price FROM product WHERE {where}'
+    return sql + ' LIMIT ?' if limit else sql
+
+
+class _Conn:
+    """Adapts sqlite3 to the connection.execute() calls made by migrations."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *params):
+        return self.conn.execute(sql, *params)
+
+
+def build_catalog(path, count):
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE product (
+                        id INTEGER NOT NULL PRIMARY KEY,
+                        name VARCHAR(100) NOT NULL,
+                        category VARCHAR(50) NOT NULL,
+                        image VARCHAR(255) NOT NULL,
+                        price FLOAT NOT NULL)''')
+    for _, apply in CATALOG_MIGRATIONS:
+        apply(_Conn(conn))
+    load_products(conn, generate_products(count))
+    return conn
+
+
+def timed(conn, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        conn = build_catalog(os.path.join(tmp, 'products.db'), args.products)
+        print(f'built {args.products} products in {time.perf_counter() - start:.1f}s\n')
+
+        fts_sql = SEARCH_SQL.format(keyset='', name_weight=NAME_WEIGHT, category_weight=CATEGORY_WEIGHT)
+        # "like page" stops at the first `limit` unranked hits; "like all" reads
+        # every match, which is the least a relevance-ranked LIKE search must do.
+        print(f'{"query":<16} {"matches":>8} {"fts5 (ms)":>10} {"like page (ms)":>15} {"like all (ms)":>13}')
+        for query in QUERIES:
+            fts_ms, _ = timed(conn, fts_sql, {'match': build_match(query), 'limit': args.limit}, args.repeat)
+            patterns = ['%' + term + '%' for term in query.split()]
+            page_ms, _ = timed(conn, like_sql(patterns), (*patterns, args.limit), args.repeat)
+            all_ms, matches = timed(conn, like_sql(patterns, limit=False), patterns, args.repeat)
+            print(f'{query:<16} {matches:>8} {fts_ms:>10.2f} {page_ms:>15.2f} {all_ms:>13.2f}')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
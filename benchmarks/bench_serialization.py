@@ -0,0 +1,83 @@
+"""Listing serialization: ORM objects + jsonify versus tuples + fragment encoding.
+
+    python benchmarks/bench_serialization.py --sizes 10000,100000
+    JSON_BACKEND=json python benchmarks/bench_serialization.py
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kletos import serializers  # noqa: E402
+from kletos.pagination import keyset_page  # noqa: E402
+
+
+def load_app(db_path):
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{db_path}'
+    spec = importlib.util.spec_from_file_location('bench_app', os.path.join(ROOT, 'homepage_endpoints', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def orm_jsonify(module, size):
+    from flask import jsonify
+    products = module.Product.query.order_by(module.Product.id).limit(size).all()
+    products_list = [
+        {
+            "id": product.id,
+            "name": product.name,
+            "category": product.category,
+            "image": product.image,
+            "price": product.price
+        } for product in products
+    ]
+    return jsonify({"products": products_list}).get_data()
+
+
+def tuples_fragments(module, size):
+    rows, next_after = keyset_page(module.db.session, module.Product, serializers.PRODUCT_FIELDS, limit=size)
+    return serializers.listing_body(serializers.PRODUCT_FIELDS, rows, next_after=next_after)
+
+
+def timed(fn, repeat, reset=None):
+    timings = []
+    for _ in range(repeat):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        module = load_app(os.path.join(tmp, 'products.db'))
+        with module.app.app_context():
+            module.init_db(max(sizes))
+        print(f'JSON backend: {serializers.backend_name}')
+        print(f'{"rows":>8} {"orm+jsonify (ms)":>17} {"tuples cold (ms)":>17} {"tuples warm (ms)":>17}')
+        for size in sizes:
+            with module.app.test_request_context():
+                old = timed(lambda: orm_jsonify(module, size), args.repeat)
+                cold = timed(lambda: tuples_fragments(module, size), args.repeat,
+                             reset=lambda: serializers.fragments._fragments.clear())
+                warm = timed(lambda: tuples_fragments(module, size), args.repeat)
+            print(f'{size:>8} {old:>17.1f} {cold:>17.1f} {warm:>17.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Concurrent signup inserts: connection-per-request versus the tuned pool.
+
+"before" opens a fresh connection per insert in the default rollback-journal
+mode, as validation/app.py used to; "after" borrows from ConnectionPool (WAL,
+busy timeout, synchronous=NORMAL). Password hashing is left out so the
+numbers reflect the database path alone:
+
+    python benchmarks/bench_signup_concurrency.py --inserts 5000 --threads 16
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kletos.sqlite import ConnectionPool  # noqa: E402
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT,
+                email TEXT UNIQUE,
+                password TEXT,
+                phone TEXT)'''
+INSERT = 'INSERT INTO users (username, email, password, phone) VALUES (?, ?, ?, ?)'
+
+
+def row(i):
+    return (f'user{i}', f'user{i}@example.com', 'pbkdf2:sha256:260000$salt$hash', '0712345678')
+
+
+def before(path):
+    def insert(i):
+        conn = sqlite3.connect(path)
+        try:
+            with conn:
+                conn.execute(INSERT, row(i))
+        finally:
+            conn.close()
+    return insert, lambda: None
+
+
+def after(path):
+    pool = ConnectionPool(path, size=32)
+
+    def insert(i):
+        with pool.connection() as conn:
+            conn.execute(INSERT, row(i))
+            conn.commit()
+    return insert, pool.close
+
+
+def run(name, factory, inserts, threads):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute(SCHEMA)
+        insert, close = factory(path)
+
+        def attempt(i):
+            try:
+                insert(i)
+                return None
+            except sqlite3.OperationalError as e:
+                return str(e)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            failures = [error for error in pool.map(attempt, range(inserts)) if error]
+        elapsed = time.perf_counter() - start
+        close()
+    print(f'{name:<8} {inserts / elapsed:>12.0f} {len(failures):>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--inserts', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    print(f'{args.inserts} inserts over {args.threads} threads')
+    print(f'{"mode":<8} {"inserts/s":>12} {"failures":>9}')
+    run('before', before, args.inserts, args.threads)
+    run('after', after, args.inserts, args.threads)
+
+
+if __name__ == '__main__':
+    main()
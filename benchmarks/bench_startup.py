@@ -0,0 +1,61 @@
+"""Measure app import time against catalogs of increasing size.
+
+Import must not touch the product table, so the timings should stay flat
+whatever the row count:
+
+    python benchmarks/bench_startup.py --app homepage_endpoints/app.py --sizes 0,10000,1000000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOAD_APP = '''
+import importlib.util, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("bench_app", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+{body}
+'''
+
+SEED = LOAD_APP.format(body='''
+with module.app.app_context():
+    module.init_db(int(sys.argv[2]))
+''')
+
+TIME_IMPORT = LOAD_APP.format(body='''
+print(time.perf_counter() - start)
+''')
+
+
+def run(script, app_path, db_path, *args):
+    env = dict(os.environ, PRODUCTS_DATABASE_URI=f'sqlite:///{db_path}')
+    result = subprocess.run([sys.executable, '-c', script, app_path, *args],
+                            env=env, cwd=ROOT, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default='homepage_endpoints/app.py')
+    parser.add_argument('--sizes', default='0,10000,100000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app_path = os.path.join(ROOT, args.app)
+    print(f'{"products":>10} {"import p50 (ms)":>16} {"import max (ms)":>16}')
+    for size in (int(s) for s in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'products.db')
+            run(SEED, app_path, db_path, str(size))
+            timings = [float(run(TIME_IMPORT, app_path, db_path)) * 1000 for _ in range(args.repeat)]
+        print(f'{size:>10} {statistics.median(timings):>16.1f} {max(timings):>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
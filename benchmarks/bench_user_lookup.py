@@ -0,0 +1,103 @@
+"""User lookups at scale: the old email-OR-phone filter versus index probes on normalized columns.
+
+Seeds ``--users`` accounts (1M by default), then times logins by email and by
+phone number both ways, and registrations that succeed or hit a taken email:
+
+    python benchmarks/bench_user_lookup.py --users 1000000 --lookups 2000
+"""
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED_CHUNK = 50000
+# Lookups don't verify passwords, so every row can share one placeholder hash
+PASSWORD_HASH = 'pbkdf2_sha256$1$bench$' + '0' * 64
+
+
+def load_app(db_path):
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{db_path}'
+    spec = importlib.util.spec_from_file_location('bench_app', os.path.join(ROOT, 'homepage_endpoints', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed_users(module, users):
+    connection = module.db.engine.raw_connection()
+    try:
+        for start in range(0, users, SEED_CHUNK):
+            connection.executemany(
+                'INSERT INTO "user" (email, phone_number, password_hash, email_normalized, phone_normalized) '
+                'VALUES (?, ?, ?, ?, ?)',
+                ((f'user{i}@example.com', f'07{i:08d}', PASSWORD_HASH, f'user{i}@example.com', f'07{i:08d}')
+                 for i in range(start, min(users, start + SEED_CHUNK))))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def per_call_ms(fn, values):
+    start = time.perf_counter()
+    for value in values:
+        fn(value)
+    return (time.perf_counter() - start) / len(values) * 1000
+
+
+def query_plan(module, query):
+    statement = query.statement.compile(module.db.engine, compile_kwargs={'literal_binds': True})
+    rows = module.db.session.execute(f'EXPLAIN QUERY PLAN {statement}').fetchall()
+    return '; '.join(row[-1] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--registrations', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        module = load_app(os.path.join(tmp, 'products.db'))
+        from kletos.accounts import find_user, register_user
+
+        User = module.User
+        with module.app.app_context():
+            module.init_db()
+            start = time.perf_counter()
+            seed_users(module, args.users)
+            print(f'seeded {args.users} users in {time.perf_counter() - start:.1f}s')
+
+            def or_filter(value):
+                return User.query.filter((User.email == value) | (User.phone_number == value)).first()
+
+            def probe(value):
+                return find_user(User, value)
+
+            rng = random.Random(1)
+            emails = [f'user{rng.randrange(args.users)}@example.com' for _ in range(args.lookups)]
+            phones = [f'07{rng.randrange(args.users):08d}' for _ in range(args.lookups)]
+
+            print(f'OR filter plan:  {query_plan(module, User.query.filter((User.email == "x") | (User.phone_number == "x")))}')
+            print(f'probe plan:      {query_plan(module, User.query.filter(User.phone_normalized == "x"))}')
+            print(f'{"lookup":<8} {"OR filter (ms)":>15} {"index probe (ms)":>17}')
+            for label, values in (('email', emails), ('phone', phones)):
+                print(f'{label:<8} {per_call_ms(or_filter, values):>15.3f} {per_call_ms(probe, values):>17.3f}')
+
+            fresh = iter(range(args.users, args.users + args.registrations))
+            new_ms = per_call_ms(lambda _: register_user(module.db.session, f'user{next(fresh)}@example.com',
+                                                         f'+44 {next(fresh)}', PASSWORD_HASH),
+                                 range(args.registrations // 2))
+            taken_ms = per_call_ms(lambda value: register_user(module.db.session, value, '0', PASSWORD_HASH),
+                                   emails[:args.registrations])
+            print(f'register: new account {new_ms:.3f} ms, taken email {taken_ms:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+"""Reproducible load test for every app, with a JSON baseline and regression check.
+
+Each app is started in its own process on a real HTTP server, against
+databases generated in a temporary directory, and driven by a pool of
+keep-alive client threads running a weighted mix of requests. Throughput
+and p50/p95/p99 latency per scenario and per operation are written to a
+baseline file that a later run can be compared with:
+
+    python benchmarks/loadtest.py run --products 100000 --users 100000 --output before.json
+    python benchmarks/loadtest.py run --products 100000 --users 100000 --output after.json
+    python benchmarks/loadtest.py compare before.json after.json --tolerance 0.10
+
+``compare`` exits with status 1 when any operation lost more than
+``--tolerance`` of its throughput or gained that much p95/p99 latency.
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from itertools import count
+from urllib.parse import quote_plus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kletos.fixtures import CATEGORIES, MATERIALS, STYLES  # noqa: E402
+
+PASSWORD = 'Passw0rd!x'
+SEED_CHUNK = 10000
+
+
+# --- server side -------------------------------------------------------------
+
+def load_app(name):
+    spec = importlib.util.spec_from_file_location(f'loadtest_{name}', os.path.join(ROOT, name, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed_catalog_users(module, users):
+    """Insert ``user<i>@example.com`` accounts sharing one precomputed hash."""
+    password_hash = module.hasher.hash(PASSWORD)
+    table = module.User.__table__
+    with module.app.app_context():
+        for start in range(0, users, SEED_CHUNK):
+            module.db.session.execute(table.insert(), [
+                {'email': f'user{i}@example.com', 'phone_number': f'07{i:08d}', 'password_hash': password_hash,
+                 'email_normalized': f'user{i}@example.com', 'phone_normalized': f'07{i:08d}'}
+                for i in range(start, min(users, start + SEED_CHUNK))
+            ])
+        module.db.session.commit()
+
+
+def seed_signup_users(module, users):
+    password_hash = module.hasher.hash(PASSWORD)
+    with module.db_pool.connection() as conn:
+        conn.executemany('INSERT INTO users (username, email, password, phone) VALUES (?, ?, ?, ?)',
+                         ((f'user{i}', f'user{i}@example.com', password_hash, f'07{i:08d}')
+                          for i in range(users)))
+        conn.commit()
+
+
+def serve(args):
+    """Prepare the databases for one app, then serve it until killed."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    os.environ['PRODUCTS_DATABASE_URI'] = f'sqlite:///{os.path.join(args.data, "products.db")}'
+    os.environ['USERS_DATABASE_PATH'] = os.path.join(args.data, 'users.db')
+    os.environ['BLOB_STORE_PATH'] = os.path.join(args.data, 'blobs')
+    # All client threads share one address, which the auth rate limiter would
+    # throttle; benchmarks/bench_auth_flood.py measures it with the limiter on
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    module = load_app(args.app)
+    if hasattr(module, 'init_db'):
+        with module.app.app_context():
+            module.init_db(args.products)
+    if args.users and hasattr(module, 'User'):
+        seed_catalog_users(module, args.users)
+    elif args.users and hasattr(module, 'db_pool'):
+        seed_signup_users(module, args.users)
+
+    class RequestHandler(WSGIRequestHandler):
+        # HTTP/1.1 so client threads reuse their connection between requests, and
+        # no Nagle delay between the separately written headers and body
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, module.app, threaded=True, request_handler=RequestHandler)
+    # Exit cleanly on terminate so the hashing pool's workers are shut down too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f'READY {server.server_port}', flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if hasattr(module, 'hasher'):
+            module.hasher.shutdown()
+
+
+class Server:
+
+    def __init__(self, app, data, products, users):
+        os.makedirs(data, exist_ok=True)
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'serve', '--app', app, '--data', data,
+             '--products', str(products), '--users', str(users)],
+            stdout=subprocess.PIPE, text=True)
+        line = self.process.stdout.readline()
+        if not line.startswith('READY '):
+            self.process.kill()
+            raise RuntimeError(f'{app} failed to start')
+        self.port = int(line.split()[1])
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+# --- traffic -----------------------------------------------------------------
+
+class Client:
+    """One keep-alive connection; reconnects when the server drops it."""
+
+    def __init__(self, port, token=None):
+        self.port = port
+        self.headers = {'Content-Type': 'application/json'}
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body) if body is not None else None
+        for attempt in (0, 1):
+            try:
+                self.conn.request(method, path, payload, self.headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, data
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+                if attempt:
+                    raise
+
+
+def search_term(rng):
+    return quote_plus(rng.choice((rng.choice(MATERIALS), rng.choice(STYLES), rng.choice(CATEGORIES)[:3].lower())))
+
+
+def browse_ops(products):
+    return (
+        (30, 'product', lambda rng: ('GET', f'/product/{rng.randint(1, products)}', None)),
+        (20, 'products_page', lambda rng: ('GET', f'/products?limit=50&after={rng.randrange(products)}', None)),
+        (25, 'category_page', lambda rng: ('GET', f'/products-by-category?category={quote_plus(rng.choice(CATEGORIES))}'
+                                                  f'&sort={rng.choice(("id", "price", "-price"))}', None)),
+        (10, 'category_facets', lambda rng: ('GET', '/categories/facets', None)),
+        (5, 'hero', lambda rng: ('GET', '/hero-content', None)),
+        (5, 'featured', lambda rng: ('GET', '/featured-products', None)),
+        (5, 'footer', lambda rng: ('GET', '/footer-content', None)),
+    )
+
+
+def search_ops(products):
+    return (
+        (70, 'search', lambda rng: ('GET', f'/search?q={search_term(rng)}', None)),
+        (20, 'search_two_terms', lambda rng: ('GET', f'/search?q={search_term(rng)}+{search_term(rng)}', None)),
+        (10, 'product', lambda rng: ('GET', f'/product/{rng.randint(1, products)}', None)),
+    )
+
+
+def cart_ops(products):
+    return (
+        (50, 'cart_add', lambda rng: ('POST', '/cart/add',
+                                      {'product_id': rng.randint(1, products), 'quantity': rng.randint(1, 3)})),
+        (40, 'cart_view', lambda rng: ('GET', '/cart', None)),
+        (10, 'product', lambda rng: ('GET', f'/product/{rng.randint(1, products)}', None)),
+    )
+
+
+_signup_ids = count()
+
+
+def auth_ops(users, run_id):
+    def signup(rng):
+        n = next(_signup_ids)
+        return ('POST', '/signup', {'username': f'load{run_id}x{n}', 'email': f'load{run_id}x{n}@example.com',
+                                    'password': PASSWORD, 'confirmPassword': PASSWORD,
+                                    'phone': f'07{n % 10 ** 8:08d}'})
+
+    def login(rng):
+        return ('POST', '/login', {'email': f'user{rng.randrange(users)}@example.com', 'password': PASSWORD})
+
+    return ((20, 'signup', signup), (80, 'login', login))
+
+
+SCENARIOS = {
+    # name: (app, uses tokens, operations(args, run_id))
+    'browse': ('homepage_endpoints', False, lambda args, run_id: browse_ops(args.products)),
+    'search': ('product_details', False, lambda args, run_id: search_ops(args.products)),
+    'cart': ('product_details', True, lambda args, run_id: cart_ops(args.products)),
+    'auth': ('validation', False, lambda args, run_id: auth_ops(args.users, run_id)),
+}
+
+
+def login_token(port, user):
+    status, body = Client(port).request('POST', '/login', {'email_or_phone': f'user{user}@example.com',
+                                                           'password': PASSWORD})
+    if status != 200:
+        raise RuntimeError(f'login for cart traffic failed with {status}')
+    return json.loads(body)['token']
+
+
+def drive(port, operations, concurrency, duration, seed, tokens=None):
+    """Run ``operations`` from ``concurrency`` threads for ``duration`` seconds."""
+    weights = [weight for weight, _, _ in operations]
+    samples = {name: [] for _, name, _ in operations}
+    errors = {name: 0 for _, name, _ in operations}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(port, tokens[index] if tokens else None)
+        local = {name: [] for name in samples}
+        local_errors = dict.fromkeys(samples, 0)
+        while time.perf_counter() < deadline:
+            _, name, build = rng.choices(operations, weights)[0]
+            method, path, body = build(rng)
+            start = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body)
+            except (OSError, http.client.HTTPException):
+                status = 0
+            local[name].append(time.perf_counter() - start)
+            if not 200 <= status < 400:
+                local_errors[name] += 1
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors, time.perf_counter() - start
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 2),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f'unknown scenarios: {", ".join(sorted(unknown))}')
+    run_id = int(time.time())
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'products': args.products,
+            'users': args.users,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'seed': args.seed,
+        },
+        'scenarios': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        servers = {}
+        try:
+            for name in scenarios:
+                app, needs_tokens, build_ops = SCENARIOS[name]
+                if app not in servers:
+                    print(f'starting {app} ({args.products} products, {args.users} users)...', flush=True)
+                    servers[app] = Server(app, os.path.join(tmp, app), args.products, args.users)
+                port = servers[app].port
+                tokens = [login_token(port, i) for i in range(args.concurrency)] if needs_tokens else None
+                operations = build_ops(args, run_id)
+                if args.warmup:
+                    drive(port, operations, args.concurrency, args.warmup, args.seed + 1, tokens)
+                samples, errors, elapsed = drive(port, operations, args.concurrency, args.duration,
+                                                 args.seed, tokens)
+                total = summarize([value for values in samples.values() for value in values],
+                                  sum(errors.values()), elapsed)
+                total['operations'] = {op: summarize(values, errors[op], elapsed)
+                                       for op, values in samples.items()}
+                report['scenarios'][name] = total
+                print(f'{name:>8}: {total["rps"]:>8.1f} req/s  p50 {total["p50_ms"]:.1f} ms  '
+                      f'p95 {total["p95_ms"]:.1f} ms  p99 {total["p99_ms"]:.1f} ms  errors {total["errors"]}',
+                      flush=True)
+        finally:
+            for server in servers.values():
+                server.close()
+
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+    print(f'wrote {args.output}')
+
+
+# --- comparison --------------------------------------------------------------
+
+def changes(old, new, tolerance, min_ms):
+    """Yield ``(metric, old, new, change, regressed)`` for one scenario or operation."""
+    for metric in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+        before, after = old[metric], new[metric]
+        change = (after - before) / before if before else 0.0
+        if metric == 'rps':
+            regressed = change < -tolerance
+        else:
+            # Tail percentiles only; p50 is reported for context
+            regressed = metric != 'p50_ms' and change > tolerance and after - before > min_ms
+        yield metric, before, after, change, regressed
+
+
+def compare(args):
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    with open(args.candidate) as fh:
+        candidate = json.load(fh)
+
+    for key in ('products', 'users', 'concurrency', 'cpus'):
+        if baseline['meta'].get(key) != candidate['meta'].get(key):
+            print(f'warning: {key} differs ({baseline["meta"].get(key)} -> {candidate["meta"].get(key)})')
+
+    regressions = []
+    print(f'{"scenario/operation":<28} {"metric":<7} {"baseline":>10} {"candidate":>10} {"change":>8}')
+    for name, old in baseline['scenarios'].items():
+        new = candidate['scenarios'].get(name)
+        if new is None:
+            print(f'{name:<28} missing from candidate')
+            continue
+        rows = [(name, old, new)] + [(f'{name}/{op}', old_op, new['operations'][op])
+                                     for op, old_op in old['operations'].items()
+                                     if op in new['operations'] and old_op['requests'] >= args.min_requests]
+        for label, old_stats, new_stats in rows:
+            for metric, before, after, change, regressed in changes(old_stats, new_stats, args.tolerance,
+                                                                    args.min_ms):
+                flag = '  REGRESSION' if regressed else ''
+                print(f'{label:<28} {metric:<7} {before:>10.2f} {after:>10.2f} {change:>+8.1%}{flag}')
+                if regressed:
+                    regressions.append((label, metric))
+            if new_stats['errors'] > old_stats['errors']:
+                print(f'{label:<28} errors  {old_stats["errors"]:>10} {new_stats["errors"]:>10}  REGRESSION')
+                regressions.append((label, 'errors'))
+
+    if regressions:
+        print(f'{len(regressions)} regression(s) beyond {args.tolerance:.0%}')
+        sys.exit(1)
+    print('no regressions')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='start the apps, generate load and write a baseline')
+    run_parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    run_parser.add_argument('--products', type=int, default=10000)
+    run_parser.add_argument('--users', type=int, default=10000)
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--duration', type=float, default=10.0, help='seconds per scenario')
+    run_parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds per scenario')
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--output', default='loadtest-baseline.json')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help='flag regressions between two baselines')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--tolerance', type=float, default=0.10)
+    compare_parser.add_argument('--min-ms', type=float, default=1.0,
+                                help='ignore latency increases smaller than this')
+    compare_parser.add_argument('--min-requests', type=int, default=100,
+                                help='skip operations with fewer baseline samples')
+    compare_parser.set_defaults(func=compare)
+
+    serve_parser = commands.add_parser('serve')
+    serve_parser.add_argument('--app', required=True)
+    serve_parser.add_argument('--data', required=True)
+    serve_parser.add_argument('--products', type=int, default=0)
+    serve_parser.add_argument('--users', type=int, default=0)
+    serve_parser.set_defaults(func=serve)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
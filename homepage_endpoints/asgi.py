@@ -0,0 +1,10 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from kletos.asgi import ASGIAdapter
+
+# ASGI entry point: `uvicorn --app-dir homepage_endpoints asgi:application`
+application = ASGIAdapter.from_env(app)
@@ -0,0 +1,130 @@
+"""Account schema migrations, identifier normalization and index-backed user lookups.
+
+Logins accept an email or a phone number. Both are stored a second time in
+normalized form, each with its own unique index, and a lookup probes exactly
+one of them: an identifier containing ``@`` is an email, anything else a
+phone number. An ``OR`` across the two columns would often be planned as a
+full scan instead.
+"""
+import re
+
+from sqlalchemy import text
+
+from kletos.cart import ENSURE_CART, UPSERT_CART_ITEM
+
+_PHONE_NOISE = re.compile(r'[\s().-]')
+
+# Creates the account, or does nothing if the email or phone number is taken
+# in any spelling. The unique indexes decide, so two racing registrations
+# can't both succeed.
+REGISTER_USER = text('''
+    INSERT INTO "user" (email, phone_number, password_hash, email_normalized, phone_normalized)
+    VALUES (:email, :phone_number, :password_hash, :email_normalized, :phone_normalized)
+    ON CONFLICT DO NOTHING
+''')
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def normalize_phone(phone):
+    return _PHONE_NOISE.sub('', phone.strip())
+
+
+def find_user(model, identifier):
+    """Return the ``model`` row whose email or phone matches ``identifier``.
+
+    One index probe on the normalized column, plus an exact probe when that
+    misses, for accounts whose normalized form belongs to an older account.
+    """
+    if '@' in identifier:
+        normalized, exact = model.email_normalized == normalize_email(identifier), model.email == identifier
+    else:
+        normalized, exact = model.phone_normalized == normalize_phone(identifier), model.phone_number == identifier
+    return model.query.filter(normalized).first() or model.query.filter(exact).first()
+
+
+def register_user(session, email, phone_number, password_hash):
+    """Insert a user; returns False if the email or phone number is already registered."""
+    result = session.execute(REGISTER_USER, {
+        'email': email, 'phone_number': phone_number, 'password_hash': password_hash,
+        'email_normalized': normalize_email(email), 'phone_normalized': normalize_phone(phone_number),
+    })
+    session.commit()
+    return result.rowcount == 1
+
+
+def merge_accounts(conn, source):
+    """Copy users, and the carts they own, from another storefront database into ``conn``'s.
+
+    ``source`` is a sqlite3 connection to the other database, at any schema
+    version. An account whose email or phone number is already registered
+    here is left out, with its cart. Cart lines are matched to this catalog
+    by product name and category, so they are priced from this catalog;
+    lines for products it doesn't carry are dropped. Carts without an owner,
+    as kept before carts were per user, can't be attributed and are left
+    out. Returns counts of what was merged and what was left out.
+    """
+    counts = {'users': 0, 'taken': 0, 'carts': 0, 'ownerless_carts': 0, 'dropped_lines': 0}
+    new_ids = {}
+    for user_id, email, phone_number, password_hash in source.execute(
+            'SELECT id, email, phone_number, password_hash FROM "user" ORDER BY id').fetchall():
+        result = conn.execute(REGISTER_USER, {
+            'email': email, 'phone_number': phone_number, 'password_hash': password_hash,
+            'email_normalized': normalize_email(email), 'phone_normalized': normalize_phone(phone_number),
+        })
+        if result.rowcount == 1:
+            new_ids[str(user_id)] = str(result.lastrowid)
+            counts['users'] += 1
+        else:
+            counts['taken'] += 1
+
+    products = {(name, category): product_id
+                for product_id, name, category in conn.execute('SELECT id, name, category FROM product')}
+    owned = 'owner_id' in {row[1] for row in source.execute('PRAGMA table_info(cart)')}
+    carts = source.execute(f'SELECT id, {"owner_id" if owned else "NULL"} FROM cart').fetchall()
+    for cart_id, owner_id in carts:
+        if owner_id is None:
+            counts['ownerless_carts'] += 1
+            continue
+        if owner_id not in new_ids:
+            continue
+        conn.execute(text(ENSURE_CART), {'owner_id': new_ids[owner_id]})
+        target_id = conn.execute('SELECT id FROM cart WHERE owner_id = ?', (new_ids[owner_id],)).scalar()
+        lines = source.execute('SELECT product.name, product.category, cart_item.quantity FROM cart_item '
+                               'JOIN product ON product.id = cart_item.product_id WHERE cart_item.cart_id = ?',
+                               (cart_id,)).fetchall()
+        for name, category, quantity in lines:
+            if (name, category) not in products:
+                counts['dropped_lines'] += 1
+                continue
+            conn.execute(text(UPSERT_CART_ITEM),
+                         {'cart_id': target_id, 'product_id': products[name, category], 'quantity': quantity})
+        counts['carts'] += 1
+    return counts
+
+
+def _normalized_identifiers(conn):
+    columns = {row[1] for row in conn.execute('PRAGMA table_info("user")')}
+    for column, column_type in (('email_normalized', 'VARCHAR(120)'), ('phone_normalized', 'VARCHAR(20)')):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE "user" ADD COLUMN {column} {column_type}')
+    # When existing accounts differ only by case or formatting, the oldest one
+    # gets the normalized value and the others keep logging in by exact match
+    seen_emails, seen_phones, updates = set(), set(), []
+    for user_id, email, phone in conn.execute('SELECT id, email, phone_number FROM "user" ORDER BY id').fetchall():
+        email_key, phone_key = normalize_email(email), normalize_phone(phone)
+        updates.append((None if email_key in seen_emails else email_key,
+                        None if phone_key in seen_phones else phone_key, user_id))
+        seen_emails.add(email_key)
+        seen_phones.add(phone_key)
+    if updates:
+        conn.execute('UPDATE "user" SET email_normalized = ?, phone_normalized = ? WHERE id = ?', updates)
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ix_user_email_normalized ON "user" (email_normalized)')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ix_user_phone_normalized ON "user" (phone_normalized)')
+
+
+ACCOUNT_MIGRATIONS = (
+    ('0202_normalized_identifiers', _normalized_identifiers),
+)
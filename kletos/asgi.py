@@ -0,0 +1,207 @@
+"""Serve the Flask (WSGI) apps from an ASGI server with a bounded executor.
+
+An ASGI server such as uvicorn keeps every client connection on its event
+loop, so idle keep-alive connections and slow uploads cost a socket rather
+than a thread. Only a request that is ready to run is handed to the WSGI app,
+on a fixed-size thread pool, which also bounds concurrent SQLite access;
+password hashing already runs on the credentials process pool. Requests
+beyond ``max_workers`` wait on the loop, and beyond ``max_pending`` they are
+turned away with 503 instead of queueing without limit:
+
+    uvicorn --app-dir homepage_endpoints asgi:application
+    uvicorn --app-dir validation asgi:application
+
+``ASGI_WORKERS`` and ``ASGI_MAX_PENDING`` size the executor and the queue.
+Request bodies are spooled before the app runs and refused with 413 past
+``ASGI_MAX_BODY_SIZE`` bytes.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 16
+SPOOL_SIZE = 1024 * 1024       # request bodies above this go to a temp file
+BUFFER_SIZE = 64 * 1024        # responses above this are streamed chunk by chunk
+DEFAULT_MAX_BODY_SIZE = 32 * 1024 * 1024
+
+
+def build_environ(scope, body, size):
+    """Translate an ASGI HTTP scope and its spooled body of ``size`` bytes into a WSGI environ."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for raw_name, raw_value in scope.get('headers', ()):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = name
+        else:
+            key = 'HTTP_' + name
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    # The body is complete and already de-chunked by the server; without a
+    # length werkzeug would read a chunked upload as empty
+    environ.pop('HTTP_TRANSFER_ENCODING', None)
+    environ['CONTENT_LENGTH'] = str(size)
+    environ['wsgi.input_terminated'] = True
+    return environ
+
+
+def content_length(scope):
+    for name, value in scope.get('headers', ()):
+        if name.lower() == b'content-length':
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class ASGIAdapter:
+    """ASGI callable running ``wsgi_app`` on a bounded thread pool."""
+
+    def __init__(self, wsgi_app, max_workers=DEFAULT_WORKERS, max_pending=None, max_body_size=DEFAULT_MAX_BODY_SIZE):
+        self.wsgi_app = wsgi_app
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_body_size = max_body_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wsgi')
+        self.pending = 0   # requests admitted and not yet finished; only touched on the loop
+
+    @classmethod
+    def from_env(cls, wsgi_app):
+        max_pending = os.environ.get('ASGI_MAX_PENDING')
+        return cls(wsgi_app, max_workers=int(os.environ.get('ASGI_WORKERS', DEFAULT_WORKERS)),
+                   max_pending=int(max_pending) if max_pending else None,
+                   max_body_size=int(os.environ.get('ASGI_MAX_BODY_SIZE', DEFAULT_MAX_BODY_SIZE)))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError(f'unsupported ASGI scope type {scope["type"]!r}')
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        if self.max_pending is not None and self.pending >= self.max_workers + self.max_pending:
+            await self._refuse(send, 503, b'Server busy, retry shortly\n', [(b'retry-after', b'1')])
+            return
+        if (content_length(scope) or 0) > self.max_body_size:
+            await self._refuse(send, 413, b'Request body too large\n')
+            return
+
+        self.pending += 1
+        try:
+            body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            size = 0
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    body.close()
+                    return
+                chunk = message.get('body', b'')
+                size += len(chunk)
+                # Chunked uploads carry no Content-Length, so count while spooling
+                if size > self.max_body_size:
+                    body.close()
+                    await self._refuse(send, 413, b'Request body too large\n')
+                    return
+                body.write(chunk)
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+
+            loop = asyncio.get_running_loop()
+            environ = build_environ(scope, body, size)
+            status, headers, chunks, streamed = await loop.run_in_executor(
+                self.executor, self._run, environ, loop, send)
+            if not streamed:
+                await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+        finally:
+            self.pending -= 1
+
+    async def _refuse(self, send, status, message, headers=()):
+        # The rest of the body is never read, so the connection can't be reused
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain'), (b'connection', b'close'), *headers]})
+        await send({'type': 'http.response.body', 'body': message})
+
+    def _run(self, environ, loop, send):
+        """Call the WSGI app on a worker thread.
+
+        Small responses are buffered and sent by the loop. Once a response
+        passes ``BUFFER_SIZE`` the rest is streamed from this thread, so a
+        generator (e.g. a catalog export) keeps the thread and request context
+        it started in and only ever holds one chunk in memory.
+        """
+        started = []
+
+        def start_response(status, response_headers, exc_info=None):
+            if exc_info and started and streaming:
+                raise exc_info[1].with_traceback(exc_info[2])
+            # The ASGI server sends its own Date header; a second one from
+            # make_conditional would be a duplicate
+            started[:] = [int(status.split(' ', 1)[0]),
+                          [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                           for name, value in response_headers if name.lower() != 'date']]
+
+        def push(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        streaming = False
+        chunks, size = [], 0
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if not chunk:
+                    continue
+                if streaming:
+                    push({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                    continue
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > BUFFER_SIZE:
+                    streaming = True
+                    push({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+                    push({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': True})
+                    chunks = []
+            if streaming:
+                push({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+            environ['wsgi.input'].close()
+        return started[0], started[1], chunks, streaming
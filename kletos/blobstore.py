@@ -0,0 +1,128 @@
+"""Content-addressed file storage for uploaded documents.
+
+Blobs are written in fixed-size chunks while their SHA-256 is computed, then
+atomically renamed to ``<root>/ab/cd/<digest>``. Identical uploads therefore
+share one file, and memory use per upload is one chunk regardless of size.
+
+A blob can also be staged: written and hashed but left out of the store until
+``keep``, so a caller can commit the row that references it first and
+``discard`` the file if that fails.
+"""
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+# Bytes at fixed offsets identifying the document and image types uploaded.
+# RIFF is also the container of WAV and AVI; WebP names itself at offset 8.
+_SIGNATURES = (
+    (((0, b'%PDF-'),), 'application/pdf'),
+    (((0, b'\x89PNG\r\n\x1a\n'),), 'image/png'),
+    (((0, b'\xff\xd8\xff'),), 'image/jpeg'),
+    (((0, b'GIF8'),), 'image/gif'),
+    (((0, b'RIFF'), (8, b'WEBP')), 'image/webp'),
+)
+
+
+def sniff_content_type(path):
+    """Content type of the file at ``path`` from its leading bytes; ``application/octet-stream`` if unknown."""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    for parts, mimetype in _SIGNATURES:
+        if all(head[offset:offset + len(signature)] == signature for offset, signature in parts):
+            return mimetype
+    return 'application/octet-stream'
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+class StagedBlob:
+
+    def __init__(self, digest, size, temp_path):
+        self.digest = digest
+        self.size = size
+        self.temp_path = temp_path
+
+
+class BlobStore:
+
+    def __init__(self, root, chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def stage_stream(self, stream, max_size=None):
+        """Copy a binary file-like object to a staging file; returns a ``StagedBlob``.
+
+        Raises ``BlobTooLarge``, keeping nothing, once more than ``max_size``
+        bytes have been read; a declared length can't be trusted to bound it.
+        """
+        staging = os.path.join(self.root, 'tmp')
+        os.makedirs(staging, exist_ok=True)
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=staging)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise BlobTooLarge(f'Larger than {max_size} bytes')
+                    sha256.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return StagedBlob(sha256.hexdigest(), size, temp_path)
+
+    def stage_bytes(self, data, max_size=None):
+        return self.stage_stream(io.BytesIO(data), max_size)
+
+    def keep(self, staged):
+        """Move a staged blob into the store."""
+        final_path = self._path(staged.digest)
+        if os.path.exists(final_path):
+            os.unlink(staged.temp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(staged.temp_path, final_path)
+
+    def discard(self, staged):
+        if os.path.exists(staged.temp_path):
+            os.unlink(staged.temp_path)
+
+    def put_stream(self, stream, max_size=None):
+        """Copy a binary file-like object into the store; return ``(digest, size)``."""
+        staged = self.stage_stream(stream, max_size)
+        try:
+            self.keep(staged)
+        except BaseException:
+            self.discard(staged)
+            raise
+        return staged.digest, staged.size
+
+    def put_bytes(self, data):
+        return self.put_stream(io.BytesIO(data))
+
+    def path(self, digest):
+        """Filesystem path of a stored blob, or None if it is unknown."""
+        if not _DIGEST.match(digest or ''):
+            return None
+        path = self._path(digest)
+        return path if os.path.exists(path) else None
+
+    def content_type(self, digest):
+        path = self.path(digest)
+        return None if path is None else sniff_content_type(path)
@@ -0,0 +1,261 @@
+"""Bulk product upserts from NDJSON or CSV streams.
+
+Records are read from the request stream one line at a time and written in
+chunks of ``chunk_size``, each chunk one ``BEGIN IMMEDIATE`` transaction: the
+current rows for the chunk's ids are read under the write lock and merged
+with the incoming fields. New rows are inserted with one ``executemany``, and
+existing rows that actually differ are updated with one ``executemany`` per
+set of changed columns; unchanged rows aren't written at all. The result lists exactly the ids inserted and
+updated, and each commit reports the cache tags it touched, so callers
+can invalidate incrementally instead of flushing. Triggers keep search,
+category stats and rankings in step as for any other product write; the
+catalog version is bumped once per chunk rather than once per row.
+"""
+import codecs
+import csv
+import json
+import math
+from itertools import islice
+
+from kletos.cache import product_tags
+from kletos.catalog import BUMP_CATALOG_VERSION, DEFER_CATALOG_VERSION, RESUME_CATALOG_VERSION
+
+# Writable columns, in upsert order after id; a new product needs all but stock
+PRODUCT_COLUMNS = ('name', 'category', 'image', 'price', 'stock')
+REQUIRED_COLUMNS = ('name', 'category', 'image', 'price')
+MAX_LENGTHS = {'name': 100, 'category': 50, 'image': 255}
+
+DEFAULT_CHUNK_SIZE = 5000
+LOOKUP_CHUNK = 500   # ids per IN (...) lookup, under SQLite's variable limit
+
+INSERT_PRODUCT = 'INSERT INTO product (id, name, category, image, price, stock) VALUES (?, ?, ?, ?, ?, ?)'
+
+STREAM_FORMATS = ('application/x-ndjson', 'application/jsonl', 'text/csv')
+
+
+class BulkFormatError(ValueError):
+    pass
+
+
+def read_ndjson(lines):
+    """Yield one record per non-blank line; a line that isn't a JSON object yields its error message."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield 'Invalid JSON'
+            continue
+        yield record if isinstance(record, dict) else 'Record must be an object'
+
+
+def read_csv(lines):
+    """Yield one record per CSV row, keyed by the header row; empty cells count as absent."""
+    reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8'))
+    for row in reader:
+        if None in row:
+            yield 'Row has more cells than the header'
+            continue
+        yield {name: value for name, value in row.items() if value not in ('', None)}
+
+
+def read_records(mimetype, lines):
+    if mimetype == 'text/csv':
+        return read_csv(lines)
+    if mimetype in STREAM_FORMATS:
+        return read_ndjson(lines)
+    raise BulkFormatError('Send application/x-ndjson or text/csv')
+
+
+def _int(value):
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value)
+
+
+def clean_record(record):
+    """Return ``(id or None, {column: value}, errors)`` for one incoming record."""
+    errors = {}
+    fields = {}
+    for name in record:
+        if name != 'id' and name not in PRODUCT_COLUMNS:
+            errors[name] = f"Unknown field '{name}'"
+
+    product_id = record.get('id')
+    if product_id is not None:
+        try:
+            product_id = _int(product_id)
+            if product_id < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors['id'] = 'id must be a positive integer'
+
+    for name, limit in MAX_LENGTHS.items():
+        value = record.get(name)
+        if value is None:
+            continue
+        if not isinstance(value, str) or not value.strip() or len(value) > limit:
+            errors[name] = f'{name} must be a non-empty string of at most {limit} characters'
+        else:
+            fields[name] = value
+    if record.get('price') is not None:
+        try:
+            price = float(record['price'])
+            if isinstance(record['price'], bool) or not math.isfinite(price) or price < 0:
+                raise ValueError
+            fields['price'] = price
+        except (TypeError, ValueError):
+            errors['price'] = 'price must be a non-negative number'
+    if record.get('stock') is not None:
+        try:
+            fields['stock'] = _int(record['stock'])
+            if fields['stock'] < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors['stock'] = 'stock must be a non-negative integer'
+    return product_id, fields, errors
+
+
+class BulkResult:
+
+    def __init__(self):
+        self.inserted = []
+        self.updated = []
+        self.unchanged = 0
+        self.errors = []     # [{'row': index, 'errors': {...}}]
+
+    def as_dict(self):
+        return {
+            "inserted": len(self.inserted),
+            "updated": len(self.updated),
+            "unchanged": self.unchanged,
+            "failed": len(self.errors),
+            "inserted_ids": self.inserted,
+            "updated_ids": self.updated,
+            "errors": self.errors,
+        }
+
+
+def _current_rows(cursor, ids):
+    ids = list(ids)
+    rows = {}
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[start:start + LOOKUP_CHUNK]
+        placeholders = ', '.join('?' for _ in chunk)
+        for row in cursor.execute(f'SELECT id, {", ".join(PRODUCT_COLUMNS)} FROM product '
+                                  f'WHERE id IN ({placeholders})', chunk):
+            rows[row[0]] = dict(zip(PRODUCT_COLUMNS, row[1:]))
+    return rows
+
+
+def _defers_catalog_version(dbapi_conn):
+    cursor = dbapi_conn.cursor()
+    try:
+        return cursor.execute("SELECT 1 FROM pragma_table_info('catalog_version') "
+                              "WHERE name = 'deferred'").fetchone() is not None
+    finally:
+        cursor.close()
+
+
+def _write_chunk(dbapi_conn, chunk, result, deferred_version=False):
+    """Apply one chunk of ``(index, id, fields)`` in a single write transaction; returns the tags it touched."""
+    cursor = dbapi_conn.cursor()
+    try:
+        # Take the write lock before reading, so the merge sees the rows it overwrites
+        cursor.execute('BEGIN IMMEDIATE')
+        if deferred_version:
+            cursor.execute(DEFER_CATALOG_VERSION)
+        stored = _current_rows(cursor, {product_id for _, product_id, _ in chunk if product_id is not None})
+        next_id = cursor.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM product').fetchone()[0]
+        current = dict(stored)   # id -> merged row; a repeated id keeps its last state
+        inserted, changed = [], {}
+        for index, product_id, fields in chunk:
+            before = current.get(product_id)
+            if before is None:
+                missing = [name for name in REQUIRED_COLUMNS if name not in fields]
+                if missing:
+                    message = (f'Unknown product id {product_id}; ' if product_id is not None else '') + \
+                        ', '.join(missing) + ' required to create a product'
+                    result.errors.append({'row': index, 'errors': {'product': message}})
+                    continue
+                if product_id is None:
+                    product_id = next_id
+                next_id = max(next_id, product_id + 1)
+                current[product_id] = dict(dict.fromkeys(PRODUCT_COLUMNS), **fields)
+                inserted.append(product_id)
+            else:
+                after = dict(before, **fields)
+                if after == before:
+                    result.unchanged += 1
+                    continue
+                current[product_id] = after
+                if product_id in stored:
+                    changed[product_id] = None
+
+        tags = set()
+        cursor.executemany(INSERT_PRODUCT, [(product_id, *(current[product_id][name] for name in PRODUCT_COLUMNS))
+                                            for product_id in inserted])
+        for product_id in inserted:
+            tags.update(product_tags(product_id, current[product_id]['category']))
+
+        # Update only the columns that changed, grouped by which ones, so a
+        # price/stock feed never fires the search or ranking triggers
+        updated, by_columns = [], {}
+        for product_id in changed:
+            before, after = stored[product_id], current[product_id]
+            columns = tuple(name for name in PRODUCT_COLUMNS if after[name] != before[name])
+            if not columns:
+                continue
+            by_columns.setdefault(columns, []).append((*(after[name] for name in columns), product_id))
+            updated.append(product_id)
+            tags.update(product_tags(product_id, before['category']))
+            tags.update(product_tags(product_id, after['category']))
+        for columns, rows in by_columns.items():
+            assignments = ', '.join(f'{name} = ?' for name in columns)
+            cursor.executemany(f'UPDATE product SET {assignments} WHERE id = ?', rows)
+        if deferred_version:
+            # Nothing written leaves the version, and Last-Modified, alone
+            cursor.execute(BUMP_CATALOG_VERSION if inserted or updated else RESUME_CATALOG_VERSION)
+        dbapi_conn.commit()
+    except Exception:
+        dbapi_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    result.inserted.extend(inserted)
+    result.updated.extend(updated)
+    return tags
+
+
+def upsert_products(dbapi_conn, records, chunk_size=DEFAULT_CHUNK_SIZE, on_commit=None):
+    """Validate and upsert ``records`` (dicts, or error strings from the readers) chunk by chunk.
+
+    Records with errors are reported and skipped; every valid record in a
+    chunk is committed together. ``on_commit(tags)`` runs after each commit
+    with the cache tags that chunk touched, so caches are already current for
+    committed chunks if a later one fails. Returns a ``BulkResult``.
+    """
+    result = BulkResult()
+    deferred_version = _defers_catalog_version(dbapi_conn)
+    records = enumerate(records)
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            result.errors.sort(key=lambda error: error['row'])
+            return result
+        chunk = []
+        for index, record in batch:
+            if isinstance(record, str):
+                result.errors.append({'row': index, 'errors': {'record': record}})
+                continue
+            product_id, fields, errors = clean_record(record)
+            if errors:
+                result.errors.append({'row': index, 'errors': errors})
+            else:
+                chunk.append((index, product_id, fields))
+        if chunk:
+            tags = _write_chunk(dbapi_conn, chunk, result, deferred_version)
+            if on_commit and tags:
+                on_commit(tags)
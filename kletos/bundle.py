@@ -0,0 +1,95 @@
+"""One JSON response assembled from several independently cached sections.
+
+A section contributes one or more top-level members to the response object
+and is kept as pre-encoded bytes (``"hero":{...}``), so building a response
+is a byte join. Static sections are encoded once, when registered. Data
+sections are loaded on first use and re-encoded when their TTL runs out or
+their ``version`` changes (e.g. the catalog version), whichever comes first.
+"""
+import threading
+import time
+
+from kletos.metrics import JSON_ENCODE_DURATION
+from kletos.serializers import dumps
+
+
+class UnknownSection(ValueError):
+    pass
+
+
+def encode_members(members):
+    """Encode a dict as object members without the surrounding braces."""
+    return dumps(members)[1:-1]
+
+
+class _Section:
+
+    def __init__(self, name, fragment=None, loader=None, ttl=None, version=None):
+        self.name = name
+        self.fragment = fragment
+        self.loader = loader
+        self.ttl = ttl
+        self.version = version
+        self.expires_at = 0.0
+        self.loaded_version = None
+        self.lock = threading.Lock()
+
+
+class Bundle:
+    """Ordered named sections rendered together or as a requested subset."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._sections = {}
+
+    @property
+    def names(self):
+        return tuple(self._sections)
+
+    def static(self, name, members):
+        """Register a section whose members never change; encoded here, once."""
+        self._sections[name] = _Section(name, fragment=encode_members(members))
+
+    def cached(self, name, loader, ttl, version=None):
+        """Register a section built by ``loader()``, which returns its members.
+
+        The encoded result is reused for ``ttl`` seconds, and only while
+        ``version()`` (if given) returns the value it returned at load time.
+        """
+        self._sections[name] = _Section(name, loader=loader, ttl=ttl, version=version)
+
+    def parse(self, raw):
+        """Turn ``?sections=a,b`` into section names in registration order; empty means all."""
+        if not raw:
+            return self.names
+        requested = {name.strip() for name in raw.split(',') if name.strip()}
+        unknown = requested.difference(self._sections)
+        if unknown:
+            raise UnknownSection(f"Unknown section '{sorted(unknown)[0]}', expected any of: " + ', '.join(self.names))
+        return tuple(name for name in self._sections if name in requested)
+
+    def render(self, names=None):
+        fragments = [self._fragment(self._sections[name]) for name in (names or self.names)]
+        return b'{' + b','.join(fragment for fragment in fragments if fragment) + b'}'
+
+    def invalidate(self, name=None):
+        for section in (self._sections.values() if name is None else (self._sections[name],)):
+            section.expires_at = 0.0
+
+    def _fragment(self, section):
+        if section.loader is None:
+            return section.fragment
+        version = section.version() if section.version else None
+        if self.clock() < section.expires_at and version == section.loaded_version:
+            return section.fragment
+        # One reload per section at a time; concurrent requests wait for it
+        # rather than all querying the database at once
+        with section.lock:
+            if self.clock() < section.expires_at and version == section.loaded_version:
+                return section.fragment
+            members = section.loader()
+            with JSON_ENCODE_DURATION.time():
+                section.fragment = encode_members(members)
+            section.loaded_version = version
+            section.expires_at = self.clock() + section.ttl
+            return section.fragment
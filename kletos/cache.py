@@ -0,0 +1,169 @@
+"""Bounded in-process LRU/TTL read-through cache with tag invalidation."""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from sqlalchemy import event, inspect
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and single-flight loading.
+
+    Entries can carry tags; ``invalidate_tag`` drops every entry with that tag,
+    e.g. every cached page of one category. Concurrent ``get_or_load`` calls
+    for the same cold key run the loader once and share its result.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()   # key -> (value, expires_at, tags)
+        self._tags = {}              # tag -> set of keys
+        self._inflight = {}          # key -> Future shared by concurrent loaders
+        self._epoch = 0              # bumped by every invalidation
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _drop(self, key):
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _lookup(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        if entry[1] <= self.clock():
+            self._drop(key)
+            self.expirations += 1
+            return False, None
+        self._data.move_to_end(key)
+        return True, entry[0]
+
+    def _store(self, key, value, tags):
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = (value, self.clock() + self.ttl, tuple(tags))
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.maxsize:
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def set(self, key, value, tags=()):
+        with self._lock:
+            self._store(key, value, tags)
+
+    def get_or_load(self, key, loader, tags=()):
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                epoch = self._epoch
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+            # An invalidation while loading means the value may predate the
+            # write; hand it to the waiting callers but do not cache it
+            if epoch == self._epoch:
+                self._store(key, value, tags)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._epoch += 1
+            if key in self._data:
+                self._drop(key)
+                self.invalidations += 1
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            self._epoch += 1
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def product_tags(product_id, category):
+    return (('product', product_id), ('category', category))
+
+
+def invalidate_on_commit(cache, session, model):
+    """Drop cached entries for ``model`` rows changed by a committed session.
+
+    Changed rows are collected at flush time (new, updated and deleted rows,
+    including the category a row moved out of) and invalidated only once the
+    transaction commits; a rollback discards them.
+    """
+    def collect(session, flush_context):
+        pending = session.info.setdefault('product_cache_tags', set())
+        for obj in session.new | session.dirty | session.deleted:
+            if not isinstance(obj, model):
+                continue
+            pending.add(('product', obj.id))
+            pending.add(('category', obj.category))
+            pending.update(('category', old) for old in inspect(obj).attrs.category.history.deleted)
+
+    def apply(session):
+        for tag in session.info.pop('product_cache_tags', ()):
+            cache.invalidate_tag(tag)
+
+    def discard(session):
+        session.info.pop('product_cache_tags', None)
+
+    event.listen(session, 'after_flush', collect)
+    event.listen(session, 'after_commit', apply)
+    event.listen(session, 'after_rollback', discard)
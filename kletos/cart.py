@@ -0,0 +1,41 @@
+"""Cart schema migrations and single-statement cart writes."""
+
+# Creates the caller's cart on first use. Racing first requests from the same
+# user both succeed: the loser's insert is a no-op on the unique owner index.
+ENSURE_CART = '''
+    INSERT INTO cart (owner_id) VALUES (:owner_id)
+    ON CONFLICT (owner_id) DO NOTHING
+'''
+
+# Adds quantity to an existing line or creates it, in one statement. Relies on
+# the unique (cart_id, product_id) index, so concurrent adds of the same
+# product can never create duplicate lines or lose an increment.
+UPSERT_CART_ITEM = '''
+    INSERT INTO cart_item (cart_id, product_id, quantity)
+    VALUES (:cart_id, :product_id, :quantity)
+    ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity
+'''
+
+
+def _unique_cart_items(conn):
+    # Fold duplicate lines into the oldest one before the index can be created
+    conn.execute('''UPDATE cart_item SET quantity = (
+                        SELECT SUM(dup.quantity) FROM cart_item AS dup
+                        WHERE dup.cart_id = cart_item.cart_id AND dup.product_id = cart_item.product_id)
+                    WHERE id IN (SELECT MIN(id) FROM cart_item GROUP BY cart_id, product_id HAVING COUNT(*) > 1)''')
+    conn.execute('''DELETE FROM cart_item
+                    WHERE id NOT IN (SELECT MIN(id) FROM cart_item GROUP BY cart_id, product_id)''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_item_cart_product ON cart_item (cart_id, product_id)')
+
+
+def _cart_owner(conn):
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(cart)')}
+    if 'owner_id' not in columns:
+        conn.execute('ALTER TABLE cart ADD COLUMN owner_id VARCHAR(120)')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ix_cart_owner_id ON cart (owner_id)')
+
+
+CART_MIGRATIONS = (
+    ('0101_unique_cart_items', _unique_cart_items),
+    ('0102_cart_owner', _cart_owner),
+)
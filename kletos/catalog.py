@@ -0,0 +1,169 @@
+"""Catalog schema migrations and aggregate queries shared by the catalog apps."""
+
+
+def _create_category_indexes(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_product_category_price ON product (category, price)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_product_category_id ON product (category, id)')
+
+
+# category_stats is maintained by triggers so facet reads never aggregate the
+# product table. Min/max after a delete or update are re-read through
+# ix_product_category_price, which is a single index seek.
+CATEGORY_STATS_DDL = (
+    '''CREATE TABLE IF NOT EXISTS category_stats (
+           category VARCHAR(50) PRIMARY KEY,
+           product_count INTEGER NOT NULL,
+           min_price FLOAT,
+           max_price FLOAT
+       )''',
+    '''CREATE TRIGGER IF NOT EXISTS product_category_stats_insert AFTER INSERT ON product BEGIN
+           INSERT INTO category_stats (category, product_count, min_price, max_price)
+           VALUES (new.category, 1, new.price, new.price)
+           ON CONFLICT (category) DO UPDATE SET
+               product_count = product_count + 1,
+               min_price = MIN(min_price, excluded.min_price),
+               max_price = MAX(max_price, excluded.max_price);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_category_stats_delete AFTER DELETE ON product BEGIN
+           UPDATE category_stats SET
+               product_count = product_count - 1,
+               min_price = (SELECT MIN(price) FROM product WHERE category = old.category),
+               max_price = (SELECT MAX(price) FROM product WHERE category = old.category)
+           WHERE category = old.category;
+           DELETE FROM category_stats WHERE category = old.category AND product_count <= 0;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_category_stats_update AFTER UPDATE OF category, price ON product BEGIN
+           UPDATE category_stats SET
+               product_count = product_count - 1,
+               min_price = (SELECT MIN(price) FROM product WHERE category = old.category),
+               max_price = (SELECT MAX(price) FROM product WHERE category = old.category)
+           WHERE category = old.category;
+           DELETE FROM category_stats WHERE category = old.category AND product_count <= 0;
+           INSERT INTO category_stats (category, product_count, min_price, max_price)
+           VALUES (new.category, 1, new.price, new.price)
+           ON CONFLICT (category) DO UPDATE SET
+               product_count = product_count + 1,
+               min_price = MIN(min_price, excluded.min_price),
+               max_price = MAX(max_price, excluded.max_price);
+       END''',
+)
+
+
+def _create_category_stats(conn):
+    for statement in CATEGORY_STATS_DDL:
+        conn.execute(statement)
+    conn.execute('DELETE FROM category_stats')
+    conn.execute('''INSERT INTO category_stats (category, product_count, min_price, max_price)
+                    SELECT category, COUNT(*), MIN(price), MAX(price) FROM product GROUP BY category''')
+
+
+# product_fts is an external-content FTS5 index over product.name/category. It
+# stores only the index, the row data stays in product, and the triggers keep
+# the two in step for every write path including raw SQL.
+PRODUCT_SEARCH_DDL = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+           name, category, content='product', content_rowid='id', prefix='2 3'
+       )''',
+    '''CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN
+           INSERT INTO product_fts (rowid, name, category) VALUES (new.id, new.name, new.category);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN
+           INSERT INTO product_fts (product_fts, rowid, name, category)
+           VALUES ('delete', old.id, old.name, old.category);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF name, category ON product BEGIN
+           INSERT INTO product_fts (product_fts, rowid, name, category)
+           VALUES ('delete', old.id, old.name, old.category);
+           INSERT INTO product_fts (rowid, name, category) VALUES (new.id, new.name, new.category);
+       END''',
+)
+
+
+def _create_product_search(conn):
+    for statement in PRODUCT_SEARCH_DDL:
+        conn.execute(statement)
+    conn.execute("INSERT INTO product_fts (product_fts) VALUES ('rebuild')")
+
+
+# Monotonic counter bumped by every product write, used for HTTP validators
+CATALOG_VERSION_DDL = (
+    '''CREATE TABLE IF NOT EXISTS catalog_version (
+           id INTEGER PRIMARY KEY CHECK (id = 1),
+           version INTEGER NOT NULL,
+           updated_at FLOAT NOT NULL
+       )''',
+    "INSERT OR IGNORE INTO catalog_version (id, version, updated_at) VALUES (1, 1, strftime('%s', 'now'))",
+) + tuple(
+    f'''CREATE TRIGGER IF NOT EXISTS product_catalog_version_{op.lower()} AFTER {op} ON product BEGIN
+           UPDATE catalog_version SET version = version + 1, updated_at = strftime('%s', 'now') WHERE id = 1;
+       END'''
+    for op in ('INSERT', 'UPDATE', 'DELETE')
+)
+
+
+def _create_catalog_version(conn):
+    for statement in CATALOG_VERSION_DDL:
+        conn.execute(statement)
+
+
+# Bulk writers bump the version once per transaction instead of once per row:
+# they set ``deferred`` after taking the write lock and clear it with a single
+# bump before committing, so no other connection ever sees it set
+DEFER_CATALOG_VERSION = 'UPDATE catalog_version SET deferred = 1 WHERE id = 1'
+BUMP_CATALOG_VERSION = ("UPDATE catalog_version SET deferred = 0, version = version + 1, "
+                        "updated_at = strftime('%s', 'now') WHERE id = 1")
+RESUME_CATALOG_VERSION = 'UPDATE catalog_version SET deferred = 0 WHERE id = 1'
+
+
+def _defer_catalog_version(conn):
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(catalog_version)')}
+    if 'deferred' not in columns:
+        conn.execute('ALTER TABLE catalog_version ADD COLUMN deferred INTEGER NOT NULL DEFAULT 0')
+    for op in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'DROP TRIGGER IF EXISTS product_catalog_version_{op.lower()}')
+        conn.execute(f'''CREATE TRIGGER product_catalog_version_{op.lower()} AFTER {op} ON product
+                         WHEN NOT (SELECT deferred FROM catalog_version WHERE id = 1) BEGIN
+                             UPDATE catalog_version SET version = version + 1, updated_at = strftime('%s', 'now')
+                             WHERE id = 1;
+                         END''')
+
+
+def _product_stock(conn):
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(product)')}
+    if 'stock' not in columns:
+        conn.execute('ALTER TABLE product ADD COLUMN stock INTEGER')
+
+
+CATALOG_MIGRATIONS = (
+    ('0001_product_category_indexes', _create_category_indexes),
+    ('0002_category_stats', _create_category_stats),
+    ('0003_product_search', _create_product_search),
+    ('0004_catalog_version', _create_catalog_version),
+    ('0005_product_stock', _product_stock),
+    ('0006_defer_catalog_version', _defer_catalog_version),
+)
+
+# Accepted values for ?sort= on category listings: (column, descending)
+CATEGORY_SORTS = {
+    'id': (None, False),
+    'price': ('price', False),
+    '-price': ('price', True),
+}
+
+
+def category_names(session):
+    rows = session.execute('SELECT category FROM category_stats ORDER BY category')
+    return [row[0] for row in rows]
+
+
+def category_facets(session):
+    rows = session.execute('SELECT category, product_count, min_price, max_price '
+                           'FROM category_stats ORDER BY category')
+    return [
+        {
+            "name": category,
+            "product_count": product_count,
+            "min_price": min_price,
+            "max_price": max_price
+        } for category, product_count, min_price, max_price in rows
+    ]
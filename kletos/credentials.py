@@ -0,0 +1,197 @@
+"""Password hashing policy and an off-request-thread hashing pool.
+
+Hashes use werkzeug's ``method$salt$hash`` format, so existing
+``generate_password_hash`` values verify unchanged. Apps whose databases
+still hold plaintext passwords from before hashing can set
+``PASSWORD_LEGACY_PLAINTEXT``; such a value is then compared as-is and
+replaced on the next successful login. A stored value shaped like a hash
+we don't support is never compared as plaintext, or knowing the hash would
+be enough to sign in.
+"""
+import hashlib
+import hmac
+import multiprocessing
+import os
+import re
+import secrets
+import string
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from kletos.metrics import PASSWORD_HASH_DURATION
+
+SALT_CHARS = string.ascii_letters + string.digits
+
+ALGORITHMS = ('pbkdf2:sha256', 'pbkdf2:sha512', 'scrypt')
+
+# Work factors: PBKDF2 iteration count, or the scrypt CPU/memory cost N
+DEFAULT_WORK_FACTORS = {
+    'pbkdf2:sha256': 260000,
+    'pbkdf2:sha512': 260000,
+    'scrypt': 2 ** 15,
+}
+
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# ``method$salt$hash`` (werkzeug, any method) or ``$id$...`` (crypt, bcrypt, argon2)
+HASH_LIKE = re.compile(r'^(?:[\w:.-]+\$[^$]*\$[^$]+|\$[\w-]+\$.*)$')
+
+
+def _derive(method, salt, password):
+    """Return the hex digest for a ``method`` string such as ``pbkdf2:sha256:260000``."""
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2' and len(parts) in (2, 3):
+        # werkzeug omits the iteration count when it used its default
+        iterations = int(parts[2]) if len(parts) == 3 else DEFAULT_WORK_FACTORS['pbkdf2:sha256']
+        return hashlib.pbkdf2_hmac(parts[1], password.encode(), salt.encode(), iterations).hex()
+    if parts[0] == 'scrypt' and len(parts) == 4:
+        n, r, p = (int(part) for part in parts[1:])
+        return hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+                              maxmem=132 * n * r * p, dklen=64).hex()
+    raise ValueError(f'Unsupported hash method {method!r}')
+
+
+def _split(stored):
+    if not stored or stored.count('$') != 2:
+        return None
+    method, salt, digest = stored.split('$')
+    if not method.startswith(('pbkdf2:', 'scrypt:')):
+        return None
+    return method, salt, digest
+
+
+def hash_password(method, password, salt_length=16):
+    salt = ''.join(secrets.choice(SALT_CHARS) for _ in range(salt_length))
+    return f'{method}${salt}${_derive(method, salt, password)}'
+
+
+def is_legacy_plaintext(stored):
+    return bool(stored) and _split(stored) is None and HASH_LIKE.match(stored) is None
+
+
+def verify_password(stored, password, legacy_plaintext=False):
+    parsed = _split(stored)
+    if parsed is None:
+        return (legacy_plaintext and is_legacy_plaintext(stored)
+                and hmac.compare_digest(stored.encode(), password.encode()))
+    method, salt, digest = parsed
+    try:
+        return hmac.compare_digest(_derive(method, salt, password), digest)
+    except ValueError:
+        return False
+
+
+def pool_context(preload=('kletos.credentials',)):
+    # Workers are forked from a clean single-threaded server process rather
+    # than from the multi-threaded web worker.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(list(preload))
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class HashingPolicy:
+    """Which algorithm and work factor new password hashes should use."""
+
+    def __init__(self, algorithm='pbkdf2:sha256', work_factor=None, salt_length=16):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f'algorithm must be one of {", ".join(ALGORITHMS)}')
+        self.algorithm = algorithm
+        self.work_factor = work_factor or DEFAULT_WORK_FACTORS[algorithm]
+        self.salt_length = salt_length
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a policy from ``PASSWORD_HASH_*`` keys in ``config`` or the environment."""
+        def setting(name, default=None):
+            return config.get(name) or os.environ.get(name) or default
+
+        work_factor = setting('PASSWORD_HASH_WORK_FACTOR')
+        return cls(algorithm=setting('PASSWORD_HASH_ALGORITHM', 'pbkdf2:sha256'),
+                   work_factor=int(work_factor) if work_factor else None)
+
+    @property
+    def method(self):
+        if self.algorithm == 'scrypt':
+            return f'scrypt:{self.work_factor}:{SCRYPT_R}:{SCRYPT_P}'
+        return f'{self.algorithm}:{self.work_factor}'
+
+    def needs_rehash(self, stored):
+        parsed = _split(stored)
+        return parsed is None or parsed[0] != self.method
+
+
+class CredentialHasher:
+    """Runs password hashing on a bounded process pool.
+
+    Hashing is CPU-bound and holds the GIL, so doing it on request threads
+    stalls every other endpoint in the worker. Request threads here only wait
+    on a future. ``workers=0`` hashes inline, which suits tests and scripts.
+    ``legacy_plaintext`` lets stored plaintext passwords verify (see above).
+    """
+
+    def __init__(self, policy, workers=None, legacy_plaintext=False):
+        self.policy = policy
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.legacy_plaintext = legacy_plaintext
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        def setting(name):
+            value = config.get(name)
+            return value if value is not None else os.environ.get(name)
+
+        workers = setting('PASSWORD_HASH_WORKERS')
+        legacy_plaintext = setting('PASSWORD_LEGACY_PLAINTEXT')
+        return cls(HashingPolicy.from_config(config), workers=int(workers) if workers is not None else None,
+                   legacy_plaintext=str(legacy_plaintext).lower() in ('1', 'true', 'yes'))
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=pool_context())
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        return self._get_pool().submit(fn, *args).result()
+
+    def hash(self, password):
+        with PASSWORD_HASH_DURATION.time('hash'):
+            return self._run(hash_password, self.policy.method, password, self.policy.salt_length)
+
+    def hash_many(self, passwords):
+        """Hash a batch of passwords, spread across every pool worker."""
+        method, salt_length = self.policy.method, self.policy.salt_length
+        with PASSWORD_HASH_DURATION.time('hash_many'):
+            if not self.workers:
+                return [hash_password(method, password, salt_length) for password in passwords]
+            return list(self._get_pool().map(hash_password, repeat(method), passwords, repeat(salt_length),
+                                             chunksize=16))
+
+    def verify(self, stored, password):
+        """Check ``password`` and return ``(valid, replacement_hash)``.
+
+        ``replacement_hash`` is set when the password was right but ``stored``
+        is plaintext or was made under an older policy; the caller should
+        save it in place of ``stored``.
+        """
+        with PASSWORD_HASH_DURATION.time('verify'):
+            valid = self._run(verify_password, stored, password, self.legacy_plaintext)
+        if not valid:
+            return False, None
+        if self.policy.needs_rehash(stored):
+            return True, self.hash(password)
+        return True, None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
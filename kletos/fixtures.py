@@ -0,0 +1,61 @@
+"""Deterministic catalog fixtures and a bulk loader for benchmark-sized datasets."""
+import random
+from itertools import islice
+
+CATEGORIES = ("Necklace", "Bracelet", "Rings", "Earrings")
+MATERIALS = ("Gold", "Silver", "Rose Gold", "Platinum", "Pearl", "Diamond", "Beaded", "Titanium")
+STYLES = ("Classic", "Twisted", "Layered", "Minimal", "Vintage", "Charm", "Chunky", "Dainty")
+
+SAMPLE_PRODUCTS = (
+    ("Product 1", "Necklace", "image_url_1", 100.0),
+    ("Product 2", "Bracelet", "image_url_2", 50.0),
+)
+
+INSERT_PRODUCT = 'INSERT INTO product (name, category, image, price) VALUES (?, ?, ?, ?)'
+
+
+def generate_products(count, seed=0):
+    """Yield ``count`` reproducible ``(name, category, image, price)`` rows."""
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        name = f"{rng.choice(MATERIALS)} {rng.choice(STYLES)} {category} {i}"
+        yield (name, category, f"image_url_{i}", round(rng.uniform(10, 1000), 2))
+
+
+def load_products(dbapi_conn, rows, chunk_size=10000):
+    """Bulk insert product rows with ``executemany`` in one transaction."""
+    rows = iter(rows)
+    cursor = dbapi_conn.cursor()
+    total = 0
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            cursor.executemany(INSERT_PRODUCT, chunk)
+            total += len(chunk)
+        dbapi_conn.commit()
+    except Exception:
+        dbapi_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return total
+
+
+def seed_catalog(db, rows=SAMPLE_PRODUCTS):
+    """Load ``rows`` into the product table only if it is empty.
+
+    Safe to call on every deploy: a populated catalog is left untouched.
+    """
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        populated = cursor.execute('SELECT 1 FROM product LIMIT 1').fetchone()
+        cursor.close()
+        if populated:
+            return 0
+        return load_products(conn, rows)
+    finally:
+        conn.close()
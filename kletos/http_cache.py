@@ -0,0 +1,109 @@
+"""ETag / Cache-Control support for public, cacheable GET endpoints.
+
+Catalog responses are versioned: every write to ``product`` bumps a counter
+in ``catalog_version`` (via triggers), and a response's ETag is derived from
+that counter plus the request URL. The counter is cached in-process for a
+short TTL, so a revalidation (``If-None-Match``) is answered with 304 without
+running the view or touching the database.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from flask import Response, current_app, has_app_context, make_response, request
+from sqlalchemy import event
+
+CATALOG_VERSION_SQL = 'SELECT version, updated_at FROM catalog_version WHERE id = 1'
+
+
+class CatalogVersion:
+    """In-process view of the catalog version counter, refreshed every ``ttl`` seconds."""
+
+    def __init__(self, loader, ttl=1.0):
+        self.loader = loader
+        self.ttl = ttl
+        self._value = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        now = time.monotonic()
+        if self._value is None or now >= self._expires:
+            with self._lock:
+                if self._value is None or now >= self._expires:
+                    self._value = self.loader()
+                    self._expires = now + self.ttl
+        return self._value
+
+    def expire(self, *args):
+        self._expires = 0.0
+
+
+class HTTPCache:
+    """Each app gets its own ``CatalogVersion``; ``version`` is the current app's."""
+
+    def __init__(self, app=None, db=None):
+        self._listening = False
+        if app is not None:
+            self.init_app(app, db)
+
+    @property
+    def version(self):
+        return current_app.extensions['catalog_version']
+
+    def init_app(self, app, db):
+        def load():
+            row = db.get_engine(app).execute(CATALOG_VERSION_SQL).first()
+            return (row[0], row[1]) if row else (0, None)
+
+        app.extensions['catalog_version'] = CatalogVersion(load, ttl=app.config.get('CATALOG_VERSION_TTL', 1.0))
+        # A commit in this process may have changed the catalog; re-read the
+        # counter on the next request instead of waiting out the TTL. The
+        # session is shared by every app, so listen once.
+        if not self._listening:
+            self._listening = True
+            event.listen(db.session, 'after_commit', self._expire_current)
+
+    def _expire_current(self, session):
+        if has_app_context() and 'catalog_version' in current_app.extensions:
+            self.version.expire()
+
+    def cached(self, max_age=60, s_maxage=300, stale_while_revalidate=600, versioned=True):
+        """Decorate a GET view with ETag, Last-Modified and Cache-Control handling.
+
+        ``versioned`` views depend on catalog data and get an ETag from the
+        catalog version; other views are static and are tagged by body hash.
+        """
+        cache_control = (f'public, max-age={max_age}, s-maxage={s_maxage}, '
+                         f'stale-while-revalidate={stale_while_revalidate}')
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                etag = last_modified = None
+                if versioned:
+                    version, last_modified = self.version.current()
+                    url_hash = hashlib.sha1(request.full_path.encode()).hexdigest()[:16]
+                    etag = f'{view.__name__}-{version}-{url_hash}'
+                    # If-None-Match uses the weak comparison (RFC 7232 §3.2): a
+                    # proxy that compressed the body sends back our tag as W/"..."
+                    if request.if_none_match.contains_weak(etag):
+                        response = Response(status=304)
+                        response.set_etag(etag)
+                        response.headers['Cache-Control'] = cache_control
+                        return response
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if etag is not None:
+                    response.set_etag(etag)
+                    if last_modified:
+                        response.last_modified = last_modified
+                elif not response.is_streamed:
+                    response.add_etag()
+                response.headers['Cache-Control'] = cache_control
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
@@ -0,0 +1,338 @@
+"""Responsive derivatives for product images, rendered off the request path.
+
+An uploaded image is stored once in a content-addressed ``BlobStore`` and
+resized to each of ``IMAGE_WIDTHS`` as WebP and JPEG on a process pool. Every
+derivative is stored under its own SHA-256 as well, so a URL such as
+``/images/<digest>.webp`` always means the same bytes and can be cached
+forever. Rendering is keyed by the source digest: uploading the same bytes
+again, or using one image for several products, reuses the derivatives
+instead of rendering them twice. A product takes on an uploaded image only
+once its derivatives are rendered, together with their ``srcset`` strings,
+ready for ``<img srcset>`` and ``<source type="image/webp" srcset>``.
+
+Pillow is optional; without it uploads are refused. It is only imported where
+images are checked or rendered, so the web process doesn't pay for it at startup.
+"""
+import importlib.util
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+
+from kletos.blobstore import BlobStore, sniff_content_type
+from kletos.cache import product_tags
+from kletos.credentials import pool_context
+
+PILLOW_INSTALLED = importlib.util.find_spec('PIL') is not None
+
+# Derivative widths in pixels; an image narrower than one is offered at its own width instead
+IMAGE_WIDTHS = (160, 320, 640, 1024, 1600)
+
+# (Pillow format, mimetype, save options), in the order srcsets are built
+FORMATS = (
+    ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/gif': 'gif', 'image/webp': 'webp'}
+
+# Content-hashed URLs never change meaning
+IMMUTABLE_MAX_AGE = 31536000
+
+SET_PRODUCT_IMAGE = 'UPDATE product SET image = ? WHERE id = ?'
+# Only if the product still shows the image these were rendered from
+SET_PRODUCT_SRCSET = 'UPDATE product SET image_srcset = ?, image_srcset_webp = ? WHERE id = ? AND image = ?'
+
+UPSERT_ASSET = '''
+    INSERT INTO image_asset (digest, status, width, height, srcset, srcset_webp, error, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (digest) DO UPDATE SET
+        status = excluded.status, width = excluded.width, height = excluded.height, srcset = excluded.srcset,
+        srcset_webp = excluded.srcset_webp, error = excluded.error, updated_at = excluded.updated_at
+'''
+
+IMAGE_ASSET_DDL = (
+    '''CREATE TABLE IF NOT EXISTS image_asset (
+           digest CHAR(64) PRIMARY KEY,
+           status VARCHAR(10) NOT NULL,   -- pending, ready or failed
+           width INTEGER,
+           height INTEGER,
+           srcset TEXT,
+           srcset_webp TEXT,
+           error TEXT,
+           updated_at REAL NOT NULL
+       )''',
+    # A product given a different image drops the derivatives of the old one
+    '''CREATE TRIGGER IF NOT EXISTS product_image_srcset AFTER UPDATE OF image ON product
+       WHEN new.image IS NOT old.image BEGIN
+           UPDATE product SET image_srcset = NULL, image_srcset_webp = NULL WHERE id = new.id;
+       END''',
+)
+
+
+class UnsupportedImage(ValueError):
+    pass
+
+
+class UnreadableImage(ValueError):
+    pass
+
+
+def image_url(digest, mimetype):
+    return f'/images/{digest}.{EXTENSIONS[mimetype]}'
+
+
+def verify_image(path):
+    """Raise ``UnreadableImage`` unless Pillow can parse the image at ``path``.
+
+    Checks the structure (chunk checksums for PNG) without decoding pixels,
+    so it is cheap enough for the request path.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception as e:
+        raise UnreadableImage('The image could not be read') from e
+
+
+def _flatten(image):
+    # JPEG has no alpha channel; composite onto white rather than drop it
+    from PIL import Image
+
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def render_derivatives(root, digest, widths=IMAGE_WIDTHS):
+    """Resize one stored image to each width in every format and store the results.
+
+    Runs in a pool worker. Returns ``{'width', 'height', 'variants'}`` with
+    variants as ``(mimetype, width, digest)``.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise ImportError('Image derivatives need Pillow') from None
+    store = BlobStore(root)
+    path = store.path(digest)
+    if path is None:
+        raise FileNotFoundError(f'No stored image {digest}')
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            transparent = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if transparent else 'RGB')
+        source_width, source_height = image.size
+
+        variants = []
+        # Largest first, each resized from the one before: every step is small,
+        # so LANCZOS stays cheap without visible loss
+        for width in sorted({min(width, source_width) for width in widths}, reverse=True):
+            height = max(1, round(source_height * width / source_width))
+            if image.size != (width, height):
+                image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+            for pillow_format, mimetype, options in FORMATS:
+                frame = _flatten(image) if pillow_format == 'JPEG' and image.mode == 'RGBA' else image
+                buffer = io.BytesIO()
+                frame.save(buffer, format=pillow_format, **options)
+                variants.append((mimetype, width, store.put_bytes(buffer.getvalue())[0]))
+    return {'width': source_width, 'height': source_height, 'variants': variants}
+
+
+def srcsets(variants):
+    """Return ``(jpeg srcset, webp srcset)`` for rendered variants, narrowest first."""
+    def srcset(mimetype):
+        return ', '.join(f'{image_url(digest, mimetype)} {width}w'
+                         for kind, width, digest in sorted(variants, key=lambda variant: variant[1])
+                         if kind == mimetype)
+    return srcset('image/jpeg'), srcset('image/webp')
+
+
+class ImagePipeline:
+    """Stores uploaded product images and renders their derivatives on a process pool.
+
+    ``IMAGE_STORE_PATH`` is the store directory and ``IMAGE_WORKERS`` the pool
+    size (default: one per CPU). ``IMAGE_WORKERS=0`` renders inline, which
+    suits tests and scripts. ``on_change(tags)`` callbacks passed to ``ingest``
+    run in an app context after each write to the product, with its cache
+    tags. Each app gets its own pipeline, as ``app.extensions['images']``.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.store = None
+        self.workers = None
+        self._engine = None
+        self._pool = None
+        self._jobs = {}   # source digest -> [(product_id, url, on_change)] waiting on its render
+        self._latest = {}   # product id -> url of its newest upload not yet applied
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return PILLOW_INSTALLED
+
+    def init_app(self, app, db):
+        def setting(name, default):
+            value = app.config.get(name)
+            return value if value is not None else os.environ.get(name, default)
+
+        self.store = BlobStore(setting('IMAGE_STORE_PATH', 'images'))
+        self.workers = int(setting('IMAGE_WORKERS', os.cpu_count() or 1))
+        self.app = app
+        self._engine = lambda: db.get_engine(app)
+        app.extensions['images'] = self
+        return self
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    context = pool_context(('kletos.credentials', 'kletos.images'))
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def ingest(self, product_id, stream, on_change=None, max_size=None):
+        """Store an upload and make it ``product_id``'s image once its derivatives are rendered.
+
+        Returns ``(url, status)``, where status is that of the derivatives:
+        ``ready``, ``pending`` or ``failed``; the product keeps its current
+        image until they are ready. An upload over ``max_size`` bytes raises
+        ``BlobTooLarge``, one of another type ``UnsupportedImage`` and one
+        Pillow can't parse ``UnreadableImage``; none of them is stored.
+        """
+        staged = self.store.stage_stream(stream, max_size)
+        try:
+            mimetype = sniff_content_type(staged.temp_path)
+            if mimetype not in EXTENSIONS:
+                raise UnsupportedImage('Upload a JPEG, PNG, GIF or WebP image')
+            verify_image(staged.temp_path)
+        except Exception:
+            self.store.discard(staged)
+            raise
+        self.store.keep(staged)
+        digest = staged.digest
+        url = image_url(digest, mimetype)
+
+        waiter = (product_id, url, on_change)
+        with self._lock:
+            # Whichever render finishes first, only the newest upload becomes the image
+            self._latest[product_id] = url
+            if digest in self._jobs:
+                self._jobs[digest].append(waiter)
+                return url, 'pending'
+        asset = self._asset(digest)
+        if asset is not None and asset.status == 'ready':
+            self._apply(asset.srcset, asset.srcset_webp, [waiter])
+            return url, 'ready'
+        self._render(digest, [waiter])
+        return url, self._asset(digest).status
+
+    def render_pending(self):
+        """Render every asset left pending (e.g. by a restart) or failed; returns how many were tried."""
+        with self._engine().begin() as conn:
+            digests = [row[0] for row in conn.execute("SELECT digest FROM image_asset WHERE status != 'ready'")]
+            jobs = []
+            for digest in digests:
+                mimetype = self.store.content_type(digest)
+                if mimetype not in EXTENSIONS:
+                    continue
+                url = image_url(digest, mimetype)
+                products = conn.execute('SELECT id FROM product WHERE image = ?', (url,)).fetchall()
+                jobs.append((digest, [(row[0], url, None) for row in products]))
+        futures = [self._render(digest, waiters) for digest, waiters in jobs]
+        wait([future for future in futures if future is not None])
+        return len(jobs)
+
+    def _asset(self, digest):
+        with self._engine().connect() as conn:
+            return conn.execute('SELECT status, srcset, srcset_webp FROM image_asset WHERE digest = ?',
+                                (digest,)).first()
+
+    def _write_asset(self, digest, status, width=None, height=None, srcset=None, srcset_webp=None, error=None):
+        with self._engine().begin() as conn:
+            conn.execute(UPSERT_ASSET, (digest, status, width, height, srcset, srcset_webp, error, time.time()))
+
+    def _render(self, digest, waiters):
+        with self._lock:
+            if digest in self._jobs:
+                self._jobs[digest].extend(waiters)
+                return None
+            self._jobs[digest] = list(waiters)
+        self._write_asset(digest, 'pending')
+        if self.workers:
+            future = self._get_pool().submit(render_derivatives, self.store.root, digest)
+        else:
+            future = Future()
+            try:
+                future.set_result(render_derivatives(self.store.root, digest))
+            except Exception as e:
+                future.set_exception(e)
+        # Runs at once for an inline render, otherwise on the pool's result thread
+        future.add_done_callback(lambda done: self._finish(digest, done))
+        return future
+
+    def _finish(self, digest, future):
+        # Record the asset before releasing the waiters, so an ingest that
+        # misses the job always finds the finished row
+        try:
+            result = future.result()
+        except Exception as e:
+            self._write_asset(digest, 'failed', error=str(e) or type(e).__name__)
+            jpeg = webp = None
+        else:
+            jpeg, webp = srcsets(result['variants'])
+            self._write_asset(digest, 'ready', result['width'], result['height'], jpeg, webp)
+        with self._lock:
+            waiters = self._jobs.pop(digest, [])
+            if not jpeg:
+                # The product keeps the image it had
+                for product_id, url, _ in waiters:
+                    if self._latest.get(product_id) == url:
+                        del self._latest[product_id]
+        if jpeg:
+            self._apply(jpeg, webp, waiters)
+
+    def _apply(self, srcset, srcset_webp, waiters):
+        changed = []
+        with self._engine().begin() as conn:
+            for product_id, url, on_change in waiters:
+                with self._lock:
+                    if self._latest.get(product_id, url) != url:
+                        continue
+                    self._latest.pop(product_id, None)
+                # The image first: changing it clears the srcsets of the old one
+                if not conn.execute(SET_PRODUCT_IMAGE, (url, product_id)).rowcount:
+                    continue
+                conn.execute(SET_PRODUCT_SRCSET, (srcset, srcset_webp, product_id, url))
+                if on_change:
+                    category = conn.execute('SELECT category FROM product WHERE id = ?', (product_id,)).scalar()
+                    changed.append((on_change, product_tags(product_id, category)))
+        if changed:
+            # Pool renders finish on the executor's thread, outside any request
+            with self.app.app_context():
+                for on_change, tags in changed:
+                    on_change(tags)
+
+
+def _image_assets(conn):
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(product)')}
+    for column in ('image_srcset', 'image_srcset_webp'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE product ADD COLUMN {column} TEXT')
+    for statement in IMAGE_ASSET_DDL:
+        conn.execute(statement)
+
+
+IMAGE_MIGRATIONS = (
+    ('0401_image_assets', _image_assets),
+)
@@ -0,0 +1,34 @@
+"""Hooks for observing the SQL a piece of code issues."""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Collects every statement sent to the database while it is listening."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine):
+    """Count the SQL statements ``engine`` executes inside the ``with`` block.
+
+        with count_queries(db.engine) as queries:
+            client.get('/cart')
+        assert queries.count == 2
+    """
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
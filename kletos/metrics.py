@@ -0,0 +1,262 @@
+"""Low-overhead request, SQL, hashing and JSON timing with a Prometheus endpoint.
+
+Histograms use fixed buckets and a lock-protected list of counts per label
+set, so an observation costs one bisect and a few additions. ``init_app``
+times every request by route and serves the registry at ``/metrics`` in the
+Prometheus text format.
+"""
+import bisect
+import random
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: list(counts) for labels, counts in self._series.items()}
+        for labels, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {counts[-1]}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._histograms = []
+        self._collectors = []
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    def add_collector(self, collector):
+        """Register ``collector() -> [(name, type, help, {label tuple: value})]``."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples.items():
+                    lines.append(f'{name}{_format_labels(*zip(*labels)) if labels else ""} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by route.', ('method', 'route', 'status'))
+SQL_DURATION = registry.histogram(
+    'db_statement_duration_seconds', 'SQL statement execution time.', ('driver',))
+PASSWORD_HASH_DURATION = registry.histogram(
+    'password_hash_duration_seconds', 'Wall time spent hashing or verifying passwords.', ('operation',))
+JSON_ENCODE_DURATION = registry.histogram(
+    'json_encode_duration_seconds', 'Time spent encoding JSON response bodies.')
+
+
+# SQLAlchemy engines: every statement from every engine in the process
+_engine_instrumented = False
+
+
+# The start time lives on the statement's execution context, so a statement
+# that fails (and never reaches after_cursor_execute) leaves nothing behind.
+# Statements run without a context, e.g. sequence defaults, go untimed.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, 'metrics_start', None)
+    if start is not None:
+        SQL_DURATION.observe(time.perf_counter() - start, 'sqlalchemy')
+
+
+def instrument_sqlalchemy():
+    global _engine_instrumented
+    if not _engine_instrumented:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _engine_instrumented = True
+
+
+class TimedConnection:
+    """Wraps a sqlite3 connection so execute/executemany are timed."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, *args):
+        with SQL_DURATION.time('sqlite3'):
+            return self._conn.execute(*args)
+
+    def executemany(self, *args):
+        with SQL_DURATION.time('sqlite3'):
+            return self._conn.executemany(*args)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class SamplingProfiler:
+    """Samples one thread's stack every ``interval`` seconds from a helper thread.
+
+    Results are collapsed stacks (``outer;inner;leaf count``), the input
+    format of flamegraph tools.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def collapsed(self, limit=20):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common(limit))
+
+
+def register_cache(name, cache):
+    """Export an LRUCache's counters as ``cache_*`` metrics labelled by ``name``.
+
+    ``cache`` may also be a function returning the cache to report, such as
+    the current app's, or None when there is none to report.
+    """
+    def collect():
+        current = cache() if callable(cache) else cache
+        if current is None:
+            return []
+        stats = current.stats()
+        labels = (('cache', name),)
+        return [
+            (f'cache_{key}_total', 'counter', f'Cache {key}.', {labels: stats[key]})
+            for key in ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+        ] + [('cache_size', 'gauge', 'Entries currently cached.', {labels: stats['size']})]
+    registry.add_collector(collect)
+
+
+def init_app(app):
+    """Time every request, expose ``/metrics`` and enable optional per-request profiling.
+
+    Profiling is off unless ``METRICS_PROFILING`` is set; then a request is
+    profiled when it sends ``X-Profile: 1`` or is picked by
+    ``METRICS_PROFILE_SAMPLE_RATE`` (0-1), and its collapsed stacks are logged.
+    """
+    profiling = bool(app.config.get('METRICS_PROFILING'))
+    sample_rate = float(app.config.get('METRICS_PROFILE_SAMPLE_RATE', 0.0))
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        if profiling and (request.headers.get('X-Profile') == '1' or random.random() < sample_rate):
+            g.metrics_profiler = SamplingProfiler(threading.get_ident()).start()
+
+    def finish(status):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else '<unmatched>'
+            REQUEST_DURATION.observe(time.perf_counter() - start, request.method, route, status)
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            profiler.stop()
+            app.logger.info('profile %s %s\n%s', request.method, request.path, profiler.collapsed())
+        return profiler
+
+    @app.after_request
+    def record(response):
+        profiler = finish(response.status_code)
+        if profiler is not None:
+            response.headers['X-Profile-Samples'] = str(sum(profiler.samples.values()))
+        return response
+
+    @app.teardown_request
+    def record_failure(exc=None):
+        # Only still pending when the view raised and after_request was skipped
+        finish(500)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,25 @@
+"""Idempotent schema migrations, run once per deploy instead of on import.
+
+A migration is a ``(name, apply)`` pair where ``apply`` receives a SQLAlchemy
+connection. Applied names are recorded in ``schema_migrations`` so each one
+runs exactly once per database.
+"""
+import time
+
+
+def migrate(db, migrations=()):
+    """Create missing tables, then apply any migrations not yet recorded."""
+    db.create_all()
+    applied_now = []
+    with db.engine.begin() as conn:
+        conn.execute('CREATE TABLE IF NOT EXISTS schema_migrations ('
+                     'name TEXT PRIMARY KEY, applied_at REAL NOT NULL)')
+        applied = {row[0] for row in conn.execute('SELECT name FROM schema_migrations')}
+        for name, apply in migrations:
+            if name in applied:
+                continue
+            apply(conn)
+            conn.execute('INSERT INTO schema_migrations (name, applied_at) VALUES (?, ?)',
+                         (name, time.time()))
+            applied_now.append(name)
+    return applied_now
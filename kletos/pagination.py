@@ -0,0 +1,136 @@
+"""Keyset pagination, column projection and streaming helpers for listings."""
+from flask import Response, stream_with_context
+from sqlalchemy import tuple_
+
+from kletos.serializers import fragments
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 1000
+
+
+class PaginationError(ValueError):
+    """Raised when a listing query string cannot be parsed."""
+
+
+def parse_int_arg(args, name, default, minimum=0, maximum=None):
+    raw = args.get(name)
+    if raw is None or raw == '':
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise PaginationError(f"'{name}' must be an integer")
+    if value < minimum:
+        raise PaginationError(f"'{name}' must be at least {minimum}")
+    if maximum is not None and value > maximum:
+        raise PaginationError(f"'{name}' must be at most {maximum}")
+    return value
+
+
+def parse_float_arg(args, name):
+    raw = args.get(name)
+    if raw is None or raw == '':
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        raise PaginationError(f"'{name}' must be a number")
+
+
+def parse_fields(raw, allowed):
+    """Turn ``?fields=a,b`` into an ordered tuple of known column names.
+
+    ``id`` is always included because it is the pagination cursor.
+    """
+    if not raw:
+        return tuple(allowed)
+    fields = ['id']
+    for name in raw.split(','):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in allowed:
+            raise PaginationError(f"Unknown field '{name}'")
+        fields.append(name)
+    return tuple(fields)
+
+
+def parse_cursor(raw, types):
+    """Parse an opaque ``a:b`` cursor into a tuple converted with ``types``."""
+    if raw is None or raw == '':
+        return None
+    parts = raw.split(':')
+    if len(parts) != len(types):
+        raise PaginationError("Malformed 'after' cursor")
+    try:
+        return tuple(convert(part) for convert, part in zip(types, parts))
+    except ValueError:
+        raise PaginationError("Malformed 'after' cursor")
+
+
+def format_cursor(values):
+    return values[0] if len(values) == 1 else ':'.join(str(value) for value in values)
+
+
+def keyset_page(session, model, fields, after=None, limit=DEFAULT_PAGE_SIZE, criteria=(),
+                sort_key=None, descending=False):
+    """Return one page of row tuples after the ``after`` cursor and the cursor for the next page.
+
+    Rows hold the values of ``fields`` in order and are ordered by ``(sort_key, id)``, or by ``id`` alone, so every page is
+    a single index range scan however deep the client has paged. Only the
+    requested columns are selected, and one extra row is fetched to know
+    whether another page exists without running a COUNT.
+    """
+    keys = ('id',) if sort_key is None else (sort_key, 'id')
+    selected = tuple(fields) + tuple(key for key in keys if key not in fields)
+    key_columns = [getattr(model, key) for key in keys]
+
+    query = session.query(*[getattr(model, name) for name in selected]).filter(*criteria)
+    if after is not None:
+        after = after if isinstance(after, tuple) else (after,)
+        if len(keys) == 1:
+            position, bound = key_columns[0], after[0]
+        else:
+            position, bound = tuple_(*key_columns), tuple_(*after)
+        query = query.filter(position < bound if descending else position > bound)
+    order = [column.desc() for column in key_columns] if descending else key_columns
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_after = None
+    if has_more:
+        last = dict(zip(selected, rows[-1]))
+        next_after = format_cursor([last[key] for key in keys])
+    width = len(fields)
+    return [tuple(row[:width]) for row in rows], next_after
+
+
+def stream_listing(session, model, fields, key='products', criteria=(), batch_size=STREAM_BATCH_SIZE):
+    """Stream every matching row as one JSON document, one keyset batch at a time.
+
+    At most ``batch_size`` rows are held in memory at once, so a full export
+    costs the same memory for a thousand products as for a million.
+    """
+    columns = [getattr(model, name) for name in fields]
+    id_index = fields.index('id')
+
+    def generate():
+        yield b'{"' + key.encode() + b'":['
+        after = 0
+        separator = b''
+        while True:
+            rows = (session.query(*columns)
+                    .filter(model.id > after, *criteria)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                    .all())
+            if not rows:
+                break
+            yield separator + b','.join([fragments.encode(fields, tuple(row)) for row in rows])
+            separator = b','
+            after = rows[-1][id_index]
+        yield b']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
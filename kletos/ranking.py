@@ -0,0 +1,110 @@
+"""Product popularity from cart activity, kept in a ranking table.
+
+Every cart add upserts one ``product_rank`` row in the same transaction, so
+keeping the ranking current costs one statement per add, whatever the
+catalog size. Scores decay with a half-life of ``RANK_HALF_LIFE`` using
+forward decay: an add at time ``t`` is worth ``2 ** ((t - RANK_EPOCH) / RANK_HALF_LIFE)``,
+which ranks products exactly as if every older add had been decayed to now,
+without ever rewriting old rows. Reads are one range scan down the score
+index, overall or within a category.
+"""
+import time
+
+# Column order matches serializers.PRODUCT_FIELDS
+PRODUCT_COLUMNS = 'p.id, p.name, p.category, p.image, p.price, p.stock, p.image_srcset, p.image_srcset_webp'
+
+RANK_EPOCH = 1704067200.0          # 2024-01-01 UTC
+RANK_HALF_LIFE = 7 * 86400.0       # an add loses half its weight after a week
+# Weights double every half-life, so a REAL score overflows roughly 1000
+# half-lives (about 19 years) after RANK_EPOCH; move the epoch and run
+# `flask rebuild-rankings` well before then.
+
+RECORD_CART_ADD = '''
+    INSERT INTO product_rank (product_id, category, score, add_count, last_added_at)
+    VALUES (:product_id, :category, :weight, 1, :now)
+    ON CONFLICT (product_id) DO UPDATE SET
+        score = score + excluded.score,
+        add_count = add_count + 1,
+        last_added_at = excluded.last_added_at
+'''
+
+TOP_PRODUCTS = f'''
+    SELECT {PRODUCT_COLUMNS} FROM product_rank AS r JOIN product AS p ON p.id = r.product_id
+    ORDER BY r.score DESC LIMIT :limit
+'''
+
+TOP_PRODUCTS_IN_CATEGORY = f'''
+    SELECT {PRODUCT_COLUMNS} FROM product_rank AS r JOIN product AS p ON p.id = r.product_id
+    WHERE r.category = :category ORDER BY r.score DESC LIMIT :limit
+'''
+
+# Used until there is cart activity to rank by
+FIRST_PRODUCTS = f'SELECT {PRODUCT_COLUMNS} FROM product AS p ORDER BY p.id LIMIT :limit'
+FIRST_PRODUCTS_IN_CATEGORY = (f'SELECT {PRODUCT_COLUMNS} FROM product AS p WHERE p.category = :category '
+                              'ORDER BY p.id LIMIT :limit')
+
+# Each cart line counts as one add made now; used to backfill and to rebuild
+REBUILD_RANKINGS = '''
+    INSERT INTO product_rank (product_id, category, score, add_count, last_added_at)
+    SELECT ci.product_id, p.category, COUNT(*) * :weight, COUNT(*), :now
+    FROM cart_item AS ci JOIN product AS p ON p.id = ci.product_id
+    GROUP BY ci.product_id
+'''
+
+# The category is copied onto the ranking row so per-category reads use one
+# index; these keep it in step with the product
+PRODUCT_RANK_DDL = (
+    '''CREATE TABLE IF NOT EXISTS product_rank (
+           product_id INTEGER PRIMARY KEY,
+           category VARCHAR(50) NOT NULL,
+           score REAL NOT NULL,
+           add_count INTEGER NOT NULL,
+           last_added_at REAL NOT NULL
+       )''',
+    'CREATE INDEX IF NOT EXISTS ix_product_rank_score ON product_rank (score)',
+    'CREATE INDEX IF NOT EXISTS ix_product_rank_category_score ON product_rank (category, score)',
+    '''CREATE TRIGGER IF NOT EXISTS product_rank_category AFTER UPDATE OF category ON product BEGIN
+           UPDATE product_rank SET category = new.category WHERE product_id = new.id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_rank_delete AFTER DELETE ON product BEGIN
+           DELETE FROM product_rank WHERE product_id = old.id;
+       END''',
+)
+
+
+def rank_weight(now):
+    return 2.0 ** ((now - RANK_EPOCH) / RANK_HALF_LIFE)
+
+
+def record_cart_add(session, product_id, category, now=None):
+    now = time.time() if now is None else now
+    session.execute(RECORD_CART_ADD, {"product_id": product_id, "category": category,
+                                      "weight": rank_weight(now), "now": now})
+
+
+def top_products(session, limit, category=None):
+    """Return up to ``limit`` product rows, most popular first."""
+    if category is None:
+        rows = session.execute(TOP_PRODUCTS, {"limit": limit}).fetchall()
+        return rows or session.execute(FIRST_PRODUCTS, {"limit": limit}).fetchall()
+    params = {"category": category, "limit": limit}
+    rows = session.execute(TOP_PRODUCTS_IN_CATEGORY, params).fetchall()
+    return rows or session.execute(FIRST_PRODUCTS_IN_CATEGORY, params).fetchall()
+
+
+def rebuild_rankings(conn, now=None):
+    """Replace the ranking with one computed from current cart contents; returns rows written."""
+    now = time.time() if now is None else now
+    conn.execute('DELETE FROM product_rank')
+    return conn.execute(REBUILD_RANKINGS, {"weight": rank_weight(now), "now": now}).rowcount
+
+
+def _product_rank(conn):
+    for statement in PRODUCT_RANK_DDL:
+        conn.execute(statement)
+    rebuild_rankings(conn)
+
+
+RANKING_MIGRATIONS = (
+    ('0301_product_rank', _product_rank),
+)
@@ -0,0 +1,256 @@
+"""Token-bucket rate limiting and admission control for the expensive auth endpoints.
+
+Each protected request spends tokens from two buckets: one per client IP and
+one per account named in the request body (email or phone), so a
+credential-stuffing burst is cut off whether it comes from one address or
+targets one account from many. Endpoints are charged by cost: a sign-up
+hashes a password and writes a row, a login only verifies, a bulk import
+pays per record. On top of the buckets an admission gate caps the total cost
+in flight per process, so requests beyond what the hashing pool can work
+through are turned away with 429 before any hashing starts, instead of
+queueing behind it and taking worker threads from every other endpoint.
+Bulk imports have their own gate and buckets, so a running import never
+shuts out logins and sign-ups.
+
+Buckets live in process memory by default. ``RATE_LIMIT_STORAGE_URL`` set to
+``redis://...`` shares them between processes and hosts (needs ``redis``).
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, has_app_context, jsonify, request
+
+from kletos import metrics
+
+# Request costs, roughly in password hashes: a sign-up hashes and writes, a
+# login verifies, and a bulk import pays for every record it carries
+SIGNUP_COST = 2
+LOGIN_COST = 1
+BATCH_RECORD_COST = SIGNUP_COST
+
+# Admission gates: interactive auth traffic, and bulk imports kept apart from it
+AUTH = 'auth'
+BATCH = 'batch'
+
+# Lua so the read-refill-spend cycle is atomic on the Redis server
+TAKE_SCRIPT = '''
+local capacity, rate, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(retry_after)
+'''
+
+
+class MemoryBackend:
+    """Buckets in a bounded in-process LRU; the least recently used keys are dropped first."""
+
+    def __init__(self, max_keys=100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()   # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, capacity, rate):
+        """Spend ``cost`` tokens; returns 0 if allowed, else seconds until it would be."""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / rate
+
+
+class RedisBackend:
+    """Buckets shared through Redis; ``client`` is a ``redis.Redis`` or anything with ``register_script``."""
+
+    def __init__(self, client, prefix='ratelimit:', clock=time.time):
+        self.prefix = prefix
+        self.clock = clock
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError('RATE_LIMIT_STORAGE_URL points at Redis but the redis package is not installed')
+        return cls(redis.Redis.from_url(url))
+
+    def take(self, key, cost, capacity, rate):
+        return float(self._take(keys=[self.prefix + key], args=[capacity, rate, cost, self.clock()]))
+
+
+def backend_from_url(url):
+    if not url or url.startswith('memory://'):
+        return MemoryBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend.from_url(url)
+    raise ValueError(f'Unsupported rate limit storage {url!r}')
+
+
+class AdmissionGate:
+    """Caps the summed cost of expensive requests in flight in this process."""
+
+    def __init__(self, max_cost):
+        self.max_cost = max_cost
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, cost):
+        with self._lock:
+            # A request costlier than the cap still runs when nothing else is in flight
+            if self.in_flight and self.in_flight + cost > self.max_cost:
+                return False
+            self.in_flight += cost
+            return True
+
+    def release(self, cost):
+        with self._lock:
+            self.in_flight -= cost
+
+
+class RateLimits:
+    """One app's buckets, bucket sizes, admission gates and rejection counts."""
+
+    def __init__(self, backend, enabled=True, ip_limit=(20.0, 1.0), account_limit=(10.0, 0.1),
+                 max_cost=None, batch_max_cost=None):
+        default_cost = (os.cpu_count() or 1) * 4
+        self.backend = backend
+        self.enabled = enabled
+        self.ip_limit = ip_limit
+        self.account_limit = account_limit
+        self.gates = {AUTH: AdmissionGate(max_cost or default_cost),
+                      BATCH: AdmissionGate(batch_max_cost or default_cost)}
+        self.rejections = {'ip': 0, 'account': 0, 'admission': 0}
+        self._lock = threading.Lock()
+
+    def count_rejection(self, reason):
+        with self._lock:
+            self.rejections[reason] += 1
+
+
+class RateLimiter:
+    """Per-IP and per-account token buckets plus admission gates, configured from the app.
+
+    ``RATE_LIMIT_IP_BURST`` / ``RATE_LIMIT_IP_PER_SECOND`` and
+    ``RATE_LIMIT_ACCOUNT_BURST`` / ``RATE_LIMIT_ACCOUNT_PER_SECOND`` size the
+    buckets, in cost units; ``ADMISSION_MAX_COST`` and
+    ``BATCH_ADMISSION_MAX_COST`` cap the auth and bulk-import cost in flight
+    (default: four per CPU each); ``RATE_LIMIT_ENABLED=0`` turns it all off.
+    Each app gets its own ``RateLimits`` as ``app.extensions['rate_limits']``;
+    a ``backend`` given here is shared by all of them.
+    """
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend
+        self._collecting = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        def setting(name, default=None):
+            value = app.config.get(name)
+            return value if value is not None else os.environ.get(name, default)
+
+        max_cost, batch_max_cost = setting('ADMISSION_MAX_COST'), setting('BATCH_ADMISSION_MAX_COST')
+        app.extensions['rate_limits'] = RateLimits(
+            self.backend or backend_from_url(setting('RATE_LIMIT_STORAGE_URL', 'memory://')),
+            enabled=str(setting('RATE_LIMIT_ENABLED', '1')).lower() not in ('0', 'false', 'no'),
+            ip_limit=(float(setting('RATE_LIMIT_IP_BURST', 20.0)), float(setting('RATE_LIMIT_IP_PER_SECOND', 1.0))),
+            account_limit=(float(setting('RATE_LIMIT_ACCOUNT_BURST', 10.0)),
+                           float(setting('RATE_LIMIT_ACCOUNT_PER_SECOND', 0.1))),
+            max_cost=int(max_cost) if max_cost else None,
+            batch_max_cost=int(batch_max_cost) if batch_max_cost else None)
+        # Metrics are process-wide; report whichever app is serving /metrics
+        if not self._collecting:
+            metrics.registry.add_collector(self._collect)
+            self._collecting = True
+
+    def _collect(self):
+        limits = current_app.extensions.get('rate_limits') if has_app_context() else None
+        if limits is None:
+            return []
+        return [
+            ('rate_limit_rejections_total', 'counter', 'Requests turned away with 429.',
+             {(('reason', reason),): count for reason, count in limits.rejections.items()}),
+            ('admission_cost_in_flight', 'gauge', 'Cost of admitted expensive requests still running.',
+             {(('gate', name),): gate.in_flight for name, gate in limits.gates.items()}),
+        ]
+
+    def _reject(self, limits, reason, retry_after):
+        limits.count_rejection(reason)
+        seconds = max(1, math.ceil(retry_after))
+        response = jsonify({'error': f'Too many requests, retry in {seconds} seconds'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(seconds)
+        # The body may not have been read; close rather than leave it on a
+        # keep-alive connection to be parsed as the next request
+        response.headers['Connection'] = 'close'
+        return response
+
+    def limit(self, cost=1, account_fields=(), gate=AUTH):
+        """Decorate a view so each call spends ``cost`` from the caller's buckets.
+
+        ``cost`` may be a function of the current request, e.g. counting the
+        records in a bulk import; it is capped at the gate's size, so any one
+        request can still be admitted. ``account_fields`` name the JSON body
+        (or multipart form) fields identifying the account; the first one
+        present keys the account bucket. Each ``gate`` has its own buckets.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                limits = current_app.extensions['rate_limits']
+                if not limits.enabled:
+                    return view(*args, **kwargs)
+
+                admission = limits.gates[gate]
+                spend = min(cost() if callable(cost) else cost, admission.max_cost)
+                retry_after = limits.backend.take(f'{gate}:ip:{request.remote_addr}',
+                                                  min(spend, limits.ip_limit[0]), *limits.ip_limit)
+                if retry_after:
+                    return self._reject(limits, 'ip', retry_after)
+                data = None
+                if account_fields:
+                    data = request.get_json(silent=True)
+                    if data is None and request.mimetype == 'multipart/form-data':
+                        data = request.form
+                account = next((data[field] for field in account_fields
+                                if isinstance(data, dict) and isinstance(data.get(field), str)), None)
+                if account:
+                    retry_after = limits.backend.take(f'{gate}:account:{account.strip().lower()}',
+                                                      min(spend, limits.account_limit[0]), *limits.account_limit)
+                    if retry_after:
+                        return self._reject(limits, 'account', retry_after)
+
+                if not admission.try_acquire(spend):
+                    return self._reject(limits, 'admission', 1)
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    admission.release(spend)
+            return wrapper
+        return decorator
@@ -0,0 +1,164 @@
+"""Access-token revocation: an in-memory JTI denylist backed by SQLite.
+
+Every authenticated request asks whether its token was revoked. The answer
+comes from memory: a Bloom filter rejects almost every live token with a few
+bit probes on the string's cached hash, and only filter hits consult the
+exact set. Revocations are written to ``revoked_token`` so they survive
+restarts and reach other processes, which pick up new rows every
+``refresh_interval`` seconds; rows past their token's expiry are pruned.
+"""
+import math
+import threading
+import time
+
+from flask import current_app
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+REVOKE_TOKEN = 'INSERT OR IGNORE INTO revoked_token (jti, expires_at) VALUES (?, ?)'
+LOAD_REVOKED = 'SELECT id, jti, expires_at FROM revoked_token WHERE id > ? AND expires_at > ?'
+PRUNE_REVOKED = 'DELETE FROM revoked_token WHERE expires_at <= ?'
+
+
+def _revoked_tokens(conn):
+    # AUTOINCREMENT so ids are never reused after a prune; processes poll by id
+    conn.execute('''CREATE TABLE IF NOT EXISTS revoked_token (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        jti VARCHAR(36) NOT NULL UNIQUE,
+                        expires_at REAL NOT NULL)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_revoked_token_expires_at ON revoked_token (expires_at)')
+
+
+AUTH_MIGRATIONS = (
+    ('0201_revoked_tokens', _revoked_tokens),
+)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, using Python's per-process ``hash``.
+
+    Positions come from double hashing the 64-bit string hash, so a lookup
+    allocates nothing beyond small ints. The filter lives only in this
+    process, which makes hash randomization harmless.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, key):
+        h = hash(key)
+        h1, h2 = h & 0xFFFFFFFF, ((h >> 32) & 0xFFFFFFFF) | 1
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.size
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        h = hash(key)
+        h1, h2 = h & 0xFFFFFFFF, ((h >> 32) & 0xFFFFFFFF) | 1
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class TokenDenylist:
+    """Revoked JTIs for one app: Bloom pre-check, exact dict, SQLite persistence."""
+
+    def __init__(self, capacity=100000, error_rate=0.001, refresh_interval=5.0, prune_interval=3600.0,
+                 clock=time.time):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.prune_interval = prune_interval
+        self.clock = clock
+        self.engine = None
+        self._state = (BloomFilter(capacity, error_rate), {})   # swapped as a unit on rebuild
+        self._last_id = 0
+        self._next_refresh = 0.0
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db, jwt):
+        """Bind to ``app`` as ``app.extensions['denylist']``; build one denylist per app."""
+        self.engine = lambda: db.get_engine(app)
+        self.refresh_interval = app.config.get('TOKEN_DENYLIST_REFRESH', self.refresh_interval)
+        app.extensions['denylist'] = self
+
+        # The JWTManager is shared by every app, so ask the current app's denylist
+        @jwt.token_in_blocklist_loader
+        def check_if_token_revoked(jwt_header, jwt_payload):
+            return current_app.extensions['denylist'].is_revoked(jwt_payload['jti'])
+        return self
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        bloom, revoked = self._state
+        if jti not in bloom:
+            return False
+        expires_at = revoked.get(jti)
+        return expires_at is not None and expires_at > self.clock()
+
+    def revoke(self, jti, expires_at):
+        """Deny ``jti`` until ``expires_at`` (epoch seconds), here and, after a refresh, everywhere."""
+        with self.engine().begin() as conn:
+            conn.execute(REVOKE_TOKEN, (jti, expires_at))
+        with self._lock:
+            bloom, revoked = self._state
+            revoked[jti] = expires_at
+            bloom.add(jti)
+
+    def revoke_current(self):
+        """Revoke the token on the current request, if it carries a live one.
+
+        An expired, revoked or unreadable token can't be used again anyway,
+        so it is ignored rather than refused: signing out twice succeeds.
+        """
+        try:
+            verify_jwt_in_request(optional=True)
+        except (JWTExtendedException, PyJWTError):
+            return False
+        claims = get_jwt()
+        if claims:
+            self.revoke(claims['jti'], claims.get('exp', self.clock() + 86400))
+        return bool(claims)
+
+    def refresh(self):
+        """Load rows written since the last refresh, by this or any other process."""
+        with self._lock:
+            if time.monotonic() < self._next_refresh:
+                return
+            now = self.clock()
+            if time.monotonic() >= self._next_prune:
+                self._prune(now)
+            bloom, revoked = self._state
+            rows = self.engine().execute(LOAD_REVOKED, (self._last_id, now)).fetchall()
+            for row_id, jti, expires_at in rows:
+                revoked[jti] = expires_at
+                bloom.add(jti)
+                self._last_id = max(self._last_id, row_id)
+            self._next_refresh = time.monotonic() + self.refresh_interval
+
+    def prune(self):
+        with self._lock:
+            return self._prune(self.clock())
+
+    def _prune(self, now):
+        # A Bloom filter can't forget, so prune by rebuilding from the live rows
+        with self.engine().begin() as conn:
+            pruned = conn.execute(PRUNE_REVOKED, (now,)).rowcount
+            rows = conn.execute(LOAD_REVOKED, (0, now)).fetchall()
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        revoked = {}
+        for row_id, jti, expires_at in rows:
+            revoked[jti] = expires_at
+            bloom.add(jti)
+            self._last_id = max(self._last_id, row_id)
+        self._state = (bloom, revoked)
+        self._next_prune = time.monotonic() + self.prune_interval
+        return pruned
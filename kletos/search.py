@@ -0,0 +1,61 @@
+"""Full-text product search over the product_fts FTS5 index."""
+import re
+
+from kletos.pagination import format_cursor
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# BM25 column weights: a hit in the name counts ten times a hit in the category
+NAME_WEIGHT = 10.0
+CATEGORY_WEIGHT = 1.0
+
+SEARCH_SQL = '''
+    -- column order matches serializers.PRODUCT_FIELDS
+    SELECT product.id, product.name, product.category, product.image, product.price, product.stock,
+           product.image_srcset, product.image_srcset_webp,
+           bm25(product_fts, {name_weight}, {category_weight}) AS score
+    FROM product_fts JOIN product ON product.id = product_fts.rowid
+    WHERE product_fts MATCH :match {keyset}
+    ORDER BY score, product.id
+    LIMIT :limit
+'''
+
+KEYSET = 'AND (bm25(product_fts, {name_weight}, {category_weight}), product_fts.rowid) > (:score, :id)'
+
+
+def build_match(query):
+    """Turn free text into an FTS5 expression matching every term as a prefix.
+
+    Terms are quoted so user input can never be parsed as FTS5 syntax, and the
+    trailing ``*`` gives type-ahead matching ("neck" finds "Necklace").
+    """
+    terms = _TOKEN.findall(query)
+    if not terms:
+        return None
+    return ' '.join('"%s"*' % term for term in terms)
+
+
+def search_products(session, query, after=None, limit=50):
+    """Return ``(rows, next_after)`` ranked by BM25, best match first.
+
+    Rows are tuples in ``PRODUCT_FIELDS`` order.
+
+    ``after`` is the ``(score, id)`` cursor from the previous page; lower BM25
+    scores are better matches, so pages walk the ranking in ascending order.
+    """
+    match = build_match(query)
+    if match is None:
+        return [], None
+
+    weights = {'name_weight': NAME_WEIGHT, 'category_weight': CATEGORY_WEIGHT}
+    params = {'match': match, 'limit': limit + 1}
+    keyset = ''
+    if after is not None:
+        keyset = KEYSET.format(**weights)
+        params['score'], params['id'] = after
+    rows = session.execute(SEARCH_SQL.format(keyset=keyset, **weights), params).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_after = format_cursor((rows[-1][8], rows[-1][0])) if has_more else None
+    return [tuple(row[:8]) for row in rows], next_after
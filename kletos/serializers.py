@@ -0,0 +1,96 @@
+"""Fast JSON encoding for product listings.
+
+Listings select plain column tuples instead of hydrating ORM objects, and
+each row is encoded once into a cached byte fragment keyed by its values, so
+an unchanged product is never re-encoded. The JSON backend is orjson when
+installed, then ujson, then the standard library; ``JSON_BACKEND`` forces one.
+"""
+import json
+import os
+
+from flask import Response
+
+from kletos.metrics import JSON_ENCODE_DURATION
+
+PRODUCT_FIELDS = ('id', 'name', 'category', 'image', 'price', 'stock', 'image_srcset', 'image_srcset_webp')
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def _load_backend(name=None):
+    candidates = (name,) if name else ('orjson', 'ujson', 'json')
+    for candidate in candidates:
+        if candidate == 'orjson':
+            try:
+                import orjson
+            except ImportError:
+                continue
+            return 'orjson', orjson.dumps
+        if candidate == 'ujson':
+            try:
+                import ujson
+            except ImportError:
+                continue
+            return 'ujson', lambda obj: ujson.dumps(obj, ensure_ascii=False).encode()
+        if candidate == 'json':
+            return 'json', _stdlib_dumps
+    raise ImportError(f'JSON backend {name!r} is not installed')
+
+
+backend_name, dumps = _load_backend(os.environ.get('JSON_BACKEND'))
+
+
+def product_dict(row, fields=PRODUCT_FIELDS):
+    return dict(zip(fields, row))
+
+
+class FragmentCache:
+    """Pre-encoded JSON objects keyed by ``(fields, row)``.
+
+    A changed product has a different row tuple and so gets a fresh fragment;
+    stale fragments simply age out. Oldest entries are dropped past ``maxsize``.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._fragments = {}
+
+    def encode(self, fields, row):
+        key = (fields, row)
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            fragment = dumps(dict(zip(fields, row)))
+            if len(self._fragments) >= self.maxsize:
+                try:
+                    del self._fragments[next(iter(self._fragments))]
+                except (KeyError, RuntimeError, StopIteration):
+                    pass
+            self._fragments[key] = fragment
+        return fragment
+
+    def encode_rows(self, fields, rows):
+        return b'[' + b','.join([self.encode(fields, row) for row in rows]) + b']'
+
+
+fragments = FragmentCache(maxsize=int(os.environ.get('JSON_FRAGMENT_CACHE_SIZE', 100000)))
+
+
+def listing_body(fields, rows, key='products', **extra):
+    """Encode ``{key: [rows...], **extra}`` as bytes without per-row dicts on the hot path."""
+    with JSON_ENCODE_DURATION.time():
+        body = b'{"' + key.encode() + b'":' + fragments.encode_rows(fields, rows)
+        for name, value in extra.items():
+            body += b',"' + name.encode() + b'":' + dumps(value)
+        return body + b'}'
+
+
+def listing_response(fields, rows, key='products', **extra):
+    return Response(listing_body(fields, rows, key, **extra), mimetype='application/json')
+
+
+def json_response(payload, status=200):
+    with JSON_ENCODE_DURATION.time():
+        body = dumps(payload)
+    return Response(body, status=status, mimetype='application/json')
@@ -0,0 +1,92 @@
+"""Pooled, tuned sqlite3 connections for the raw-SQL service."""
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from flask import g
+
+# WAL lets readers proceed while a write is in progress and turns each commit
+# into an append; synchronous=NORMAL is durable across application crashes in
+# WAL mode and only risks the last transactions on power loss.
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -20000),     # KiB, i.e. ~20 MB of page cache per connection
+    ('mmap_size', 268435456),   # 256 MB of memory-mapped reads
+    ('temp_store', 'MEMORY'),
+)
+
+
+def apply_pragmas(conn, pragmas=DEFAULT_PRAGMAS):
+    for name, value in pragmas:
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+class ConnectionPool:
+    """A bounded LIFO pool of sqlite3 connections.
+
+    In a Flask app, ``get()`` hands each request (app context) one connection
+    and the teardown handler returns it, rolling back anything left
+    uncommitted. Connections beyond ``size`` are closed instead of pooled.
+    ``wrap`` can decorate each new connection, e.g. with timing.
+    """
+
+    def __init__(self, path, size=8, busy_timeout=5.0, pragmas=DEFAULT_PRAGMAS, row_factory=sqlite3.Row,
+                 wrap=None):
+        self.path = path
+        self.wrap = wrap
+        self.busy_timeout = busy_timeout
+        self.pragmas = pragmas
+        self.row_factory = row_factory
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        # timeout makes a writer wait up to busy_timeout seconds for the lock
+        # instead of failing straight away with "database is locked"
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = self.row_factory
+        apply_pragmas(conn, self.pragmas)
+        return self.wrap(conn) if self.wrap else conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def get(self):
+        """Return the connection bound to the current app context."""
+        if 'sqlite_conn' not in g:
+            g.sqlite_conn = self.acquire()
+        return g.sqlite_conn
+
+    def teardown(self, exc=None):
+        conn = g.pop('sqlite_conn', None)
+        if conn is not None:
+            self.release(conn)
+
+    def init_app(self, app):
+        app.teardown_appcontext(self.teardown)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
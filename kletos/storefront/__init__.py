@@ -0,0 +1,178 @@
+"""The storefront: catalog, media, content, homepage, account and cart blueprints on one app and one database.
+
+``homepage_endpoints/app.py`` and ``product_details/app.py`` both serve the
+app built by ``create_app``. Building it only binds extensions and registers
+routes; the schema and seed data are created by ``flask init-db`` (or
+``init_db()``), and the database is first touched by the first request.
+Deployments with no release step to run ``init-db`` from, such as Vercel,
+rely on that first request: it creates the schema if any of it is missing,
+unless ``INIT_DB_ON_FIRST_REQUEST=0``.
+"""
+import os
+import sqlite3
+
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+from sqlalchemy.exc import OperationalError
+
+from kletos import metrics
+from kletos.accounts import ACCOUNT_MIGRATIONS, merge_accounts
+from kletos.cache import LRUCache
+from kletos.cart import CART_MIGRATIONS
+from kletos.catalog import CATALOG_MIGRATIONS
+from kletos.credentials import CredentialHasher
+from kletos.fixtures import SAMPLE_PRODUCTS, generate_products, seed_catalog
+from kletos.images import IMAGE_MIGRATIONS, ImagePipeline
+from kletos.migrations import migrate
+from kletos.ranking import RANKING_MIGRATIONS, rebuild_rankings
+from kletos.revocation import AUTH_MIGRATIONS, TokenDenylist
+from kletos.storefront.extensions import db, denylist, http_cache, images, jwt, limiter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_DATABASE_URI = 'sqlite:///' + os.path.join(ROOT, 'products.db')
+
+# Schema migrations applied on top of db.create_all(), in order
+MIGRATIONS = (CATALOG_MIGRATIONS + CART_MIGRATIONS + AUTH_MIGRATIONS + ACCOUNT_MIGRATIONS + RANKING_MIGRATIONS
+              + IMAGE_MIGRATIONS)
+
+
+def create_app(config=None):
+    app = Flask(__name__)
+
+    # Configure your app with a secret key and SQLAlchemy database URI
+    app.config['JWT_SECRET_KEY'] = 'secret'  # Change this!
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('PRODUCTS_DATABASE_URI', DEFAULT_DATABASE_URI)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Wait for the write lock instead of failing with "database is locked"
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    # Comma-separated emails of the accounts allowed to use POST /products/bulk
+    app.config['CATALOG_WRITERS'] = os.environ.get('CATALOG_WRITERS', '')
+    # Uploaded product images and their derivatives, stored by content hash
+    app.config['IMAGE_STORE_PATH'] = os.environ.get('IMAGE_STORE_PATH', os.path.join(ROOT, 'images'))
+    # Largest accepted image upload, in bytes
+    app.config['IMAGE_MAX_BYTES'] = int(os.environ.get('IMAGE_MAX_BYTES', 20 * 1024 * 1024))
+    # Entries and seconds for the product page and category listing cache
+    app.config['PRODUCT_CACHE_SIZE'] = int(os.environ.get('PRODUCT_CACHE_SIZE', 10000))
+    app.config['PRODUCT_CACHE_TTL'] = float(os.environ.get('PRODUCT_CACHE_TTL', 300))
+    # Create a missing schema on the first request, for hosts that can't run `flask init-db`
+    app.config['INIT_DB_ON_FIRST_REQUEST'] = os.environ.get('INIT_DB_ON_FIRST_REQUEST', '1') not in ('0', 'false', 'no')
+    app.config['METRICS_PROFILING'] = os.environ.get('METRICS_PROFILING')
+    app.config['METRICS_PROFILE_SAMPLE_RATE'] = float(os.environ.get('METRICS_PROFILE_SAMPLE_RATE', 0))
+    app.config.update(config or {})
+
+    jwt.init_app(app)
+    db.init_app(app)
+    http_cache.init_app(app, db)
+    TokenDenylist().init_app(app, db, jwt)
+    limiter.init_app(app)
+    ImagePipeline().init_app(app, db)
+
+    # Password hashing runs on a process pool sized by PASSWORD_HASH_WORKERS, with the
+    # algorithm and work factor from PASSWORD_HASH_ALGORITHM / PASSWORD_HASH_WORK_FACTOR.
+    # The pool itself starts on the first hash, not here.
+    app.extensions['hasher'] = CredentialHasher.from_config(app.config)
+
+    # Route latency, SQL, hashing and JSON timings, served at /metrics
+    metrics.init_app(app)
+    metrics.instrument_sqlalchemy()
+
+    # Imported here so `import kletos.storefront` stays cheap for tools that
+    # only need init_db or the models
+    from kletos.storefront import accounts, cart, catalog, content, homepage, media
+    for blueprint in (content.bp, homepage.bp, catalog.bp, media.bp, accounts.bp, cart.bp):
+        app.register_blueprint(blueprint)
+
+    # In-process caches belong to the app, so apps built side by side (as in
+    # tests) never serve each other's entries
+    app.extensions['product_cache'] = LRUCache(maxsize=app.config['PRODUCT_CACHE_SIZE'],
+                                               ttl=app.config['PRODUCT_CACHE_TTL'])
+    app.extensions['homepage'] = homepage.build_homepage()
+
+    if app.config['INIT_DB_ON_FIRST_REQUEST']:
+        app.before_first_request(ensure_schema)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(prune_revoked_tokens_command)
+    app.cli.add_command(rebuild_rankings_command)
+    app.cli.add_command(render_images_command)
+    app.cli.add_command(merge_accounts_command)
+    return app
+
+
+# Create the schema and seed the catalog. This runs once per deploy through
+# `flask init-db`, never on import or inside a request.
+def init_db(products=0):
+    from kletos.storefront import models  # noqa: F401  registers the tables with db.create_all()
+    migrate(db, MIGRATIONS)
+    rows = generate_products(products) if products else SAMPLE_PRODUCTS
+    return seed_catalog(db, rows)
+
+
+def schema_ready():
+    """Whether every migration has been applied; one query against an initialised database."""
+    try:
+        with db.engine.connect() as conn:
+            applied = {row[0] for row in conn.execute('SELECT name FROM schema_migrations')}
+    except OperationalError:
+        return False
+    return all(name in applied for name, _ in MIGRATIONS)
+
+
+def ensure_schema():
+    # Workers starting together may race to create tables; the loser is fine
+    # as long as the winner finished the job
+    if schema_ready():
+        return
+    try:
+        init_db()
+    except OperationalError:
+        if not schema_ready():
+            raise
+
+
+@click.command('init-db')
+@click.option('--products', default=0, help='Seed this many generated products instead of the sample fixtures.')
+@with_appcontext
+def init_db_command(products):
+    seeded = init_db(products)
+    click.echo(f'Database ready, {seeded} products seeded')
+
+
+@click.command('prune-revoked-tokens')
+@with_appcontext
+def prune_revoked_tokens_command():
+    click.echo(f'Pruned {denylist.prune()} expired revocations')
+
+
+@click.command('rebuild-rankings')
+@with_appcontext
+def rebuild_rankings_command():
+    # Discards accumulated recency; only needed after moving RANK_EPOCH or to reset
+    with db.engine.begin() as conn:
+        ranked = rebuild_rankings(conn)
+    click.echo(f'Rankings rebuilt for {ranked} products')
+
+
+@click.command('render-images')
+@with_appcontext
+def render_images_command():
+    # Picks up renders cut short by a restart, and retries failed ones
+    click.echo(f'Rendered derivatives for {images.render_pending()} images')
+
+
+# One-off, for deployments that ran the homepage and product_details apps on
+# separate databases: brings product_details' accounts and owned carts across
+@click.command('merge-accounts')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def merge_accounts_command(source):
+    with db.engine.begin() as conn:
+        other = sqlite3.connect(f'file:{source}?mode=ro', uri=True)
+        try:
+            counts = merge_accounts(conn, other)
+        finally:
+            other.close()
+    click.echo(f"Merged {counts['users']} accounts and {counts['carts']} carts. Left out {counts['taken']} accounts "
+               f"already registered here, {counts['ownerless_carts']} carts with no owner and "
+               f"{counts['dropped_lines']} cart lines for products not in this catalog")
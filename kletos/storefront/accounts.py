@@ -0,0 +1,96 @@
+"""Registration, login and profile endpoints backed by the ``user`` table."""
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, jwt_required
+
+from kletos.accounts import find_user, register_user
+from kletos.ratelimit import LOGIN_COST, SIGNUP_COST
+from kletos.storefront.extensions import db, denylist, limiter
+from kletos.storefront.models import User
+
+bp = Blueprint('accounts', __name__)
+
+
+# Tokens carry the profile fields as claims, so /profile needs no query
+def generate_token(user):
+    return create_access_token(identity=user.id,
+                               additional_claims={'email': user.email, 'phone_number': user.phone_number})
+
+
+# Register Endpoint
+@bp.route('/register', methods=['POST'])
+@limiter.limit(SIGNUP_COST, account_fields=('email', 'phone_number'))
+def register():
+    data = request.get_json()
+    email = data.get('email')
+    phone_number = data.get('phone_number')
+    password = data.get('password')
+
+    # Validate input
+    if not email or not phone_number or not password:
+        return jsonify({'error': 'Email, phone number, and password are required'}), 400
+
+    # Hash the password, then let the unique indexes reject a taken email or
+    # phone number; there is no separate existence check to race against
+    password_hash = current_app.extensions['hasher'].hash(password)
+    if not register_user(db.session, email, phone_number, password_hash):
+        return jsonify({'error': 'User already exists'}), 400
+
+    return jsonify({'message': 'User registered successfully'}), 201
+
+
+# Login Endpoint; /sign-in is the homepage's name for it and takes ``email``
+@bp.route('/login', methods=['POST'])
+@bp.route('/sign-in', methods=['POST'])
+@limiter.limit(LOGIN_COST, account_fields=('email_or_phone', 'email'))
+def login():
+    data = request.get_json()
+    email_or_phone = data.get('email_or_phone') or data.get('email')
+    password = data.get('password')
+
+    # Validate input
+    if not email_or_phone or not password:
+        return jsonify({'error': 'Email or phone and password are required'}), 400
+
+    # Find user by email or phone number, one index probe
+    user = find_user(User, email_or_phone)
+
+    # Check if user exists and password is correct
+    hasher = current_app.extensions['hasher']
+    valid, upgraded_hash = hasher.verify(user.password_hash, password) if user else (False, None)
+    if valid:
+        # Transparently move legacy hashes onto the current policy
+        if upgraded_hash:
+            user.password_hash = upgraded_hash
+            db.session.commit()
+        token = generate_token(user)
+        return jsonify({'token': token}), 200
+
+    return jsonify({'error': 'Invalid credentials'}), 401
+
+
+@bp.route('/profile', methods=['GET'])
+@jwt_required()
+def profile():
+    claims = get_jwt()
+    if 'email' in claims:
+        user_profile = {
+            "id": get_jwt_identity(),
+            "email": claims['email'],
+            "phone_number": claims['phone_number']
+        }
+    else:
+        # Tokens issued before profile claims existed
+        user = User.query.get(get_jwt_identity())
+        user_profile = {
+            "id": user.id,
+            "email": user.email,
+            "phone_number": user.phone_number
+        }
+    return jsonify({"user": user_profile})
+
+
+@bp.route('/sign-out', methods=['POST'])
+def sign_out():
+    # Revokes the bearer token, if one was sent, until it would have expired
+    denylist.revoke_current()
+    return jsonify({"message": "User signed out"})
@@ -0,0 +1,81 @@
+"""Cart endpoints for the signed-in user."""
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+
+from kletos.cart import ENSURE_CART, UPSERT_CART_ITEM
+from kletos.ranking import record_cart_add
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Cart, CartItem, Product
+
+bp = Blueprint('cart', __name__)
+
+
+@bp.route('/cart/add', methods=['POST'])
+@jwt_required()
+def add_to_cart():
+    data = request.get_json(silent=True) or {}
+    product_id = data.get('product_id')
+    quantity = data.get('quantity')
+    # JSON integers only: "3", 2.5 and true are refused rather than coerced
+    if type(product_id) is not int or type(quantity) is not int or quantity < 1:
+        return jsonify({"error": "product_id and a positive integer quantity are required"}), 400
+
+    # Look the product up before writing anything so a 404 leaves no partial cart
+    product = Product.query.get_or_404(product_id)
+
+    # Everything below is one transaction with a fixed number of statements,
+    # however many items the cart already holds. It opens with a write so the
+    # transaction takes SQLite's write lock up front, and every change is an
+    # in-SQL increment, so concurrent adds never lose an update.
+    owner_id = str(get_jwt_identity())
+    db.session.execute(ENSURE_CART, {"owner_id": owner_id})
+    cart_id = db.session.query(Cart.id).filter_by(owner_id=owner_id).scalar()
+
+    db.session.execute(UPSERT_CART_ITEM, {"cart_id": cart_id, "product_id": product_id, "quantity": quantity})
+    # Count the add towards the product's popularity, in the same transaction
+    record_cart_add(db.session, product.id, product.category)
+    items = db.session.query(CartItem.product_id, CartItem.quantity).filter_by(cart_id=cart_id).all()
+    db.session.commit()
+
+    return jsonify({
+        "message": "Product added to cart",
+        "cart": {
+            "items": [
+                {
+                    "product_id": item_product_id,
+                    "quantity": item_quantity
+                } for item_product_id, item_quantity in items
+            ]
+        }
+    })
+
+
+@bp.route('/cart', methods=['GET'])
+@jwt_required()
+def fetch_cart():
+    cart_id = db.session.query(Cart.id).filter_by(owner_id=str(get_jwt_identity())).scalar()
+    if cart_id is None:
+        return jsonify({"cart": {"items": [], "total_price": 0}})
+
+    # One joined query for every line instead of a Product lookup per item.
+    # The total is priced from it too, so it always follows the current prices.
+    rows = (db.session.query(CartItem.product_id, CartItem.quantity, Product.name, Product.price)
+            .join(Product, Product.id == CartItem.product_id)
+            .filter(CartItem.cart_id == cart_id)
+            .all())
+    items = [
+        {
+            "product_id": product_id,
+            "name": name,
+            "quantity": quantity,
+            "price": price,
+            "total": price * quantity
+        } for product_id, quantity, name, price in rows
+    ]
+
+    return jsonify({
+        "cart": {
+            "items": items,
+            "total_price": sum(item["total"] for item in items)
+        }
+    })
@@ -0,0 +1,202 @@
+"""Product listing, category, search and product detail endpoints."""
+from flask import Blueprint, abort, current_app, jsonify, request
+from flask_jwt_extended import get_jwt, jwt_required
+from werkzeug.local import LocalProxy
+
+from kletos import metrics
+from kletos.bulk import BulkFormatError, read_records, upsert_products
+from kletos.cache import invalidate_on_commit
+from kletos.catalog import CATEGORY_SORTS, category_facets, category_names
+from kletos.pagination import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PaginationError, keyset_page, parse_cursor,
+                              parse_fields, parse_float_arg, parse_int_arg, stream_listing)
+from kletos.ranking import top_products
+from kletos.search import search_products
+from kletos.serializers import PRODUCT_FIELDS, json_response, listing_response, product_dict
+from kletos.storefront.extensions import db, http_cache
+from kletos.storefront.models import Product
+
+bp = Blueprint('catalog', __name__)
+
+# Read-through cache for product pages and category listings. Entries are
+# dropped by tag: when a session commits changes to the affected products,
+# or through invalidate_products for writes made outside the session, so a
+# write keeps every unrelated entry. Writes from another process are only
+# picked up once PRODUCT_CACHE_TTL runs out. Each app gets its own cache from
+# create_app; this is the current app's.
+product_cache = LocalProxy(lambda: current_app.extensions['product_cache'])
+invalidate_on_commit(product_cache, db.session, Product)
+# Metrics are process-wide; other apps in the process have no product cache
+metrics.register_cache('product', lambda: current_app.extensions.get('product_cache'))
+
+# Default and largest ?limit= for /featured-products
+FEATURED_LIMIT = 8
+MAX_FEATURED_LIMIT = 50
+
+
+def catalog_version():
+    return http_cache.version.current()[0]
+
+
+def is_catalog_writer():
+    """Whether the current token's account is listed in ``CATALOG_WRITERS``."""
+    writers = {email.strip().lower() for email in current_app.config['CATALOG_WRITERS'].split(',') if email.strip()}
+    return (get_jwt().get('email') or '').lower() in writers
+
+
+def invalidate_products(tags):
+    # For writes made outside db.session, which invalidate_on_commit doesn't see
+    for tag in tags:
+        product_cache.invalidate_tag(tag)
+    http_cache.version.expire()
+
+
+def featured_products(limit=FEATURED_LIMIT, category=None):
+    return [product_dict(row) for row in top_products(db.session, limit, category)]
+
+
+def highlighted_product():
+    rows = top_products(db.session, 1)
+    return product_dict(rows[0]) if rows else None
+
+
+@bp.route('/products', methods=['GET'])
+@http_cache.cached()
+def get_products():
+    # Keyset pagination: ?after=<last id seen>&limit=<page size>&fields=id,name,...
+    # ?stream=1 exports the whole catalog as a chunked JSON response instead.
+    try:
+        fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+        after = parse_int_arg(request.args, 'after', 0)
+        limit = parse_int_arg(request.args, 'limit', DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if request.args.get('stream') in ('1', 'true'):
+        return stream_listing(db.session, Product, fields)
+
+    rows, next_after = keyset_page(db.session, Product, fields, after=after, limit=limit)
+    return listing_response(fields, rows, next_after=next_after)
+
+
+@bp.route('/categories', methods=['GET'])
+@http_cache.cached()
+def get_categories():
+    return jsonify({"categories": category_names(db.session)})
+
+
+@bp.route('/categories/facets', methods=['GET'])
+@http_cache.cached()
+def get_category_facets():
+    return jsonify({"categories": category_facets(db.session)})
+
+
+@bp.route('/products-by-category', methods=['GET'])
+@http_cache.cached()
+def get_products_by_category():
+    # ?sort=id|price|-price, ?min_price=&max_price=, keyset paging via ?after=&limit=
+    category_name = request.args.get('category')
+    if not category_name:
+        return jsonify({"error": "category is required"}), 400
+
+    sort = request.args.get('sort', 'id')
+    if sort not in CATEGORY_SORTS:
+        return jsonify({"error": "sort must be one of: " + ", ".join(CATEGORY_SORTS)}), 400
+    sort_key, descending = CATEGORY_SORTS[sort]
+
+    try:
+        fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+        limit = parse_int_arg(request.args, 'limit', DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+        after = parse_cursor(request.args.get('after'), (int,) if sort_key is None else (float, int))
+        min_price = parse_float_arg(request.args, 'min_price')
+        max_price = parse_float_arg(request.args, 'max_price')
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    criteria = [Product.category == category_name]
+    if min_price is not None:
+        criteria.append(Product.price >= min_price)
+    if max_price is not None:
+        criteria.append(Product.price <= max_price)
+
+    def load_page():
+        return keyset_page(db.session, Product, fields, after=after, limit=limit,
+                           criteria=criteria, sort_key=sort_key, descending=descending)
+
+    cache_key = ('category', category_name, sort, after, limit, min_price, max_price, fields)
+    rows, next_after = product_cache.get_or_load(cache_key, load_page, tags=[('category', category_name)])
+    return listing_response(fields, rows, category=category_name, next_after=next_after)
+
+
+@bp.route('/search', methods=['GET'])
+@http_cache.cached()
+def search():
+    # Ranked, prefix-matching full-text search: ?q=<text>&limit=&after=<cursor>
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = parse_int_arg(request.args, 'limit', DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+        after = parse_cursor(request.args.get('after'), (float, int))
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows, next_after = search_products(db.session, query, after=after, limit=limit)
+    return listing_response(PRODUCT_FIELDS, rows, query=query, next_after=next_after)
+
+
+@bp.route('/product/<int:product_id>', methods=['GET'])
+@http_cache.cached()
+def get_product(product_id):
+    def load_product():
+        columns = [getattr(Product, name) for name in PRODUCT_FIELDS]
+        row = db.session.query(*columns).filter(Product.id == product_id).first()
+        return None if row is None else product_dict(row)
+
+    product_data = product_cache.get_or_load(('product', product_id), load_product, tags=[('product', product_id)])
+    if product_data is None:
+        abort(404)
+    return json_response({"product": product_data})
+
+
+@bp.route('/products/bulk', methods=['POST'])
+@jwt_required()
+def bulk_upsert_products():
+    # NDJSON or CSV, one product per line/row: {"id": 7, "price": 19.5, "stock": 3}.
+    # Rows with an id update that product; new products need name, category, image and price.
+    if not is_catalog_writer():
+        return jsonify({"error": "This account may not change the catalog"}), 403
+    try:
+        records = read_records(request.mimetype, request.stream)
+    except BulkFormatError as e:
+        return jsonify({"error": str(e)}), 415
+
+    conn = db.engine.raw_connection()
+    try:
+        result = upsert_products(conn, records, on_commit=invalidate_products)
+    finally:
+        conn.close()
+    body = result.as_dict()
+    status = 400 if result.errors and not (result.inserted or result.updated or result.unchanged) else 200
+    return json_response(body, status=status)
+
+
+@bp.route('/featured-products', methods=['GET'])
+@http_cache.cached(versioned=False)
+def get_featured_products():
+    # Most added to carts recently, overall or within ?category=; ?limit=
+    try:
+        limit = parse_int_arg(request.args, 'limit', FEATURED_LIMIT, minimum=1, maximum=MAX_FEATURED_LIMIT)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    return json_response({"featured_products": featured_products(limit, request.args.get('category'))})
+
+
+@bp.route('/highlighted-product', methods=['GET'])
+@http_cache.cached(versioned=False)
+def get_highlighted_product():
+    return json_response({"highlighted_product": highlighted_product()})
+
+
+@bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify({"product_cache": product_cache.stats()})
@@ -0,0 +1,57 @@
+"""Navigation and static homepage content."""
+from flask import Blueprint, jsonify
+
+from kletos.storefront.extensions import http_cache
+
+bp = Blueprint('content', __name__)
+
+# Static homepage sections, also served together by /homepage
+HERO = {
+    "image": "banner_image_url",
+    "text": "Kletos: Jewelry for Every Chapter",
+    "button_text": "Learn More",
+    "button_link": "/learn-more"
+}
+
+FOOTER = {
+    "about": "Find pieces that shimmer and radiate confidence just like you.",
+    "links": [
+        {"name": "Home", "url": "/home"},
+        {"name": "Products", "url": "/products"},
+    ],
+    "contact": {
+        "email": "support@kletos.com",
+        "phone": "+1234567890",
+        "address": "1234 Kletos St Jewelry City 56789"
+    }
+}
+
+
+# Navigation Bar Endpoints
+@bp.route('/home', methods=['GET'])
+def home():
+    return jsonify({"message": "Home page content"})
+
+
+@bp.route('/about', methods=['GET'])
+def about():
+    return jsonify({"message": "About page content"})
+
+
+@bp.route('/contact', methods=['GET'])
+def contact():
+    return jsonify({"message": "Contact page content"})
+
+
+# Hero Section Endpoint
+@bp.route('/hero-content', methods=['GET'])
+@http_cache.cached(versioned=False)
+def hero_content():
+    return jsonify({"hero": HERO})
+
+
+# Footer Endpoint
+@bp.route('/footer-content', methods=['GET'])
+@http_cache.cached(versioned=False)
+def footer_content():
+    return jsonify({"footer": FOOTER})
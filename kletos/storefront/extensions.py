@@ -0,0 +1,25 @@
+"""Extension instances shared by the storefront blueprints, bound in ``create_app``."""
+from flask import current_app
+from flask_jwt_extended import JWTManager
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
+
+from kletos.http_cache import HTTPCache
+from kletos.ratelimit import RateLimiter
+
+db = SQLAlchemy()
+jwt = JWTManager()
+
+# ETag/Cache-Control for public catalog and content endpoints
+http_cache = HTTPCache()
+
+# Revoked access tokens, checked on every @jwt_required request. create_app
+# builds one per app; this is the current app's.
+denylist = LocalProxy(lambda: current_app.extensions['denylist'])
+
+# Token buckets and admission control for the password-hashing endpoints;
+# each app's buckets and gates are kept in app.extensions['rate_limits']
+limiter = RateLimiter()
+
+# Product image store and derivative rendering pool, one per app like the denylist
+images = LocalProxy(lambda: current_app.extensions['images'])
@@ -0,0 +1,67 @@
+"""The landing page's data in one response, instead of one request per section."""
+import os
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from kletos.bundle import Bundle, UnknownSection
+from kletos.catalog import category_names
+from kletos.pagination import keyset_page
+from kletos.serializers import PRODUCT_FIELDS, product_dict
+from kletos.storefront.catalog import catalog_version, featured_products, highlighted_product
+from kletos.storefront.content import FOOTER, HERO
+from kletos.storefront.extensions import db, http_cache
+from kletos.storefront.models import Product
+
+bp = Blueprint('homepage', __name__)
+
+
+def load_categories():
+    return {"categories": category_names(db.session)}
+
+
+def load_featured_products():
+    return {"featured_products": featured_products()}
+
+
+def load_highlighted_product():
+    return {"highlighted_product": highlighted_product()}
+
+
+def load_products():
+    # Same first page as GET /products
+    rows, next_after = keyset_page(db.session, Product, PRODUCT_FIELDS)
+    return {"products": [product_dict(row) for row in rows], "next_after": next_after}
+
+
+# Members match the bodies of /hero-content, /categories, /featured-products,
+# /highlighted-product, /footer-content and /products. Data sections are
+# also reloaded as soon as the catalog version moves; the ranked sections
+# follow cart activity, so their TTL is the only bound on staleness.
+# create_app builds one per app, as app.extensions['homepage'].
+def build_homepage():
+    homepage = Bundle()
+    homepage.static('hero', {"hero": HERO})
+    homepage.cached('categories', load_categories, version=catalog_version,
+                    ttl=float(os.environ.get('HOMEPAGE_CATEGORIES_TTL', 300)))
+    homepage.cached('featured_products', load_featured_products, version=catalog_version,
+                    ttl=float(os.environ.get('HOMEPAGE_RANKING_TTL', 60)))
+    homepage.cached('highlighted_product', load_highlighted_product, version=catalog_version,
+                    ttl=float(os.environ.get('HOMEPAGE_RANKING_TTL', 60)))
+    homepage.static('footer', {"footer": FOOTER})
+    homepage.cached('products', load_products, version=catalog_version,
+                    ttl=float(os.environ.get('HOMEPAGE_PRODUCTS_TTL', 60)))
+    return homepage
+
+
+# Tagged by body hash: the ranked sections change without the catalog
+# version moving, so a version-based ETag could revalidate stale content
+@bp.route('/homepage', methods=['GET'])
+@http_cache.cached(versioned=False)
+def get_homepage():
+    # ?sections=hero,categories,... returns only those sections
+    homepage = current_app.extensions['homepage']
+    try:
+        sections = homepage.parse(request.args.get('sections'))
+    except UnknownSection as e:
+        return jsonify({"error": str(e)}), 400
+    return Response(homepage.render(sections), mimetype='application/json')
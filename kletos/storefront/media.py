@@ -0,0 +1,55 @@
+"""Product image uploads and the content-hashed image URLs they produce."""
+from flask import Blueprint, abort, current_app, jsonify, request, send_file
+from flask_jwt_extended import jwt_required
+
+from kletos.blobstore import BlobTooLarge
+from kletos.images import EXTENSIONS, IMMUTABLE_MAX_AGE, UnreadableImage, UnsupportedImage
+from kletos.storefront.catalog import invalidate_products, is_catalog_writer
+from kletos.storefront.extensions import db, images
+from kletos.storefront.models import Product
+
+bp = Blueprint('media', __name__)
+
+
+@bp.route('/product/<int:product_id>/image', methods=['PUT'])
+@jwt_required()
+def upload_product_image(product_id):
+    # The image as the raw body (Content-Type: image/jpeg, ...) or a multipart "image" file.
+    # Responds at once; srcsets appear on the product when its derivatives are rendered.
+    if not is_catalog_writer():
+        return jsonify({"error": "This account may not change the catalog"}), 403
+    if not images.available:
+        return jsonify({"error": "Image processing is not available on this server"}), 503
+    max_bytes = current_app.config['IMAGE_MAX_BYTES']
+    too_large = {"error": f"Images are limited to {max_bytes} bytes"}
+    # Refuse a declared oversize body up front; chunked or understated ones
+    # are stopped by the byte count while storing
+    if request.content_length and request.content_length > max_bytes:
+        return jsonify(too_large), 413
+    if db.session.query(Product.id).filter(Product.id == product_id).first() is None:
+        abort(404)
+
+    upload = request.files.get('image') if request.mimetype == 'multipart/form-data' else None
+    try:
+        url, status = images.ingest(product_id, upload.stream if upload else request.stream,
+                                    on_change=invalidate_products, max_size=max_bytes)
+    except BlobTooLarge:
+        return jsonify(too_large), 413
+    except UnsupportedImage as e:
+        return jsonify({"error": str(e)}), 415
+    except UnreadableImage as e:
+        return jsonify({"error": str(e)}), 422
+    # A render that has already failed means the upload couldn't be resized
+    return jsonify({"image": url, "status": status}), {'ready': 200, 'failed': 422}.get(status, 202)
+
+
+# Originals and derivatives; the name is the SHA-256 of the bytes, so a
+# response can be cached forever
+@bp.route('/images/<digest>.<extension>', methods=['GET'])
+def get_image(digest, extension):
+    mimetype = images.store.content_type(digest)
+    if mimetype is None or EXTENSIONS.get(mimetype) != extension:
+        abort(404)
+    response = send_file(images.store.path(digest), mimetype=mimetype, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,53 @@
+"""Catalog, cart and account models, stored in the one storefront database."""
+from kletos.storefront.extensions import db
+
+
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    image = db.Column(db.String(255), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    stock = db.Column(db.Integer)   # units on hand; NULL when not tracked
+    # Derivative URLs with widths, set once kletos.images has rendered the image
+    image_srcset = db.Column(db.Text)
+    image_srcset_webp = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_product_category_price', 'category', 'price'),
+        db.Index('ix_product_category_id', 'category', 'id'),
+    )
+
+
+class Cart(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.String(120), unique=True, index=True)
+
+
+class CartItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    cart_id = db.Column(db.Integer, db.ForeignKey('cart.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('uq_cart_item_cart_product', 'cart_id', 'product_id', unique=True),
+    )
+
+    cart = db.relationship('Cart', backref=db.backref('items', lazy=True))
+    product = db.relationship('Product', backref=db.backref('items', lazy=True))
+
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    phone_number = db.Column(db.String(20), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    # Lower-cased email and phone without formatting; logins probe these
+    email_normalized = db.Column(db.String(120))
+    phone_normalized = db.Column(db.String(20))
+
+    __table_args__ = (
+        db.Index('ix_user_email_normalized', 'email_normalized', unique=True),
+        db.Index('ix_user_phone_normalized', 'phone_normalized', unique=True),
+    )
@@ -0,0 +1,73 @@
+"""Declarative request validation that reports every error in one pass."""
+import re
+
+
+class Field:
+    """One input field and the rules its value must satisfy.
+
+    ``pattern`` may be a string or a compiled regex; strings are compiled once
+    when the schema is built, never per request.
+    """
+
+    def __init__(self, name, message, required=True, min_length=None, pattern=None, choices=None,
+                 required_message=None):
+        self.name = name
+        self.message = message
+        self.required = required
+        self.min_length = min_length
+        self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self.choices = choices
+        self.required_message = required_message or message
+
+    def check(self, value):
+        if value is None or value == '':
+            return self.required_message if self.required else None
+        if not isinstance(value, str):
+            value = str(value)
+        if self.min_length is not None and len(value) < self.min_length:
+            return self.message
+        if self.pattern is not None and not self.pattern.match(value):
+            return self.message
+        if self.choices is not None and value not in self.choices:
+            return self.message
+        return None
+
+
+class Schema:
+    """An ordered set of fields plus cross-field checks.
+
+    Each check is ``check(data, errors) -> (field_name, message) or None``;
+    ``errors`` holds the per-field failures so far, letting a check skip
+    fields that are already known to be invalid.
+    """
+
+    def __init__(self, *fields, checks=()):
+        self.fields = fields
+        self.checks = checks
+
+    def validate(self, data):
+        """Return ``{field: message}`` for every problem; empty when valid."""
+        errors = {}
+        for field in self.fields:
+            message = field.check(data.get(field.name))
+            if message:
+                errors[field.name] = message
+        for check in self.checks:
+            result = check(data, errors)
+            if result and result[0] not in errors:
+                errors[result[0]] = result[1]
+        return errors
+
+
+def matches(field, other, message):
+    """Cross-field check that ``field`` equals ``other`` once ``other`` is valid."""
+    def check(data, errors):
+        if other not in errors and data.get(field) != data.get(other):
+            return field, message
+        return None
+    return check
+
+
+def error_response(errors):
+    """Body for a rejected request: the first message plus the full error map."""
+    return {'error': next(iter(errors.values())), 'errors': errors}
@@ -0,0 +1,121 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+from kletos.storefront import create_app, init_db
+from kletos.storefront.extensions import db
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ADMIN_EMAIL = 'admin@example.com'
+WRITER_EMAIL = 'catalog@example.com'
+PASSWORD = 'Passw0rd!x'
+
+
+@pytest.fixture
+def app_config():
+    """Extra storefront settings; override in a test module to change them."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "products.db"}',
+        'IMAGE_STORE_PATH': str(tmp_path / 'images'),
+        # Hash inline and cheaply; tests sign in a lot
+        'PASSWORD_HASH_WORKERS': 0,
+        'PASSWORD_HASH_WORK_FACTOR': 1000,
+        'RATE_LIMIT_ENABLED': False,
+        'IMAGE_WORKERS': 0,
+        # Load revocations on the first request only, so statement counts don't vary
+        'TOKEN_DENYLIST_REFRESH': 3600,
+        **app_config,
+    })
+    with app.app_context():
+        init_db(products=20)
+        yield app
+        db.session.remove()
+        db.get_engine(app).dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def sign_in(client):
+    """Register an account (once) and return Authorization headers for it."""
+    def sign_in(email='shopper@example.com', phone_number='0700000001', password='correct horse'):
+        client.post('/register', json={'email': email, 'phone_number': phone_number, 'password': password})
+        response = client.post('/login', json={'email_or_phone': email, 'password': password})
+        assert response.status_code == 200, response.get_json()
+        return {'Authorization': f'Bearer {response.get_json()["token"]}'}
+    return sign_in
+
+
+@pytest.fixture
+def writer(app, sign_in):
+    """Authorization headers for an account listed in ``CATALOG_WRITERS``."""
+    app.config['CATALOG_WRITERS'] = f'someone@example.com, {WRITER_EMAIL.upper()}'
+    return sign_in(email=WRITER_EMAIL, phone_number='0700000009')
+
+
+@pytest.fixture
+def validation_env():
+    """Environment for the validation app; override in a test module to change it."""
+    return {}
+
+
+@pytest.fixture
+def validation(tmp_path, monkeypatch, validation_env):
+    """A fresh import of validation/app.py on its own database and blob store.
+
+    The module reads its settings from the environment at import, so each
+    test gets its own copy rather than sharing one.
+    """
+    env = {
+        'USERS_DATABASE_PATH': str(tmp_path / 'users.db'),
+        'BLOB_STORE_PATH': str(tmp_path / 'blobs'),
+        'ADMIN_EMAILS': ADMIN_EMAIL,
+        'PASSWORD_HASH_WORKERS': '0',
+        'PASSWORD_HASH_WORK_FACTOR': '1000',
+        'RATE_LIMIT_ENABLED': '0',
+        **validation_env,
+    }
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    module = import_validation()
+    yield module
+    module.db_pool.close()
+
+
+def import_validation():
+    """Import validation/app.py afresh, with the settings now in the environment."""
+    spec = importlib.util.spec_from_file_location('validation_app', ROOT / 'validation' / 'app.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.app.config['TESTING'] = True
+    return module
+
+
+def user_record(name, **fields):
+    return {'username': name, 'email': f'{name}@example.com', 'password': PASSWORD, 'confirmPassword': PASSWORD,
+            'phone': '0712345678', **fields}
+
+
+def merchant_record(name, **fields):
+    return {'businessName': f'{name} shop', 'contactPersonName': name.title(), 'username': name,
+            'email': f'{name}@example.com', 'password': PASSWORD, 'confirmPassword': PASSWORD,
+            'phone': '0712345678', 'bankName': 'Bank', 'accountNumber': '123456',
+            'preferredPaymentMethods': 'mpesa', 'businessLicense': f'license of {name}',
+            'id_image': f'id of {name}', 'agreeTerms': 'yes', **fields}
+
+
+def validation_token(client, email, path='/login'):
+    response = client.post(path, json={'email': email, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f'Bearer {response.get_json()["token"]}'}
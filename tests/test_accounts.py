@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from flask_jwt_extended import create_access_token
+
+
+def test_register_rejects_taken_email_in_any_case(client, sign_in):
+    sign_in(email='Taken@Example.com', phone_number='0700000002')
+    response = client.post('/register', json={'email': 'taken@example.com', 'phone_number': '0700000003',
+                                              'password': 'x'})
+    assert response.status_code == 400
+
+
+def test_login_by_phone_and_wrong_password(client, sign_in):
+    sign_in(email='phone@example.com', phone_number='0700 000 004', password='right')
+    assert client.post('/login', json={'email_or_phone': '0700000004', 'password': 'right'}).status_code == 200
+    assert client.post('/login', json={'email_or_phone': '0700000004', 'password': 'wrong'}).status_code == 401
+
+
+def test_profile_from_token_claims(client, sign_in):
+    response = client.get('/profile', headers=sign_in())
+    assert response.get_json()['user']['email'] == 'shopper@example.com'
+
+
+def test_sign_out_revokes_token(client, sign_in):
+    headers = sign_in()
+    assert client.post('/sign-out', headers=headers).status_code == 200
+    assert client.get('/profile', headers=headers).status_code == 401
+
+
+def test_sign_out_is_idempotent(app, client, sign_in):
+    headers = sign_in()
+    assert client.post('/sign-out', headers=headers).status_code == 200
+    # Already revoked
+    assert client.post('/sign-out', headers=headers).status_code == 200
+    # Expired, unreadable, or no token at all
+    expired = create_access_token(identity=1, expires_delta=timedelta(seconds=-1))
+    for extra in ({'Authorization': f'Bearer {expired}'}, {'Authorization': 'Bearer not-a-token'}, {}):
+        response = client.post('/sign-out', headers=extra)
+        assert response.status_code == 200
+        assert response.get_json() == {'message': 'User signed out'}
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import threading
+
+from kletos.asgi import BUFFER_SIZE, ASGIAdapter
+
+
+def echo_app(environ, start_response):
+    body = environ['wsgi.input'].read(int(environ['CONTENT_LENGTH']))
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Date', 'now')])
+    return [environ['PATH_INFO'].encode(), b':', body]
+
+
+def call(adapter, body_chunks=(b'',), path='/echo', headers=(), method='POST'):
+    """Run one request through ``adapter``; returns ``(status, headers, body, messages)``."""
+    async def run():
+        incoming = [{'type': 'http.request', 'body': chunk, 'more_body': index < len(body_chunks) - 1}
+                    for index, chunk in enumerate(body_chunks)]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': list(headers)}
+        await adapter(scope, receive, send)
+        return sent
+
+    sent = asyncio.run(run())
+    start = sent[0]
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return start['status'], dict(start['headers']), body, sent
+
+
+def test_chunked_body_reaches_the_app_with_a_length():
+    adapter = ASGIAdapter(echo_app, max_workers=2)
+    status, headers, body, _ = call(adapter, [b'hello ', b'world'], headers=[(b'transfer-encoding', b'chunked')])
+    assert status == 200 and body == b'/echo:hello world'
+    # The server sets Date itself
+    assert b'date' not in headers
+
+
+def test_bodies_past_the_limit_are_refused():
+    adapter = ASGIAdapter(echo_app, max_workers=2, max_body_size=8)
+    status, headers, _, _ = call(adapter, [b'x' * 5, b'x' * 5])
+    assert status == 413 and headers[b'connection'] == b'close'
+    status, _, _, _ = call(adapter, headers=[(b'content-length', b'9')])
+    assert status == 413
+    assert adapter.pending == 0
+
+
+def test_busy_server_turns_requests_away():
+    adapter = ASGIAdapter(echo_app, max_workers=1, max_pending=0)
+    adapter.pending = 1
+    status, headers, _, _ = call(adapter)
+    assert status == 503 and headers[b'retry-after'] == b'1'
+
+
+def test_large_responses_stream_from_the_worker_thread():
+    threads = []
+
+    def export(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        for _ in range(4):
+            threads.append(threading.current_thread().name)
+            yield b'x' * BUFFER_SIZE
+
+    status, _, body, sent = call(ASGIAdapter(export, max_workers=1))
+    assert status == 200 and len(body) == 4 * BUFFER_SIZE
+    assert len(sent) > 3 and sent[-1] == {'type': 'http.response.body', 'body': b''}
+    assert len(set(threads)) == 1 and threads[0].startswith('wsgi')
+
+
+def test_storefront_through_the_adapter(app):
+    status, headers, body, _ = call(ASGIAdapter(app, max_workers=2), path='/products', method='GET')
+    assert status == 200 and headers[b'content-type'] == b'application/json'
+    assert json.loads(body)['products'][0]['id'] == 1
@@ -0,0 +1,108 @@
+import json
+import sqlite3
+
+from kletos.bulk import upsert_products
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Product
+
+NDJSON = 'application/x-ndjson'
+
+
+def ndjson(*records):
+    return '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records)
+
+
+def test_bulk_inserts_updates_and_skips_unchanged(client, writer):
+    price = Product.query.get(2).price
+    body = ndjson({'id': 1, 'price': 19.5, 'stock': 3}, {'id': 2, 'price': price},
+                  {'name': 'New Ring', 'category': 'Rings', 'image': 'new.jpg', 'price': 5})
+    response = client.post('/products/bulk', data=body, content_type=NDJSON, headers=writer)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['inserted'], result['updated'], result['unchanged'], result['failed']) == (1, 1, 1, 0)
+    assert result['updated_ids'] == [1] and result['inserted_ids'] == [21]
+    product = client.get('/product/1').get_json()['product']
+    assert (product['price'], product['stock']) == (19.5, 3)
+
+
+def test_bulk_reports_errors_per_row(client, writer):
+    body = ndjson({'id': 1, 'price': 2}, 'not json', {'id': -1}, {'id': 1, 'price': 'free', 'colour': 'red'},
+                  {'id': 999, 'price': 1}, {'name': 'Half a product'})
+    result = client.post('/products/bulk', data=body, content_type=NDJSON, headers=writer).get_json()
+    assert result['updated'] == 1 and result['failed'] == 5
+    errors = {error['row']: error['errors'] for error in result['errors']}
+    assert errors[1] == {'record': 'Invalid JSON'}
+    assert set(errors[2]) == {'id'}
+    assert set(errors[3]) == {'price', 'colour'}
+    assert errors[4]['product'].startswith('Unknown product id 999')
+    assert 'required to create a product' in errors[5]['product']
+
+
+def test_bulk_with_only_errors_is_a_bad_request(client, writer):
+    response = client.post('/products/bulk', data=ndjson({'id': 'x'}), content_type=NDJSON, headers=writer)
+    assert response.status_code == 400
+
+
+def test_bulk_accepts_csv(client, writer):
+    body = 'id,price,stock\n1,8.0,\n2,9.0,4\n'
+    result = client.post('/products/bulk', data=body, content_type='text/csv', headers=writer).get_json()
+    assert result['updated_ids'] == [1, 2]
+    assert Product.query.get(2).stock == 4
+
+
+def test_bulk_refuses_other_formats_and_accounts(client, writer, sign_in):
+    assert client.post('/products/bulk', json=[{'id': 1}], headers=writer).status_code == 415
+    shopper = sign_in()
+    assert client.post('/products/bulk', data=ndjson({'id': 1}), content_type=NDJSON,
+                       headers=shopper).status_code == 403
+    assert client.post('/products/bulk', data=ndjson({'id': 1}), content_type=NDJSON).status_code == 401
+
+
+def test_bulk_invalidates_what_it_changed(client, writer):
+    etag = client.get('/product/1').headers['ETag']
+    client.get('/products-by-category?category=Bracelet')
+    body = ndjson({'id': 1, 'price': 1.25, 'category': 'Anklets'})
+    client.post('/products/bulk', data=body, content_type=NDJSON, headers=writer)
+    response = client.get('/product/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.get_json()['product']['price'] == 1.25
+    bracelets = client.get('/products-by-category?category=Bracelet').get_json()['products']
+    assert 1 not in [product['id'] for product in bracelets]
+    assert 'Anklets' in client.get('/categories').get_json()['categories']
+
+
+def test_bulk_moves_the_catalog_version_once_per_chunk(app):
+    def version():
+        return tuple(db.session.execute('SELECT version, deferred FROM catalog_version').first())
+
+    before = version()[0]
+    conn = db.engine.raw_connection()
+    try:
+        upsert_products(conn, [{'id': product_id, 'stock': 99} for product_id in range(1, 11)], chunk_size=4)
+        assert version() == (before + 3, 0)
+        updated_at = db.session.execute('SELECT updated_at FROM catalog_version').scalar()
+        # Nothing written, nothing to revalidate
+        upsert_products(conn, [{'id': 1, 'stock': 99}])
+        assert version() == (before + 3, 0)
+        assert db.session.execute('SELECT updated_at FROM catalog_version').scalar() == updated_at
+    finally:
+        conn.close()
+    # Every other write still moves it through the triggers
+    Product.query.get(1).price = 1.5
+    db.session.commit()
+    assert version() == (before + 4, 0)
+
+
+def test_upsert_chunks_commit_independently(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'bulk.db', isolation_level=None)
+    conn.execute('CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, category TEXT, image TEXT, '
+                 'price REAL, stock INTEGER)')
+    committed = []
+    records = [{'name': f'P{i}', 'category': 'C', 'image': 'x', 'price': i} for i in range(5)]
+    result = upsert_products(conn, records, chunk_size=2, on_commit=committed.append)
+    assert result.inserted == [1, 2, 3, 4, 5]
+    assert len(committed) == 3
+    assert ('product', 5) in committed[-1] and ('category', 'C') in committed[0]
+    # A repeated id within the input keeps its last state
+    result = upsert_products(conn, [{'id': 1, 'price': 7}, {'id': 1, 'price': 8}])
+    assert result.updated == [1]
+    assert conn.execute('SELECT price FROM product WHERE id = 1').fetchone()[0] == 8
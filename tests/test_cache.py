@@ -0,0 +1,158 @@
+import threading
+
+import pytest
+
+from kletos.cache import LRUCache
+from kletos.instrumentation import count_queries
+from kletos.storefront.catalog import invalidate_products
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Product
+
+
+@pytest.fixture
+def app_config():
+    # Only commits move the in-process version, never the clock
+    return {'CATALOG_VERSION_TTL': 3600}
+
+
+def test_entries_expire_after_ttl():
+    now = [0.0]
+    cache = LRUCache(ttl=10, clock=lambda: now[0])
+    cache.set('k', 1)
+    now[0] = 9.9
+    assert cache.get('k') == 1
+    now[0] = 10
+    assert cache.get('k', 'gone') == 'gone'
+    assert cache.stats()['expirations'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_tags_invalidate_every_entry_carrying_them():
+    cache = LRUCache()
+    cache.set('page1', 1, tags=[('category', 'Rings')])
+    cache.set('page2', 2, tags=[('category', 'Rings'), ('product', 3)])
+    cache.set('other', 3, tags=[('category', 'Necklace')])
+    cache.invalidate_tag(('product', 3))
+    assert (cache.get('page1'), cache.get('page2')) == (1, None)
+    cache.invalidate_tag(('category', 'Rings'))
+    assert len(cache) == 1 and cache.get('other') == 3
+
+
+def test_concurrent_misses_load_once():
+    cache = LRUCache()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', loader))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1] and results == ['value'] * 5
+
+
+def test_value_loaded_across_an_invalidation_is_not_kept():
+    cache = LRUCache()
+
+    def loader():
+        # A write lands while the stale value is being read
+        cache.invalidate_tag(('product', 1))
+        return 'stale'
+
+    assert cache.get_or_load('k', loader, tags=[('product', 1)]) == 'stale'
+    assert cache.get('k') is None
+    assert cache.get_or_load('k', lambda: 'fresh') == 'fresh'
+    assert cache.get('k') == 'fresh'
+
+
+def test_failed_loads_are_not_cached():
+    cache = LRUCache()
+
+    def loader():
+        raise RuntimeError('database away')
+
+    for _ in range(2):
+        try:
+            cache.get_or_load('k', loader)
+        except RuntimeError:
+            pass
+    assert cache.stats()['misses'] == 2 and len(cache) == 0
+
+
+def test_product_pages_are_cached_until_a_commit_changes_them(app, client):
+    cache = app.extensions['product_cache']
+    client.get('/product/1')
+    with count_queries(db.engine) as queries:
+        client.get('/product/1')
+    assert queries.count == 0
+    assert cache.stats()['hits'] == 1
+
+    product = Product.query.get(1)
+    product.price = 7.5
+    db.session.commit()
+    assert client.get('/product/1').get_json()['product']['price'] == 7.5
+
+
+def test_category_moves_invalidate_both_listings(client):
+    before = client.get('/products-by-category?category=Rings').get_json()['products']
+    moved = Product.query.get(before[0]['id'])
+    moved.category = 'Earrings'
+    db.session.commit()
+    rings = client.get('/products-by-category?category=Rings').get_json()['products']
+    earrings = client.get('/products-by-category?category=Earrings').get_json()['products']
+    assert moved.id not in [product['id'] for product in rings]
+    assert moved.id in [product['id'] for product in earrings]
+
+
+def test_rolled_back_changes_keep_the_cache(app, client):
+    client.get('/product/1')
+    invalidations = app.extensions['product_cache'].stats()['invalidations']
+    Product.query.get(1).price = 0.01
+    db.session.flush()
+    db.session.rollback()
+    assert app.extensions['product_cache'].stats()['invalidations'] == invalidations
+    assert client.get('/product/1').get_json()['product']['price'] != 0.01
+
+
+def test_raw_writes_are_seen_once_invalidated(client):
+    client.get('/product/1')
+    conn = db.engine.raw_connection()
+    try:
+        conn.execute('UPDATE product SET price = 4.5 WHERE id = 1')
+        conn.commit()
+    finally:
+        conn.close()
+    # The session never saw the write, so the cached page stands until told
+    assert client.get('/product/1').get_json()['product']['price'] != 4.5
+    invalidate_products([('product', 1)])
+    assert client.get('/product/1').get_json()['product']['price'] == 4.5
+
+
+def test_writes_keep_unrelated_entries(app, client):
+    cache = app.extensions['product_cache']
+    client.get('/product/1')
+    client.get('/product/2')
+    Product.query.get(2).price = 7.5
+    db.session.commit()
+    with count_queries(db.engine) as queries:
+        client.get('/product/1')
+    # The version check behind the ETag is the only statement
+    assert queries.count <= 1 and cache.stats()['hits'] == 1
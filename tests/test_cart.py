@@ -0,0 +1,83 @@
+import pytest
+
+from kletos.instrumentation import count_queries
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Product
+
+
+@pytest.fixture
+def headers(client, sign_in):
+    headers = sign_in()
+    # The first authenticated request loads the token denylist
+    client.get('/cart', headers=headers)
+    return headers
+
+
+def fill_cart(client, headers, lines):
+    for product_id in range(1, lines + 1):
+        client.post('/cart/add', json={'product_id': product_id, 'quantity': 1}, headers=headers)
+
+
+@pytest.mark.parametrize('lines', [0, 1, 5])
+def test_fetch_cart_statement_count(client, headers, lines):
+    fill_cart(client, headers, lines)
+    with count_queries(db.engine) as queries:
+        response = client.get('/cart', headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()['cart']['items']) == lines
+    # The cart, then one join for every line
+    assert queries.count == (1 if lines == 0 else 2)
+
+
+@pytest.mark.parametrize('lines', [0, 1, 5])
+def test_add_to_cart_statement_count(client, headers, lines):
+    fill_cart(client, headers, lines)
+    with count_queries(db.engine) as queries:
+        response = client.post('/cart/add', json={'product_id': 1, 'quantity': 2}, headers=headers)
+    assert response.status_code == 200
+    # Product lookup, ensure cart, cart id, line upsert, the popularity
+    # counter and the line read, however long the cart is
+    assert queries.count == 6, queries.statements
+
+
+def test_add_to_cart_increments_line_and_total(client, headers):
+    price = Product.query.get(1).price
+    client.post('/cart/add', json={'product_id': 1, 'quantity': 2}, headers=headers)
+    client.post('/cart/add', json={'product_id': 1, 'quantity': 3}, headers=headers)
+    cart = client.get('/cart', headers=headers).get_json()['cart']
+    assert [(item['product_id'], item['quantity']) for item in cart['items']] == [(1, 5)]
+    assert cart['total_price'] == pytest.approx(price * 5)
+
+
+def test_cart_total_follows_current_prices(client, headers):
+    client.post('/cart/add', json={'product_id': 1, 'quantity': 2}, headers=headers)
+    client.post('/cart/add', json={'product_id': 2, 'quantity': 1}, headers=headers)
+    Product.query.get(1).price = 10.0
+    Product.query.get(2).price = 2.5
+    db.session.commit()
+    assert client.get('/cart', headers=headers).get_json()['cart']['total_price'] == pytest.approx(22.5)
+
+
+@pytest.mark.parametrize('body', [{'product_id': 1, 'quantity': 0}, {'product_id': 1, 'quantity': -5},
+                                  {'product_id': 1, 'quantity': '3'}, {'product_id': 1, 'quantity': 1.5},
+                                  {'product_id': 1, 'quantity': True}, {'product_id': '1', 'quantity': 1},
+                                  {'product_id': 1}, None])
+def test_add_to_cart_needs_a_positive_integer_quantity(client, headers, body):
+    response = client.post('/cart/add', json=body, headers=headers)
+    assert response.status_code == 400
+    assert client.get('/cart', headers=headers).get_json()['cart'] == {'items': [], 'total_price': 0}
+
+
+def test_add_unknown_product_writes_nothing(client, headers):
+    response = client.post('/cart/add', json={'product_id': 999999, 'quantity': 1}, headers=headers)
+    assert response.status_code == 404
+    assert client.get('/cart', headers=headers).get_json()['cart'] == {'items': [], 'total_price': 0}
+
+
+def test_carts_belong_to_their_user(client, headers, sign_in):
+    other = sign_in(email='other@example.com', phone_number='0700000002')
+    client.post('/cart/add', json={'product_id': 1, 'quantity': 1}, headers=headers)
+    client.post('/cart/add', json={'product_id': 2, 'quantity': 4}, headers=other)
+    assert [item['product_id'] for item in client.get('/cart', headers=headers).get_json()['cart']['items']] == [1]
+    assert [item['quantity'] for item in client.get('/cart', headers=other).get_json()['cart']['items']] == [4]
+    assert client.get('/cart').status_code == 401
@@ -0,0 +1,45 @@
+import pytest
+
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Product
+
+
+def test_category_stats_follow_every_write(client):
+    def facets():
+        return {facet['name']: facet for facet in client.get('/categories/facets').get_json()['categories']}
+
+    rings = [product.price for product in Product.query.filter_by(category='Rings')]
+    assert facets()['Rings'] == {'name': 'Rings', 'product_count': len(rings),
+                                 'min_price': min(rings), 'max_price': max(rings)}
+
+    # Raw SQL goes through the same triggers as the ORM
+    db.session.execute("INSERT INTO product (name, category, image, price) VALUES ('Anklet', 'Anklets', 'x', 3)")
+    db.session.execute("UPDATE product SET price = 0.5 WHERE category = 'Rings' AND id = "
+                       "(SELECT MIN(id) FROM product WHERE category = 'Rings')")
+    db.session.commit()
+    assert facets()['Anklets']['product_count'] == 1
+    assert facets()['Rings']['min_price'] == 0.5
+
+    anklet = Product.query.filter_by(category='Anklets').one()
+    db.session.delete(anklet)
+    db.session.commit()
+    assert 'Anklets' not in facets()
+    assert client.get('/categories').get_json()['categories'] == sorted(facets())
+
+
+def test_category_listing_sorts_and_filters_by_price(client):
+    prices = sorted(product.price for product in Product.query.filter_by(category='Necklace'))
+    body = client.get('/products-by-category?category=Necklace&sort=-price&limit=2').get_json()
+    assert [product['price'] for product in body['products']] == prices[::-1][:2]
+    rest = client.get(f'/products-by-category?category=Necklace&sort=-price&after={body["next_after"]}').get_json()
+    assert [product['price'] for product in rest['products']] == prices[::-1][2:]
+
+    low, high = prices[1], prices[-2]
+    body = client.get(f'/products-by-category?category=Necklace&min_price={low}&max_price={high}').get_json()
+    assert sorted(product['price'] for product in body['products']) == prices[1:-1]
+
+
+@pytest.mark.parametrize('query', ['', 'category=Rings&sort=name', 'category=Rings&sort=price&after=1',
+                                   'category=Rings&min_price=cheap'])
+def test_category_listing_rejects_bad_parameters(client, query):
+    assert client.get(f'/products-by-category?{query}').status_code == 400
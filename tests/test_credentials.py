@@ -0,0 +1,108 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from kletos.credentials import CredentialHasher, HashingPolicy, is_legacy_plaintext, verify_password
+from kletos.storefront.extensions import db
+from kletos.storefront.models import User
+from tests.conftest import user_record, validation_token
+
+
+def test_policy_methods_and_validation():
+    assert HashingPolicy(work_factor=1000).method == 'pbkdf2:sha256:1000'
+    assert HashingPolicy('scrypt', work_factor=1024).method == 'scrypt:1024:8:1'
+    with pytest.raises(ValueError):
+        HashingPolicy('md5')
+    policy = HashingPolicy.from_config({'PASSWORD_HASH_ALGORITHM': 'pbkdf2:sha512', 'PASSWORD_HASH_WORK_FACTOR': '5'})
+    assert policy.method == 'pbkdf2:sha512:5'
+
+
+def test_werkzeug_hashes_verify_and_are_upgraded():
+    stored = generate_password_hash('secret', method='pbkdf2:sha256:2000')
+    hasher = CredentialHasher(HashingPolicy(work_factor=1000), workers=0)
+    assert hasher.verify(stored, 'wrong') == (False, None)
+    valid, replacement = hasher.verify(stored, 'secret')
+    assert valid and replacement.startswith('pbkdf2:sha256:1000$')
+    # Hashes under the current policy are kept as they are
+    assert hasher.verify(replacement, 'secret') == (True, None)
+
+
+def test_scrypt_round_trip():
+    hasher = CredentialHasher(HashingPolicy('scrypt', work_factor=1024), workers=0)
+    stored = hasher.hash('secret')
+    assert verify_password(stored, 'secret') and not verify_password(stored, 'Secret')
+
+
+def test_plaintext_only_with_the_flag():
+    assert not verify_password('hunter2', 'hunter2')
+    assert verify_password('hunter2', 'hunter2', legacy_plaintext=True)
+    hasher = CredentialHasher(HashingPolicy(work_factor=1000), workers=0, legacy_plaintext=True)
+    valid, replacement = hasher.verify('hunter2', 'hunter2')
+    assert valid and replacement.startswith('pbkdf2:')
+
+
+@pytest.mark.parametrize('stored', ['sha1$salt$abc', 'md5$x$y', '$2b$12$abcdefghijklmnopqrstuv', 'argon2$a$b'])
+def test_unsupported_hashes_are_never_plaintext(stored):
+    assert not is_legacy_plaintext(stored)
+    assert not verify_password(stored, stored, legacy_plaintext=True)
+
+
+def test_hash_many_on_a_pool():
+    hasher = CredentialHasher(HashingPolicy(work_factor=1000), workers=2)
+    try:
+        hashes = hasher.hash_many(['a', 'b', 'c'])
+        assert [verify_password(stored, password) for stored, password in zip(hashes, 'abc')] == [True] * 3
+        assert len(set(hashes)) == 3
+        assert hasher.verify(hashes[0], 'a') == (True, None)
+    finally:
+        hasher.shutdown()
+
+
+def test_login_upgrades_older_hashes(client, sign_in):
+    sign_in(email='old@example.com', phone_number='0700000005', password='pw')
+    user = User.query.filter_by(email='old@example.com').one()
+    user.password_hash = generate_password_hash('pw', method='pbkdf2:sha256:2000')
+    db.session.commit()
+    assert client.post('/login', json={'email_or_phone': 'old@example.com', 'password': 'pw'}).status_code == 200
+    db.session.refresh(user)
+    assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+
+
+def test_validation_passwords_are_stored_hashed(validation):
+    client = validation.app.test_client()
+    client.post('/signup', json=user_record('carol'))
+    with validation.db_pool.connection() as conn:
+        stored = conn.execute("SELECT password FROM users WHERE username = 'carol'").fetchone()[0]
+    assert stored.startswith('pbkdf2:sha256:1000$')
+    assert client.post('/login', json={'email': 'carol@example.com', 'password': 'wrong'}).status_code == 401
+    validation_token(client, 'carol@example.com')
+
+
+def insert_plaintext_row(validation):
+    with validation.db_pool.connection() as conn:
+        conn.execute("INSERT INTO users (username, email, password, phone) "
+                     "VALUES ('old', 'old@example.com', 'plain-secret', '0712345678')")
+        conn.commit()
+
+
+def test_plaintext_rows_are_refused_by_default(validation):
+    insert_plaintext_row(validation)
+    client = validation.app.test_client()
+    response = client.post('/login', json={'email': 'old@example.com', 'password': 'plain-secret'})
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize('validation_env', [{'PASSWORD_LEGACY_PLAINTEXT': '1'}])
+def test_legacy_plaintext_rows_sign_in_once_then_hashed(validation):
+    client = validation.app.test_client()
+    insert_plaintext_row(validation)
+    with validation.db_pool.connection() as conn:
+        conn.execute("INSERT INTO users (username, email, password, phone) "
+                     "VALUES ('hashy', 'hashy@example.com', 'sha256$salt$abc123', '0712345678')")
+        conn.commit()
+    response = client.post('/login', json={'email': 'old@example.com', 'password': 'plain-secret'})
+    assert response.status_code == 200
+    with validation.db_pool.connection() as conn:
+        assert conn.execute("SELECT password FROM users WHERE username = 'old'").fetchone()[0].startswith('pbkdf2:')
+    # A stored hash is never accepted as the password itself
+    response = client.post('/login', json={'email': 'hashy@example.com', 'password': 'sha256$salt$abc123'})
+    assert response.status_code == 401
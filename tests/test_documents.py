@@ -0,0 +1,75 @@
+import io
+import os
+
+import pytest
+
+from tests.conftest import ADMIN_EMAIL, merchant_record, user_record, validation_token
+
+
+@pytest.fixture
+def client(validation):
+    return validation.app.test_client()
+
+
+@pytest.fixture
+def admin(client):
+    client.post('/signup', json=user_record('admin', email=ADMIN_EMAIL))
+    return validation_token(client, ADMIN_EMAIL)
+
+
+def test_merchant_documents_stream_in_and_out(validation, client, admin):
+    data = merchant_record('maker')
+    data['businessLicense'] = (io.BytesIO(b'%PDF-1.4 license'), 'license.pdf')
+    data['id_image'] = (io.BytesIO(b'\xff\xd8\xff id photo'), 'id.jpg')
+    response = client.post('/merchant_signup', data=data, content_type='multipart/form-data')
+    assert response.status_code == 201
+    documents = response.get_json()['documents']
+
+    owner = validation_token(client, 'maker@example.com', '/merchant_login')
+    response = client.get(f'/documents/{documents["businessLicense"]}', headers=owner)
+    assert response.status_code == 200
+    assert response.data == b'%PDF-1.4 license' and response.mimetype == 'application/pdf'
+    assert response.headers['Cache-Control'] == 'private, no-store'
+    response = client.get(f'/documents/{documents["id_image"]}', headers={**owner, 'Range': 'bytes=0-2'})
+    assert response.status_code == 206 and response.data == b'\xff\xd8\xff'
+
+    # Other merchants and plain users can't tell it exists; admins can read it
+    client.post('/merchant_signup', json=merchant_record('rival'))
+    rival = validation_token(client, 'rival@example.com', '/merchant_login')
+    assert client.get(f'/documents/{documents["businessLicense"]}', headers=rival).status_code == 404
+    assert client.get(f'/documents/{documents["businessLicense"]}').status_code == 401
+    assert client.get(f'/documents/{documents["businessLicense"]}', headers=admin).status_code == 200
+
+
+def test_rejected_merchant_signup_keeps_no_documents(validation, client):
+    assert client.post('/merchant_signup', json=merchant_record('first')).status_code == 201
+    before = stored_blobs(validation)
+    response = client.post('/merchant_signup', json=merchant_record('first', businessLicense='another license',
+                                                                    id_image='another id'))
+    assert response.status_code == 400
+    assert stored_blobs(validation) == before
+    assert os.listdir(os.path.join(validation.blobs.root, 'tmp')) == []
+
+
+def stored_blobs(validation):
+    return sorted(name for _, _, files in os.walk(validation.blobs.root) for name in files)
+
+
+@pytest.mark.parametrize('validation_env', [{'DOCUMENT_MAX_BYTES': '64', 'MAX_CONTENT_LENGTH': '4096'}])
+def test_documents_over_the_limit_are_refused(validation, client, admin):
+    data = merchant_record('large')
+    data['businessLicense'] = (io.BytesIO(b'%PDF-1.4 small'), 'license.pdf')
+    data['id_image'] = (io.BytesIO(b'x' * 65), 'id.jpg')
+    response = client.post('/merchant_signup', data=data, content_type='multipart/form-data')
+    assert response.status_code == 413
+    assert response.get_json() == {'error': 'Documents are limited to 64 bytes'}
+    response = client.post('/merchant_signup', json=merchant_record('large', businessLicense='x' * 65))
+    assert response.status_code == 413
+    response = client.post('/merchant_signup/batch', json=[merchant_record('large', id_image='x' * 65)],
+                           headers=admin)
+    assert response.status_code == 413
+    assert stored_blobs(validation) == []
+    # The whole body is bounded too, JSON as well as multipart
+    response = client.post('/merchant_signup', json=merchant_record('large', notes='x' * 4096))
+    assert response.status_code == 413
+    assert client.post('/merchant_signup', json=merchant_record('large')).status_code == 201
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from kletos.bundle import Bundle, UnknownSection
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Product
+
+
+def test_homepage_matches_the_section_endpoints(client):
+    homepage = client.get('/homepage').get_json()
+    assert list(homepage) == ['hero', 'categories', 'featured_products', 'highlighted_product', 'footer',
+                              'products', 'next_after']
+    for path in ('/hero-content', '/categories', '/featured-products', '/highlighted-product', '/footer-content'):
+        for name, value in client.get(path).get_json().items():
+            assert homepage[name] == value, path
+    products = client.get('/products').get_json()
+    assert homepage['products'] == products['products']
+    assert homepage['next_after'] == products['next_after']
+
+
+def test_homepage_sections_subset(client):
+    assert list(client.get('/homepage?sections=footer,hero').get_json()) == ['hero', 'footer']
+    response = client.get('/homepage?sections=hero,weather')
+    assert response.status_code == 400
+    assert "Unknown section 'weather'" in response.get_json()['error']
+
+
+def test_homepage_reloads_when_the_catalog_changes(client):
+    client.get('/homepage?sections=categories')
+    db.session.add(Product(name='Anklet', category='Anklets', image='x', price=1.0))
+    db.session.commit()
+    assert 'Anklets' in client.get('/homepage?sections=categories').get_json()['categories']
+
+
+def test_bundle_caches_sections_for_their_ttl():
+    now = [0.0]
+    loads = []
+    version = [1]
+    bundle = Bundle(clock=lambda: now[0])
+    bundle.static('hero', {'hero': 'hi'})
+    bundle.cached('data', lambda: loads.append(1) or {'data': len(loads)}, ttl=10, version=lambda: version[0])
+
+    assert json.loads(bundle.render()) == {'hero': 'hi', 'data': 1}
+    assert json.loads(bundle.render(('data',))) == {'data': 1}
+    now[0] = 11
+    assert json.loads(bundle.render()) == {'hero': 'hi', 'data': 2}
+    version[0] = 2
+    assert json.loads(bundle.render()) == {'hero': 'hi', 'data': 3}
+    bundle.invalidate('data')
+    assert json.loads(bundle.render()) == {'hero': 'hi', 'data': 4}
+    with pytest.raises(UnknownSection):
+        bundle.parse('hero,nope')
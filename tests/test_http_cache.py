@@ -0,0 +1,53 @@
+import pytest
+
+from kletos.instrumentation import count_queries
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Product
+
+
+@pytest.fixture
+def app_config():
+    # Only commits move the in-process version, never the clock
+    return {'CATALOG_VERSION_TTL': 3600}
+
+
+def test_revalidation_is_answered_without_the_database(client):
+    response = client.get('/product/1')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'].startswith('public, max-age=60')
+    assert response.last_modified is not None
+    with count_queries(db.engine) as queries:
+        response = client.get('/product/1', headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.data == b''
+    assert queries.count == 0
+
+
+def test_weak_etags_revalidate(client):
+    etag = client.get('/products').headers['ETag']
+    with count_queries(db.engine) as queries:
+        response = client.get('/products', headers={'If-None-Match': f'"other", W/{etag}'})
+    assert response.status_code == 304 and queries.count == 0
+
+
+def test_etags_differ_per_url(client):
+    assert client.get('/products?limit=1').headers['ETag'] != client.get('/products?limit=2').headers['ETag']
+
+
+def test_writes_move_the_etag(client):
+    etag = client.get('/product/1').headers['ETag']
+    Product.query.get(2).price = 12.0
+    db.session.commit()
+    response = client.get('/product/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_errors_are_not_tagged(client):
+    response = client.get('/product/999')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+
+def test_static_views_are_tagged_by_body(client):
+    response = client.get('/hero-content')
+    assert client.get('/hero-content', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
@@ -0,0 +1,134 @@
+import io
+import time
+
+import pytest
+
+from kletos.blobstore import BlobStore, BlobTooLarge, sniff_content_type
+from kletos.storefront.extensions import db
+
+
+@pytest.fixture
+def app_config():
+    return {'IMAGE_MAX_BYTES': 1000}
+
+
+def test_put_stream_stops_past_max_size(tmp_path):
+    store = BlobStore(str(tmp_path), chunk_size=10)
+    with pytest.raises(BlobTooLarge):
+        store.put_stream(io.BytesIO(b'x' * 101), max_size=100)
+    assert list((tmp_path / 'tmp').iterdir()) == []
+    digest, size = store.put_stream(io.BytesIO(b'x' * 100), max_size=100)
+    assert size == 100 and store.path(digest)
+
+
+def test_riff_is_webp_only_with_its_fourcc(tmp_path):
+    store = BlobStore(str(tmp_path))
+    webp, _ = store.put_bytes(b'RIFF\x10\x00\x00\x00WEBPVP8 ')
+    wave, _ = store.put_bytes(b'RIFF\x10\x00\x00\x00WAVEfmt ')
+    assert store.content_type(webp) == 'image/webp'
+    assert sniff_content_type(store.path(wave)) == 'application/octet-stream'
+
+
+def test_upload_limit_is_enforced_without_content_length(client, writer):
+    pytest.importorskip('PIL')
+    # A chunked body: no Content-Length for the up-front check to see
+    response = client.put('/product/1/image', input_stream=io.BytesIO(b'\xff\xd8\xff' + b'x' * 2000),
+                          content_type='image/jpeg', headers=writer,
+                          environ_overrides={'wsgi.input_terminated': True})
+    assert response.status_code == 413
+    assert response.get_json() == {'error': 'Images are limited to 1000 bytes'}
+
+
+def test_upload_declared_too_large(client, writer):
+    pytest.importorskip('PIL')
+    response = client.put('/product/1/image', data=b'x' * 1001, content_type='image/jpeg', headers=writer)
+    assert response.status_code == 413
+
+
+def test_upload_needs_catalog_writer(client, sign_in):
+    response = client.put('/product/1/image', data=b'x', content_type='image/jpeg', headers=sign_in())
+    assert response.status_code == 403
+
+
+def png(width=400, height=200, colour='red'):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), colour).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_upload_renders_srcsets_and_serves_immutable_urls(client, writer):
+    pytest.importorskip('PIL')
+    etag = client.get('/product/1').headers['ETag']
+    response = client.put('/product/1/image', data=png(), content_type='image/png', headers=writer)
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['status'] == 'ready'
+    url = response.get_json()['image']
+    assert url.startswith('/images/') and url.endswith('.png')
+
+    # Derivatives no wider than the source, narrowest first
+    product = client.get('/product/1', headers={'If-None-Match': etag}).get_json()['product']
+    assert product['image'] == url
+    assert [entry.rsplit(' ', 1)[1] for entry in product['image_srcset'].split(', ')] == ['160w', '320w', '400w']
+    assert product['image_srcset_webp'].split(', ')[0].endswith('.webp 160w')
+
+    derivative = product['image_srcset_webp'].split(', ')[0].split(' ')[0]
+    response = client.get(derivative)
+    assert response.status_code == 200 and response.mimetype == 'image/webp'
+    assert 'immutable' in response.headers['Cache-Control'] and 'max-age=31536000' in response.headers['Cache-Control']
+    # The extension has to match the stored type
+    assert client.get(derivative.replace('.webp', '.jpg')).status_code == 404
+
+
+def test_same_image_is_rendered_once(client, writer):
+    pytest.importorskip('PIL')
+    data = png(colour='blue')
+    first = client.put('/product/1/image', data=data, content_type='image/png', headers=writer).get_json()
+    second = client.put('/product/2/image', data=data, content_type='image/png', headers=writer).get_json()
+    assert first['image'] == second['image']
+    assert db.session.execute('SELECT COUNT(*) FROM image_asset').scalar() == 1
+    assert client.get('/product/2').get_json()['product']['image_srcset'] == \
+        client.get('/product/1').get_json()['product']['image_srcset']
+
+
+def test_upload_rejects_non_images(client, writer):
+    pytest.importorskip('PIL')
+    response = client.put('/product/1/image', data=b'plain text', content_type='image/png', headers=writer)
+    assert response.status_code == 415
+    wave = b'RIFF\x10\x00\x00\x00WAVEfmt ' + b'\x00' * 16
+    assert client.put('/product/1/image', data=wave, content_type='image/webp', headers=writer).status_code == 415
+
+
+@pytest.mark.parametrize('workers', [0, 1])
+def test_unreadable_upload_keeps_the_product_image(app, client, writer, workers, tmp_path):
+    pytest.importorskip('PIL')
+    app.extensions['images'].workers = workers
+    before = client.get('/product/1').get_json()['product']['image']
+    corrupt = png()[:40] + b'x' * 200
+    response = client.put('/product/1/image', data=corrupt, content_type='image/png', headers=writer)
+    assert response.status_code == 422
+    assert client.get('/product/1').get_json()['product']['image'] == before
+    assert [path.name for path in (tmp_path / 'images').iterdir()] == ['tmp']
+    assert list((tmp_path / 'images' / 'tmp').iterdir()) == []
+
+
+@pytest.mark.parametrize('app_config', [{'IMAGE_WORKERS': 1, 'CATALOG_VERSION_TTL': 3600}])
+def test_pool_renders_apply_and_invalidate_when_done(app, client, writer):
+    pytest.importorskip('PIL')
+    images = app.extensions['images']
+    try:
+        before = client.get('/product/1').get_json()['product']
+        response = client.put('/product/1/image', data=png(colour='green'), content_type='image/png',
+                              headers=writer)
+        assert response.status_code in (200, 202)
+        url = response.get_json()['image']
+        # The cached page only changes once the done-callback invalidates it
+        deadline = time.monotonic() + 30
+        product = before
+        while product['image'] != url and time.monotonic() < deadline:
+            time.sleep(0.05)
+            product = client.get('/product/1').get_json()['product']
+        assert product['image'] == url and product['image_srcset']
+    finally:
+        images.shutdown()
@@ -0,0 +1,57 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from kletos import metrics
+from kletos.metrics import SQL_DURATION, Histogram, instrument_sqlalchemy
+
+
+def sqlalchemy_count():
+    series = SQL_DURATION._series.get(('sqlalchemy',))
+    return sum(series[:-1]) if series else 0
+
+
+def test_failed_statements_do_not_skew_timings():
+    instrument_sqlalchemy()
+    engine = create_engine('sqlite://')
+    with engine.connect() as conn:
+        before = sqlalchemy_count()
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute('SELECT * FROM missing_table')
+        assert conn.execute('SELECT 1').scalar() == 1
+        # Only the statement that completed is observed, and nothing is left
+        # on the connection for the next one to pick up
+        assert sqlalchemy_count() == before + 1
+        assert 'metrics_start' not in conn.info
+
+
+def test_histogram_buckets_and_render():
+    histogram = Histogram('demo_seconds', 'Demo.', ('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, 'read')
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{op="read",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{op="read",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{op="read",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{op="read"} 3' in lines
+
+
+def test_metrics_endpoint_times_routes(client):
+    client.get('/products')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",route="/products",status="200"}' in body
+
+
+def test_metrics_report_the_current_apps_cache(client):
+    client.get('/product/1')
+    client.get('/product/1')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'cache_hits_total{cache="product"} 1' in body
+
+    # Another app in the process has no product cache to report
+    other = Flask(__name__)
+    metrics.init_app(other)
+    body = other.test_client().get('/metrics').get_data(as_text=True)
+    assert 'cache_hits_total{cache="product"}' not in body
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Product
+
+
+def all_pages(client, url):
+    ids, after = [], None
+    while True:
+        body = client.get(url + (f'&after={after}' if after is not None else '')).get_json()
+        ids.extend(product['id'] for product in body['products'])
+        after = body['next_after']
+        if after is None:
+            return ids
+
+
+def test_products_page_through_every_row_once(client):
+    assert all_pages(client, '/products?limit=7') == list(range(1, 21))
+
+
+def test_keyset_cursor_is_stable_across_inserts(client):
+    first = client.get('/products?limit=5').get_json()
+    # Rows added before the cursor don't shift the next page, as an offset would
+    db.session.add(Product(id=0, name='Early', category='Rings', image='x', price=1.0))
+    db.session.commit()
+    second = client.get(f'/products?limit=5&after={first["next_after"]}').get_json()
+    assert [product['id'] for product in second['products']] == [6, 7, 8, 9, 10]
+
+
+def test_products_project_requested_fields(client):
+    body = client.get('/products?limit=2&fields=name,price').get_json()
+    assert [set(product) for product in body['products']] == [{'id', 'name', 'price'}] * 2
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=501', 'limit=ten', 'after=x', 'fields=name,secret'])
+def test_products_reject_bad_parameters(client, query):
+    response = client.get(f'/products?{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_products_stream_whole_catalog(client):
+    response = client.get('/products?stream=1&fields=id,name')
+    assert response.is_streamed
+    products = json.loads(response.get_data())['products']
+    assert [product['id'] for product in products] == list(range(1, 21))
+    assert set(products[0]) == {'id', 'name'}
@@ -0,0 +1,45 @@
+from kletos.ranking import RANK_EPOCH, RANK_HALF_LIFE, rank_weight
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Product
+
+
+def add_to_cart(client, headers, product_id, times=1):
+    for _ in range(times):
+        client.post('/cart/add', json={'product_id': product_id, 'quantity': 1}, headers=headers)
+
+
+def test_rank_weight_halves_per_half_life():
+    assert rank_weight(RANK_EPOCH) == 1.0
+    assert rank_weight(RANK_EPOCH + 3 * RANK_HALF_LIFE) == 8.0
+
+
+def test_featured_products_follow_cart_adds(client, sign_in):
+    # Before any cart activity, the first products stand in
+    assert [product['id'] for product in client.get('/featured-products?limit=3').get_json()['featured_products']] \
+        == [1, 2, 3]
+    headers = sign_in()
+    add_to_cart(client, headers, 7, times=3)
+    add_to_cart(client, headers, 4, times=2)
+    add_to_cart(client, headers, 9)
+    featured = client.get('/featured-products?limit=2').get_json()['featured_products']
+    assert [product['id'] for product in featured] == [7, 4]
+    assert client.get('/highlighted-product').get_json()['highlighted_product']['id'] == 7
+
+
+def test_featured_products_by_category(client, sign_in):
+    headers = sign_in()
+    category = Product.query.get(9).category
+    add_to_cart(client, headers, 7, times=3)
+    add_to_cart(client, headers, 9)
+    featured = client.get(f'/featured-products?category={category}').get_json()['featured_products']
+    assert [product['id'] for product in featured] == [9]
+    assert client.get('/featured-products?limit=51').status_code == 400
+
+
+def test_rankings_follow_category_moves(client, sign_in):
+    headers = sign_in()
+    add_to_cart(client, headers, 7)
+    Product.query.get(7).category = 'Anklets'
+    db.session.commit()
+    featured = client.get('/featured-products?category=Anklets').get_json()['featured_products']
+    assert [product['id'] for product in featured] == [7]
@@ -0,0 +1,122 @@
+import pytest
+
+from kletos.ratelimit import AUTH, BATCH, BATCH_RECORD_COST, AdmissionGate, MemoryBackend
+from tests.conftest import ADMIN_EMAIL, PASSWORD, user_record, validation_token
+
+
+@pytest.fixture
+def validation_env():
+    return {
+        'RATE_LIMIT_ENABLED': '1',
+        'RATE_LIMIT_IP_BURST': '100',
+        'RATE_LIMIT_ACCOUNT_BURST': '5',
+        'RATE_LIMIT_ACCOUNT_PER_SECOND': '0.001',
+        'ADMISSION_MAX_COST': '4',
+        'BATCH_ADMISSION_MAX_COST': '6',
+    }
+
+
+@pytest.fixture
+def client(validation):
+    return validation.app.test_client()
+
+
+def test_memory_backend_refills_at_rate():
+    now = [0.0]
+    backend = MemoryBackend(clock=lambda: now[0])
+    assert backend.take('k', 2, capacity=3, rate=1.0) == 0
+    assert backend.take('k', 2, capacity=3, rate=1.0) == pytest.approx(1.0)
+    now[0] = 1.0
+    assert backend.take('k', 2, capacity=3, rate=1.0) == 0
+    now[0] = 100.0
+    # Never more than the capacity, however long it idled
+    assert backend.take('k', 3, capacity=3, rate=1.0) == 0
+    assert backend.take('k', 1, capacity=3, rate=1.0) > 0
+
+
+def test_memory_backend_drops_least_recent_keys():
+    backend = MemoryBackend(max_keys=2)
+    for key in ('a', 'b', 'a', 'c'):
+        backend.take(key, 1, capacity=1, rate=0.001)
+    # 'b' was evicted, so it starts from a full bucket again; 'a' was kept
+    assert backend.take('a', 1, capacity=1, rate=0.001) > 0
+    assert backend.take('b', 1, capacity=1, rate=0.001) == 0
+
+
+def test_admission_gate_caps_cost_in_flight():
+    gate = AdmissionGate(4)
+    assert gate.try_acquire(3)
+    assert not gate.try_acquire(2)
+    assert gate.try_acquire(1)
+    gate.release(3)
+    gate.release(1)
+    # A lone request over the cap is still admitted
+    assert gate.try_acquire(10)
+
+
+def test_logins_are_limited_per_account(client):
+    # Sign-up and logins spend from the same bucket: 2 + 1 + 1 + 1 of 5
+    client.post('/signup', json=user_record('victim'))
+    wrong = {'email': 'victim@example.com', 'password': 'wrong'}
+    statuses = [client.post('/login', json=wrong).status_code for _ in range(4)]
+    assert statuses == [401, 401, 401, 429]
+    response = client.post('/login', json=wrong)
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.headers['Connection'] == 'close'
+    # The account key ignores case, so it can't be sidestepped
+    assert client.post('/login', json=dict(wrong, email='VICTIM@example.com')).status_code == 429
+    # Other accounts are unaffected
+    client.post('/signup', json=user_record('bystander'))
+    assert client.post('/login', json={'email': 'bystander@example.com', 'password': PASSWORD}).status_code == 200
+
+
+def test_admission_rejects_when_auth_gate_full(validation, client):
+    client.post('/signup', json=user_record('someone'))
+    gate = validation.app.extensions['rate_limits'].gates[AUTH]
+    assert gate.try_acquire(gate.max_cost)
+    try:
+        response = client.post('/login', json={'email': 'someone@example.com', 'password': PASSWORD})
+        assert response.status_code == 429
+    finally:
+        gate.release(gate.max_cost)
+    assert validation.app.extensions['rate_limits'].rejections['admission'] == 1
+    assert gate.in_flight == 0
+
+
+def test_batches_pay_per_record_on_their_own_gate(validation, client):
+    client.post('/signup', json=user_record('admin', email=ADMIN_EMAIL))
+    admin = validation_token(client, ADMIN_EMAIL)
+    with validation.app.test_request_context('/signup/batch', method='POST',
+                                             json=[user_record(f'user{i}') for i in range(5)]):
+        assert validation.batch_cost() == 5 * BATCH_RECORD_COST
+
+    # A full batch gate turns batches away but not logins
+    gate = validation.app.extensions['rate_limits'].gates[BATCH]
+    assert gate.try_acquire(gate.max_cost)
+    try:
+        assert client.post('/signup/batch', json=[user_record('queued')], headers=admin).status_code == 429
+        assert client.post('/login', json={'email': ADMIN_EMAIL, 'password': PASSWORD}).status_code == 200
+    finally:
+        gate.release(gate.max_cost)
+
+    # A batch costing more than the gate holds is capped to it, so it still runs
+    records = [user_record(f'bulk{i}') for i in range(10)]
+    response = client.post('/signup/batch', json=records, headers=admin)
+    assert response.status_code == 201 and response.get_json()['inserted'] == 10
+    assert gate.in_flight == 0
+
+
+def test_disabled_limiter_lets_everything_through(validation):
+    validation.app.extensions['rate_limits'].enabled = False
+    client = validation.app.test_client()
+    for _ in range(5):
+        assert client.post('/login', json={'email': 'nobody@example.com', 'password': 'x'}).status_code == 401
+
+
+def test_metrics_export_rejections_and_gates(validation, client):
+    client.post('/signup', json=user_record('counted'))
+    for _ in range(4):
+        client.post('/login', json={'email': 'counted@example.com', 'password': 'wrong'})
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'rate_limit_rejections_total{reason="account"}' in body
+    assert 'admission_cost_in_flight{gate="batch"} 0' in body
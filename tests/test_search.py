@@ -0,0 +1,34 @@
+from kletos.search import build_match
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Product
+
+
+def test_search_matches_prefixes_and_ranks_names_first(client):
+    db.session.add(Product(name='Plain Band', category='Bracelet', image='x', price=1.0))
+    db.session.commit()
+    names = [product['name'] for product in client.get('/search?q=brace').get_json()['products']]
+    assert len(names) == 6
+    # A hit in the name outranks one in the category alone
+    assert names[-1] == 'Plain Band'
+
+
+def test_search_pages_by_score_cursor(client):
+    first = client.get('/search?q=necklace&limit=3').get_json()
+    rest = client.get(f'/search?q=necklace&limit=3&after={first["next_after"]}').get_json()
+    ids = [product['id'] for product in first['products'] + rest['products']]
+    assert len(ids) == len(set(ids)) == 5
+    assert rest['next_after'] is None
+
+
+def test_search_follows_renames(client):
+    product = Product.query.get(1)
+    product.name = 'Zircon Anklet'
+    db.session.commit()
+    assert [product['id'] for product in client.get('/search?q=zirc').get_json()['products']] == [1]
+
+
+def test_search_input_is_never_fts_syntax(client):
+    assert build_match('neck OR "ring') == '"neck"* "OR"* "ring"*'
+    assert build_match('*()') is None
+    assert client.get('/search?q=NEAR(a b)*').status_code == 200
+    assert client.get('/search?q=').status_code == 400
@@ -0,0 +1,16 @@
+from kletos.serializers import FragmentCache, listing_body
+
+
+def test_fragments_encode_each_row_once():
+    fragments = FragmentCache(maxsize=2)
+    fields = ('id', 'name')
+    first = fragments.encode(fields, (1, 'Ring'))
+    assert fragments.encode(fields, (1, 'Ring')) is first
+    assert fragments.encode_rows(fields, [(1, 'Ring'), (2, 'Band')]) == b'[{"id":1,"name":"Ring"},{"id":2,"name":"Band"}]'
+    fragments.encode(fields, (3, 'Chain'))
+    assert len(fragments._fragments) == 2
+
+
+def test_listing_body_is_valid_json():
+    body = listing_body(('id',), [(1,), (2,)], next_after=2, category='Rings')
+    assert body == b'{"products":[{"id":1},{"id":2}],"next_after":2,"category":"Rings"}'
@@ -0,0 +1,9 @@
+from tests.conftest import user_record
+
+
+def test_connections_are_pooled_in_wal_mode(validation):
+    validation.app.test_client().post('/signup', json=user_record('dave'))
+    with validation.db_pool.connection() as first:
+        assert first.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    with validation.db_pool.connection() as second:
+        assert second is first
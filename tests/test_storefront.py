@@ -0,0 +1,110 @@
+import shutil
+import sqlite3
+from pathlib import Path
+
+from kletos.storefront import create_app, init_db, schema_ready
+from kletos.storefront.extensions import db
+from kletos.storefront.models import Cart, CartItem, Product, User
+
+LEGACY_DATABASE = Path(__file__).resolve().parent.parent / 'product_details' / 'products.db'
+
+
+def second_app(tmp_path):
+    # db.session is scoped to the thread, not the app; drop the fixture app's
+    # session whenever the test switches apps
+    db.session.remove()
+    other = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "other.db"}',
+        'RATE_LIMIT_ENABLED': False,
+    })
+    with other.app_context():
+        init_db()
+        Product.query.get(1).price = 1.0
+        db.session.commit()
+        db.session.remove()
+    return other
+
+
+def test_apps_keep_their_own_caches(app, client, tmp_path):
+    other = second_app(tmp_path)
+    assert other.extensions['product_cache'] is not app.extensions['product_cache']
+    assert other.extensions['homepage'] is not app.extensions['homepage']
+    assert other.extensions['catalog_version'] is not app.extensions['catalog_version']
+    for name in ('denylist', 'images', 'rate_limits'):
+        assert other.extensions[name] is not app.extensions[name]
+    # Renders and revocations write to their own app's database
+    assert other.extensions['images']._engine().url != app.extensions['images']._engine().url
+    assert other.extensions['denylist'].engine().url != app.extensions['denylist'].engine().url
+
+    price = client.get('/product/1').get_json()['product']['price']
+    db.session.remove()
+    with other.app_context():
+        other_client = other.test_client()
+        assert other_client.get('/product/1').get_json()['product']['price'] == 1.0
+        assert other_client.get('/homepage?sections=products').get_json()['products'][0]['price'] == 1.0
+    assert client.get('/product/1').get_json()['product']['price'] == price
+    # ETags come from this app's catalog version, not the last app built
+    version = db.session.execute('SELECT version FROM catalog_version').scalar()
+    assert client.get('/product/1').headers['ETag'].startswith(f'"get_product-{version}-')
+    assert client.get('/homepage?sections=products').get_json()['products'][0]['price'] == price
+
+
+def test_merge_accounts_from_legacy_product_details(app, tmp_path):
+    source = tmp_path / 'product_details.db'
+    shutil.copy(LEGACY_DATABASE, source)
+
+    result = app.test_cli_runner().invoke(args=['merge-accounts', str(source)])
+    assert result.exit_code == 0, result.output
+    assert 'Merged 1 accounts and 0 carts' in result.output
+    assert '1 carts with no owner' in result.output
+    user = User.query.filter_by(email='example@example.com').one()
+    assert user.email_normalized == 'example@example.com'
+
+    # Running it again registers nobody twice
+    result = app.test_cli_runner().invoke(args=['merge-accounts', str(source)])
+    assert 'Merged 0 accounts' in result.output and 'Left out 1 accounts' in result.output
+
+
+def test_merge_accounts_moves_owned_carts(app, tmp_path):
+    source = tmp_path / 'source.db'
+    with sqlite3.connect(source) as conn:
+        conn.executescript('''
+            CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, category TEXT, image TEXT, price REAL);
+            CREATE TABLE cart (id INTEGER PRIMARY KEY, total_price REAL, owner_id TEXT);
+            CREATE TABLE cart_item (id INTEGER PRIMARY KEY, cart_id INTEGER, product_id INTEGER, quantity INTEGER);
+            CREATE TABLE "user" (id INTEGER PRIMARY KEY, email TEXT, phone_number TEXT, password_hash TEXT);
+        ''')
+        first = Product.query.get(1)
+        conn.execute('INSERT INTO product VALUES (7, ?, ?, ?, 999)', (first.name, first.category, first.image))
+        conn.execute("INSERT INTO product VALUES (8, 'Retired', 'Misc', 'x', 5)")
+        conn.execute("INSERT INTO \"user\" VALUES (42, 'moved@example.com', '0711111111', 'pbkdf2:sha256:1$s$h')")
+        conn.execute("INSERT INTO cart VALUES (3, 0, '42')")
+        conn.executemany('INSERT INTO cart_item (cart_id, product_id, quantity) VALUES (3, ?, ?)', [(7, 2), (8, 1)])
+    conn.close()
+
+    result = app.test_cli_runner().invoke(args=['merge-accounts', str(source)])
+    assert result.exit_code == 0, result.output
+    assert '1 cart lines for products not in this catalog' in result.output
+    user = User.query.filter_by(email='moved@example.com').one()
+    cart = Cart.query.filter_by(owner_id=str(user.id)).one()
+    assert [(item.product_id, item.quantity) for item in CartItem.query.filter_by(cart_id=cart.id)] == [(1, 2)]
+
+
+def test_first_request_creates_missing_schema(tmp_path):
+    db.session.remove()
+    fresh = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "fresh.db"}'})
+    response = fresh.test_client().get('/products')
+    assert response.status_code == 200
+    assert response.get_json()['products']
+    with fresh.app_context():
+        assert schema_ready()
+
+
+def test_schema_left_alone_when_disabled(tmp_path):
+    db.session.remove()
+    untouched = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "empty.db"}',
+                            'INIT_DB_ON_FIRST_REQUEST': False})
+    untouched.test_client().get('/home')
+    with untouched.app_context():
+        assert not schema_ready()
@@ -0,0 +1,92 @@
+import pytest
+
+from kletos.validators import Field, Schema, error_response, matches
+from tests.conftest import ADMIN_EMAIL, import_validation, user_record, validation_token
+
+
+@pytest.fixture
+def client(validation):
+    return validation.app.test_client()
+
+
+@pytest.fixture
+def admin(client):
+    client.post('/signup', json=user_record('admin', email=ADMIN_EMAIL))
+    return validation_token(client, ADMIN_EMAIL)
+
+
+def test_schema_reports_every_error():
+    schema = Schema(Field('name', 'too short', min_length=3), Field('kind', 'bad kind', choices=('a', 'b')),
+                    Field('code', 'bad code', pattern=r'^\d+$', required_message='code is required'),
+                    checks=(matches('again', 'code', 'codes differ'),))
+    errors = schema.validate({'name': 'ab', 'kind': 'c', 'again': '1'})
+    assert errors == {'name': 'too short', 'kind': 'bad kind', 'code': 'code is required'}
+    assert schema.validate({'name': 'abc', 'kind': 'a', 'code': '12', 'again': '13'}) == {'again': 'codes differ'}
+    assert error_response({'a': 'first', 'b': 'second'})['error'] == 'first'
+
+
+def test_signup_validates_and_rejects_duplicates(client):
+    response = client.post('/signup', json=user_record('ab', password='weak', confirmPassword='weak'))
+    assert response.status_code == 400
+    assert set(response.get_json()['errors']) == {'username', 'password'}
+
+    assert client.post('/signup', json=user_record('alice')).status_code == 201
+    response = client.post('/signup', json=user_record('alice2', email='alice@example.com'))
+    assert response.get_json()['error'] == 'User with this email already exists'
+    response = client.post('/signup', json=user_record('alice', email='other@example.com'))
+    assert response.get_json()['error'] == 'Username already taken'
+
+
+def test_batch_signup_reports_row_errors(client, admin):
+    client.post('/signup', json=user_record('taken'))
+    records = [user_record('newone'), user_record('taken'), user_record('newone', email='dup@example.com'),
+               user_record('bad', email='not-an-email'), 'not a record']
+    response = client.post('/signup/batch', json=records, headers=admin)
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['inserted'] == 1 and body['failed'] == 4
+    assert [error['row'] for error in body['errors']] == [1, 2, 3, 4]
+    assert body['errors'][1]['errors'] == {'username': 'Duplicate username within batch'}
+
+
+def test_batch_signup_accepts_csv(client, admin):
+    rows = [user_record('csvone'), user_record('csvtwo')]
+    header = list(rows[0])
+    body = ','.join(header) + '\n' + '\n'.join(','.join(row[name] for name in header) for row in rows)
+    response = client.post('/signup/batch', data=body, content_type='text/csv', headers=admin)
+    assert response.get_json()['inserted'] == 2
+
+
+def test_batch_signup_needs_admin_and_bounded_size(validation, client, admin):
+    assert client.post('/signup/batch', json=[user_record('anon')]).status_code == 401
+    client.post('/signup', json=user_record('plain'))
+    user = validation_token(client, 'plain@example.com')
+    assert client.post('/signup/batch', json=[user_record('someone')], headers=user).status_code == 403
+    too_many = [user_record(f'user{i}') for i in range(validation.MAX_BATCH_RECORDS + 1)]
+    assert client.post('/signup/batch', json=too_many, headers=admin).status_code == 413
+
+
+def test_duplicate_usernames_are_only_renamed_by_the_command(validation):
+    with validation.db_pool.connection() as conn:
+        conn.execute('DROP INDEX uq_users_username')
+        conn.executemany('INSERT INTO users (username, email, password, phone) VALUES (?, ?, ?, ?)',
+                         [(name, f'{name}{i}@example.com', 'x', '0712345678')
+                          for i, name in enumerate(['sammy', 'sammy-3', 'sammy', 'sammy'])])
+        conn.commit()
+    # Importing the app leaves them as they are
+    again = import_validation()
+    again.db_pool.close()
+    with validation.db_pool.connection() as conn:
+        assert [row[0] for row in conn.execute('SELECT username FROM users ORDER BY id')] == \
+            ['sammy', 'sammy-3', 'sammy', 'sammy']
+
+    result = validation.app.test_cli_runner().invoke(args=['migrate-usernames'])
+    assert result.exit_code == 0, result.output
+    assert "Renamed user 3 from 'sammy' to 'sammy-3-3'" in result.output
+    assert "Renamed user 4 from 'sammy' to 'sammy-4'" in result.output
+    with validation.db_pool.connection() as conn:
+        assert [row[0] for row in conn.execute('SELECT username FROM users ORDER BY id')] == \
+            ['sammy', 'sammy-3', 'sammy-3-3', 'sammy-4']
+    client = validation.app.test_client()
+    assert client.post('/signup', json=user_record('sammy', email='new@example.com')).get_json() == \
+        {'error': 'Username already taken'}
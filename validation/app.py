@@ -1,17 +1,77 @@
-from flask import Flask, request, jsonify
+from flask import Flask, abort, request, jsonify, send_file
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt, get_jwt_identity, jwt_required
+from werkzeug.datastructures import FileStorage
+import click
+import csv
+import io
+import os
 import re
 import sqlite3
+import sys
 
-app = Flask(__name__)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kletos.blobstore import BlobStore, BlobTooLarge
+from kletos import metrics
+from kletos.credentials import CredentialHasher
+from kletos.ratelimit import BATCH, BATCH_RECORD_COST, LOGIN_COST, SIGNUP_COST, RateLimiter
+from kletos.sqlite import ConnectionPool
+from kletos.validators import Field, Schema, error_response, matches
 
-# Function to connect to SQLite database
+app = Flask(__name__)
+app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'secret')  # Change this!
+# Comma-separated user emails whose tokens carry the admin claim
+app.config['ADMIN_EMAILS'] = os.environ.get('ADMIN_EMAILS', '')
+app.config['METRICS_PROFILING'] = os.environ.get('METRICS_PROFILING')
+app.config['METRICS_PROFILE_SAMPLE_RATE'] = float(os.environ.get('METRICS_PROFILE_SAMPLE_RATE', 0))
+# Rows written before passwords were hashed hold plaintext. Off by default:
+# set PASSWORD_LEGACY_PLAINTEXT=1 only for the migration window, so those
+# rows can sign in (and are hashed on that login), then unset it again
+app.config['PASSWORD_LEGACY_PLAINTEXT'] = os.environ.get('PASSWORD_LEGACY_PLAINTEXT', '0')
+# Each KYC document may be up to DOCUMENT_MAX_BYTES; a request body up to
+# MAX_CONTENT_LENGTH, by default both documents plus 1 MiB for the rest
+app.config['DOCUMENT_MAX_BYTES'] = int(os.environ.get('DOCUMENT_MAX_BYTES', 10 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH',
+                                                      2 * app.config['DOCUMENT_MAX_BYTES'] + 1024 * 1024))
+
+# Route latency, SQL and hashing timings, served at /metrics
+metrics.init_app(app)
+
+# Tokens from /login and /merchant_login gate access to KYC documents
+jwt = JWTManager(app)
+
+# Passwords are hashed on a process pool, never stored in plaintext
+hasher = CredentialHasher.from_config(app.config)
+
+# Per-IP and per-account token buckets, and a cap on hashing work in flight;
+# over the limit, requests get 429 with Retry-After before anything is hashed
+limiter = RateLimiter(app)
+
+# Connections are pooled and opened in WAL mode with a busy timeout; each
+# request borrows one and returns it on teardown
+db_pool = ConnectionPool(os.environ.get('USERS_DATABASE_PATH', 'users.db'), wrap=metrics.TimedConnection)
+db_pool.init_app(app)
+
+# KYC documents live in a content-addressed store on disk; merchant rows only
+# keep the SHA-256 reference
+blobs = BlobStore(os.environ.get('BLOB_STORE_PATH', 'blobs'))
+
+# Function to get the request's SQLite connection
 def get_db_connection():
-    conn = sqlite3.connect('users.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db_pool.get()
+
+# Refuse a declared oversize body before anything reads it; the form parser
+# enforces the limit on multipart bodies, JSON ones are only checked here
+@app.before_request
+def limit_content_length():
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': f"Requests are limited to {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+def document_too_large():
+    return jsonify({'error': f"Documents are limited to {app.config['DOCUMENT_MAX_BYTES']} bytes"}), 413
 
 # Create tables if they do not exist
-with get_db_connection() as conn:
+with db_pool.connection() as conn:
     conn.execute('''CREATE TABLE IF NOT EXISTS users (
                      id INTEGER PRIMARY KEY AUTOINCREMENT,
                      username TEXT,
@@ -33,135 +93,432 @@ with get_db_connection() as conn:
                      preferred_payment_methods TEXT,
                      business_license BLOB,
                      id_image BLOB,
-                     agree_terms BOOLEAN
+                     agree_terms BOOLEAN,
+                     business_license_ref TEXT,
+                     id_image_ref TEXT
                      )''')
 
-# Function to validate email format
-def validate_email(email):
-    email_regex = r'^\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    return re.match(email_regex, email)
-
-# Function to validate password format
-def validate_password(password):
-    password_regex = r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$'
-    return re.match(password_regex, password)
-
-# Function to validate phone number format
-def validate_phone(phone):
-    phone_regex = r'^07\d{8}$'
-    return re.match(phone_regex, phone)
+    # Usernames are unique. A database from before that may still hold
+    # duplicates; it runs without the index until `flask migrate-usernames`
+    # has renamed them, since nothing is renamed behind an operator's back
+    try:
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS uq_users_username ON users (username)')
+    except sqlite3.IntegrityError:
+        app.logger.warning('users holds duplicate usernames; run `flask migrate-usernames` to make them unique')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_users_phone ON users (phone)')
+
+    merchant_columns = {row['name'] for row in conn.execute('PRAGMA table_info(merchants)')}
+    for column in ('business_license_ref', 'id_image_ref'):
+        if column not in merchant_columns:
+            conn.execute(f'ALTER TABLE merchants ADD COLUMN {column} TEXT')
+    conn.commit()
+
+# Input formats, compiled once at import time
+EMAIL_RE = re.compile(r'^\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+PASSWORD_RE = re.compile(r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$')
+PHONE_RE = re.compile(r'^07\d{8}$')
+
+PASSWORD_MESSAGE = 'Password must be at least 8 characters long and contain an uppercase letter, a lowercase letter, a number, and a special character'
+
+SIGNUP_SCHEMA = Schema(
+    Field('username', 'Username must be at least 4 characters long', min_length=4),
+    Field('email', 'Invalid email format', pattern=EMAIL_RE),
+    Field('password', PASSWORD_MESSAGE, pattern=PASSWORD_RE),
+    Field('phone', 'Phone number must be in the format 07XXXXXXXX', pattern=PHONE_RE),
+    checks=(matches('confirmPassword', 'password', 'Passwords do not match'),),
+)
+
+MERCHANT_SCHEMA = Schema(
+    Field('businessName', 'Business name is required and must be at least 4 characters long', min_length=4),
+    Field('contactPersonName', 'Contact person name is required'),
+    Field('username', 'Username must be at least 4 characters long', min_length=4),
+    Field('email', 'Invalid email format', pattern=EMAIL_RE),
+    Field('password', PASSWORD_MESSAGE, pattern=PASSWORD_RE),
+    Field('phone', 'Phone number must be in the format 07XXXXXXXX', pattern=PHONE_RE),
+    Field('bankName', 'Bank name is required'),
+    Field('accountNumber', 'Account number is required'),
+    Field('preferredPaymentMethods', 'Preferred payment method is required'),
+    Field('businessLicense', 'Business license is required'),
+    Field('id_image', 'ID proof is required'),
+    Field('agreeTerms', 'You must agree to the terms and conditions with yes or no', choices=('yes', 'no')),
+    checks=(matches('confirmPassword', 'password', 'Passwords do not match'),),
+)
+
+# (column, request field) pairs in insert order, and the UNIQUE columns among them
+USER_FIELDS = (('username', 'username'), ('email', 'email'), ('password', 'password'), ('phone', 'phone'))
+USER_UNIQUE = ('username', 'email')
+
+MERCHANT_FIELDS = (
+    ('business_name', 'businessName'), ('contact_person_name', 'contactPersonName'),
+    ('username', 'username'), ('email', 'email'), ('password', 'password'), ('phone', 'phone'),
+    ('bank_name', 'bankName'), ('account_number', 'accountNumber'),
+    ('preferred_payment_methods', 'preferredPaymentMethods'), ('business_license_ref', 'businessLicense'),
+    ('id_image_ref', 'id_image'), ('agree_terms', 'agreeTerms'),
+)
+MERCHANT_UNIQUE = ('business_name', 'username', 'email')
+
+# Merchant fields holding uploaded documents
+DOCUMENT_FIELDS = ('businessLicense', 'id_image')
+
+# Upper bound on records per bulk-import request. Every record costs a
+# password hash (about 0.14 s on one core at the default work factor), so the
+# default keeps a full batch well inside a 30 s request timeout on one core;
+# larger imports are sent as several requests.
+MAX_BATCH_RECORDS = int(os.environ.get('MAX_BATCH_RECORDS', 100))
+
+def insert_statement(table, fields, on_conflict=''):
+    columns = ', '.join(column for column, _ in fields)
+    placeholders = ', '.join('?' for _ in fields)
+    return f"INSERT INTO {table} ({columns}) VALUES ({placeholders}){on_conflict}"
+
+def row_values(fields, record, password_hash):
+    return tuple(password_hash if column == 'password' else record.get(field) for column, field in fields)
+
+# Replace each document in a merchant record with its blob store reference.
+# Multipart uploads are copied chunk by chunk; JSON string values are stored as-is.
+# The files are only staged: keep them once the merchant row is committed and
+# discard them otherwise, so a rejected signup leaves no documents behind.
+# A document over DOCUMENT_MAX_BYTES raises BlobTooLarge and nothing is staged.
+def stage_documents(record):
+    max_size = app.config['DOCUMENT_MAX_BYTES']
+    staged = []
+    try:
+        for field in DOCUMENT_FIELDS:
+            value = record[field]
+            if isinstance(value, FileStorage):
+                blob = blobs.stage_stream(value.stream, max_size)
+            else:
+                blob = blobs.stage_bytes(value.encode() if isinstance(value, str) else value, max_size)
+            staged.append(blob)
+            record[field] = blob.digest
+    except BlobTooLarge:
+        keep_documents(staged, False)
+        raise
+    return staged
+
+def keep_documents(staged, keep):
+    for blob in staged:
+        if keep:
+            blobs.keep(blob)
+        else:
+            blobs.discard(blob)
+
+def is_admin_email(email):
+    admins = {admin.strip().lower() for admin in app.config['ADMIN_EMAILS'].split(',') if admin.strip()}
+    return (email or '').lower() in admins
 
 @app.route('/signup', methods=['POST'])
+@limiter.limit(SIGNUP_COST, account_fields=('email',))
 def signup():
     data = request.json
     if not data:
         return jsonify({'error': 'No data received'}), 400
 
-    username = data.get('username')
-    password = data.get('password')
-    confirm_password = data.get('confirmPassword')
-    email = data.get('email')
-    phone = data.get('phone')
-
-    # Validate inputs
-    if not username or len(username) < 4:
-        return jsonify({'error': 'Username must be at least 4 characters long'}), 400
-
-    if not validate_email(email):
-        return jsonify({'error': 'Invalid email format'}), 400
+    # Validate inputs, reporting every problem at once
+    errors = SIGNUP_SCHEMA.validate(data)
+    if errors:
+        return jsonify(error_response(errors)), 400
+
+    # Insert user into database; the unique indexes reject a taken username or
+    # email, and only then is it worth looking up which one it was
+    password_hash = hasher.hash(data['password'])
+    with get_db_connection() as conn:
+        inserted = conn.execute(insert_statement('users', USER_FIELDS, ' ON CONFLICT DO NOTHING'),
+                                row_values(USER_FIELDS, data, password_hash)).rowcount
+        conn.commit()
+        if not inserted:
+            if conn.execute("SELECT 1 FROM users WHERE email = ?", (data['email'],)).fetchone():
+                return jsonify({'error': 'User with this email already exists'}), 400
+            return jsonify({'error': 'Username already taken'}), 400
 
-    if not validate_password(password):
-        return jsonify({'error': 'Password must be at least 8 characters long and contain an uppercase letter, a lowercase letter, a number, and a special character'}), 400
+    return jsonify({'message': 'Registration successful! Please login.'}), 201
 
-    if password != confirm_password:
-        return jsonify({'error': 'Passwords do not match'}), 400
+@app.route('/merchant_signup', methods=['POST'])
+@limiter.limit(SIGNUP_COST, account_fields=('email',))
+def merchant_signup():
+    # Documents arrive as multipart file parts (streamed to disk by the form
+    # parser) or, for older clients, as strings inside a JSON body
+    if request.mimetype == 'multipart/form-data':
+        data = request.form.to_dict()
+        for field in DOCUMENT_FIELDS:
+            upload = request.files.get(field)
+            if upload and upload.filename:
+                data[field] = upload
+    else:
+        data = request.json
+    if not data:
+        return jsonify({'error': 'No data received'}), 400
 
-    if not validate_phone(phone):
-        return jsonify({'error': 'Phone number must be in the format 07XXXXXXXX'}), 400
+    # Validate inputs, reporting every problem at once
+    errors = MERCHANT_SCHEMA.validate(data)
+    if errors:
+        return jsonify(error_response(errors)), 400
 
-    # Insert user into database
+    # Insert merchant into database
+    try:
+        staged = stage_documents(data)
+    except BlobTooLarge:
+        return document_too_large()
+    documents = {field: data[field] for field in DOCUMENT_FIELDS}
+    inserted = False
     try:
+        password_hash = hasher.hash(data['password'])
         with get_db_connection() as conn:
-            conn.execute("INSERT INTO users (username, email, password, phone) VALUES (?, ?, ?, ?)",
-                         (username, email, password, phone))
+            conn.execute(insert_statement('merchants', MERCHANT_FIELDS),
+                         row_values(MERCHANT_FIELDS, data, password_hash))
             conn.commit()
-    except sqlite3.IntegrityError:
-        return jsonify({'error': 'User with this email already exists'}), 400
-
-    return jsonify({'message': 'Registration successful! Please login.'}), 201
+        inserted = True
+    except sqlite3.IntegrityError as e:
+        return jsonify({'error': 'Merchant with this email or username already exists'}), 400
+    finally:
+        keep_documents(staged, inserted)
+
+    return jsonify({'message': 'Merchant registration successful! Please login.', 'documents': documents}), 201
+
+# Serves a stored document to the merchant it belongs to, or to an admin;
+# supports Range requests and conditional GETs. Documents are personal data,
+# so no shared cache may keep them.
+@app.route('/documents/<digest>', methods=['GET'])
+@jwt_required()
+def get_document(digest):
+    path = blobs.path(digest)
+    if path is None:
+        abort(404)
+    claims = get_jwt()
+    if not claims.get('admin'):
+        with get_db_connection() as conn:
+            owners = {row['id'] for row in conn.execute(
+                'SELECT id FROM merchants WHERE business_license_ref = ? OR id_image_ref = ?', (digest, digest))}
+        # Same answer as for an unknown digest, so a guess reveals nothing
+        if claims.get('kind') != 'merchant' or int(get_jwt_identity()) not in owners:
+            abort(404)
+    response = send_file(path, mimetype=blobs.content_type(digest), conditional=True)
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+# Bulk import: a JSON array (or {"records": [...]}) or a CSV file with a header
+# row using the same field names as the single-record endpoints
+def read_batch():
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('records')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of records or a text/csv body')
+    return data
+
+def existing_values(conn, table, column, values):
+    found = set()
+    values = list(values)
+    for start in range(0, len(values), 500):
+        chunk = values[start:start + 500]
+        placeholders = ', '.join('?' for _ in chunk)
+        rows = conn.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", chunk)
+        found.update(row[0] for row in rows)
+    return found
+
+def find_conflicts(conn, table, fields, unique, candidates):
+    """Map row index -> errors for candidates clashing with stored rows."""
+    field_for = dict(fields)
+    conflicts = {}
+    for column in unique:
+        field = field_for[column]
+        taken = existing_values(conn, table, column, {record[field] for _, record in candidates})
+        for index, record in candidates:
+            if record[field] in taken:
+                conflicts.setdefault(index, {})[field] = f'{field} already exists'
+    return conflicts
+
+def bulk_insert(table, fields, unique, schema, records, prepare=None):
+    """Validate every record, then insert the valid ones in one transaction.
+
+    ``prepare`` is called on each record that will be inserted, before the
+    write lock is taken, and returns the documents it staged; they are kept
+    only for rows that were committed. Returns ``(inserted, row_errors)``
+    where each error names the record's zero-based position in the batch.
+    """
+    field_for = dict(fields)
+    row_errors = {}
+    candidates = []
+    seen = {column: set() for column in unique}
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            row_errors[index] = {'record': 'Record must be an object'}
+            continue
+        errors = schema.validate(record)
+        for column in unique:
+            value = record.get(field_for[column])
+            if value in seen[column]:
+                errors.setdefault(field_for[column], f'Duplicate {field_for[column]} within batch')
+            seen[column].add(value)
+        if errors:
+            row_errors[index] = errors
+        else:
+            candidates.append((index, record))
+
+    # Reject clashes before hashing, then check again under the write lock in
+    # case another request inserted the same values in the meantime
+    conn = get_db_connection()
+    staged = {}
+    late = {}
+    try:
+        row_errors.update(find_conflicts(conn, table, fields, unique, candidates))
+        candidates = [(index, record) for index, record in candidates if index not in row_errors]
+        if prepare:
+            for index, record in candidates:
+                staged[index] = prepare(record)
+        hashes = hasher.hash_many([record['password'] for _, record in candidates])
+
+        conn.execute('BEGIN IMMEDIATE')
+        late = find_conflicts(conn, table, fields, unique, candidates)
+        row_errors.update(late)
+        rows = [row_values(fields, record, password_hash)
+                for (index, record), password_hash in zip(candidates, hashes) if index not in late]
+        conn.executemany(insert_statement(table, fields), rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        late = staged
+        raise
+    finally:
+        for index, documents in staged.items():
+            keep_documents(documents, index not in late)
+
+    return len(rows), [{'row': index, 'errors': row_errors[index]} for index in sorted(row_errors)]
+
+def batch_response(table, fields, unique, schema, prepare=None):
+    # Bulk imports are an admin tool, not a public signup path
+    if not get_jwt().get('admin'):
+        return jsonify({'error': 'Bulk imports need an admin token'}), 403
+    try:
+        records = read_batch()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not records:
+        return jsonify({'error': 'No data received'}), 400
+    if len(records) > MAX_BATCH_RECORDS:
+        return jsonify({'error': f'At most {MAX_BATCH_RECORDS} records per request'}), 413
 
-@app.route('/merchant_signup', methods=['POST'])
-def merchant_signup():
+    try:
+        inserted, errors = bulk_insert(table, fields, unique, schema, records, prepare)
+    except BlobTooLarge:
+        return document_too_large()
+    status = 201 if inserted else 400
+    return jsonify({'inserted': inserted, 'failed': len(errors), 'errors': errors}), status
+
+# Charged per record, on the bulk-import gate; Flask caches the parsed body
+def batch_cost():
+    try:
+        return BATCH_RECORD_COST * max(1, len(read_batch()))
+    except ValueError:
+        return BATCH_RECORD_COST
+
+@app.route('/signup/batch', methods=['POST'])
+@jwt_required()
+@limiter.limit(batch_cost, gate=BATCH)
+def signup_batch():
+    return batch_response('users', USER_FIELDS, USER_UNIQUE, SIGNUP_SCHEMA)
+
+@app.route('/merchant_signup/batch', methods=['POST'])
+@jwt_required()
+@limiter.limit(batch_cost, gate=BATCH)
+def merchant_signup_batch():
+    return batch_response('merchants', MERCHANT_FIELDS, MERCHANT_UNIQUE, MERCHANT_SCHEMA, stage_documents)
+
+@app.route('/login', methods=['POST'])
+@limiter.limit(LOGIN_COST, account_fields=('email',))
+def login():
     data = request.json
     if not data:
         return jsonify({'error': 'No data received'}), 400
 
-    business_name = data.get('businessName')
-    contact_person_name = data.get('contactPersonName')
-    username = data.get('username')
-    password = data.get('password')
-    confirm_password = data.get('confirmPassword')
     email = data.get('email')
-    phone = data.get('phone')
-    bank_name = data.get('bankName')
-    account_number = data.get('accountNumber')
-    preferred_payment_methods = data.get('preferredPaymentMethods')
-    business_license = data.get('businessLicense')
-    id_image= data.get('id_image')
-    agree_terms = data.get('agreeTerms')
-
-    # Validate inputs
-    if not business_name or len(business_name) < 4:
-        return jsonify({'error': 'Business name is required and must be at least 4 characters long'}), 400
-
-    if not contact_person_name:
-        return jsonify({'error': 'Contact person name is required'}), 400
-
-    if not username or len(username) < 4:
-        return jsonify({'error': 'Username must be at least 4 characters long'}), 400
-
-    if not validate_email(email):
-        return jsonify({'error': 'Invalid email format'}), 400
-
-    if not validate_password(password):
-        return jsonify({'error': 'Password must be at least 8 characters long and contain an uppercase letter, a lowercase letter, a number, and a special character'}), 400
-
-    if password != confirm_password:
-        return jsonify({'error': 'Passwords do not match'}), 400
-
-    if not validate_phone(phone):
-        return jsonify({'error': 'Phone number must be in the format 07XXXXXXXX'}), 400
+    password = data.get('password')
+    if not email or not password:
+        return jsonify({'error': 'Email and password are required'}), 400
 
-    if not bank_name:
-        return jsonify({'error': 'Bank name is required'}), 400
+    with get_db_connection() as conn:
+        user = conn.execute("SELECT id, password FROM users WHERE email = ?", (email,)).fetchone()
 
-    if not account_number:
-        return jsonify({'error': 'Account number is required'}), 400
+    valid, upgraded_hash = hasher.verify(user['password'], password) if user else (False, None)
+    if not valid:
+        return jsonify({'error': 'Invalid credentials'}), 401
 
-    if not preferred_payment_methods:
-        return jsonify({'error': 'Preferred payment method is required'}), 400
+    # Rows written before passwords were hashed are upgraded on first login
+    if upgraded_hash:
+        with get_db_connection() as conn:
+            conn.execute("UPDATE users SET password = ? WHERE id = ?", (upgraded_hash, user['id']))
+            conn.commit()
 
-    if not business_license:
-        return jsonify({'error': 'Business license is required'}), 400
+    token = create_access_token(identity=str(user['id']),
+                                additional_claims={'kind': 'user', 'admin': is_admin_email(email)})
+    return jsonify({'message': 'Login successful', 'user_id': user['id'], 'token': token}), 200
 
-    if not id_image:
-        return jsonify({'error': 'ID proof is required'}), 400
+@app.route('/merchant_login', methods=['POST'])
+@limiter.limit(LOGIN_COST, account_fields=('email',))
+def merchant_login():
+    data = request.json
+    if not data:
+        return jsonify({'error': 'No data received'}), 400
 
-    if agree_terms not in ['yes', 'no']:
-        return jsonify({'error': 'You must agree to the terms and conditions with yes or no'}), 400
+    email = data.get('email')
+    password = data.get('password')
+    if not email or not password:
+        return jsonify({'error': 'Email and password are required'}), 400
 
-    agree_terms_bool = True if agree_terms == 'yes' else False
+    with get_db_connection() as conn:
+        merchant = conn.execute("SELECT id, password FROM merchants WHERE email = ?", (email,)).fetchone()
 
-    # Insert merchant into database
-    try:
+    valid, upgraded_hash = hasher.verify(merchant['password'], password) if merchant else (False, None)
+    if not valid:
+        return jsonify({'error': 'Invalid credentials'}), 401
+    if upgraded_hash:
         with get_db_connection() as conn:
-            conn.execute("INSERT INTO merchants (business_name, contact_person_name, username, email, password, phone, bank_name, account_number, preferred_payment_methods, business_license, id_image, agree_terms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                         (business_name, contact_person_name, username, email, password, phone, bank_name, account_number, preferred_payment_methods, business_license, id_image, agree_terms))
+            conn.execute("UPDATE merchants SET password = ? WHERE id = ?", (upgraded_hash, merchant['id']))
             conn.commit()
-    except sqlite3.IntegrityError as e:
-        return jsonify({'error': 'Merchant with this email or username already exists'}), 400
 
-    return jsonify({'message': 'Merchant registration successful! Please login.'}), 201
+    token = create_access_token(identity=str(merchant['id']), additional_claims={'kind': 'merchant'})
+    return jsonify({'message': 'Login successful', 'merchant_id': merchant['id'], 'token': token}), 200
+
+# Moves documents stored inline by older releases into the blob store
+@app.cli.command('migrate-documents')
+def migrate_documents_command():
+    moved = 0
+    with db_pool.connection() as conn:
+        rows = conn.execute('SELECT id FROM merchants WHERE business_license IS NOT NULL OR id_image IS NOT NULL')
+        for merchant_id in [row['id'] for row in rows]:
+            row = conn.execute('SELECT business_license, id_image FROM merchants WHERE id = ?', (merchant_id,)).fetchone()
+            refs = {}
+            for column in ('business_license', 'id_image'):
+                value = row[column]
+                if value is not None:
+                    refs[column] = blobs.put_bytes(value.encode() if isinstance(value, str) else value)[0]
+            conn.execute('UPDATE merchants SET business_license_ref = coalesce(?, business_license_ref), '
+                         'id_image_ref = coalesce(?, id_image_ref), business_license = NULL, id_image = NULL '
+                         'WHERE id = ?', (refs.get('business_license'), refs.get('id_image'), merchant_id))
+            conn.commit()
+            moved += 1
+    click.echo(f'Moved documents for {moved} merchants')
+
+# Makes usernames unique so their index can be created: the oldest account
+# keeps a shared name and the others get their id appended. Prints every rename.
+@app.cli.command('migrate-usernames')
+def migrate_usernames_command():
+    with db_pool.connection() as conn:
+        taken = {row['username'] for row in conn.execute('SELECT username FROM users')}
+        rows = conn.execute('SELECT id, username FROM users WHERE username IS NOT NULL AND id NOT IN '
+                            '(SELECT MIN(id) FROM users GROUP BY username) ORDER BY id').fetchall()
+        for row in rows:
+            renamed = f"{row['username']}-{row['id']}"
+            while renamed in taken:
+                renamed += f"-{row['id']}"
+            taken.add(renamed)
+            conn.execute('UPDATE users SET username = ? WHERE id = ?', (renamed, row['id']))
+            click.echo(f"Renamed user {row['id']} from {row['username']!r} to {renamed!r}")
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS uq_users_username ON users (username)')
+        conn.commit()
+    click.echo(f'Renamed {len(rows)} users; usernames are unique')
 
 if __name__ == '__main__':
     app.run(debug=True)